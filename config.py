@@ -4,3 +4,20 @@ class Config:
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB limit
+    DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///totality.db')
+
+    # Tasks return {"result_id", "summary"}; full results live (compressed) in the database.
+    # Days a stored full result is kept (0: forever), and seconds task states stay in the result backend.
+    RESULT_TTL_DAYS = float(os.environ.get('TOTALITY_RESULT_TTL_DAYS', '30')) or None
+    RESULT_EXPIRES = int(os.environ.get('CELERY_RESULT_EXPIRES', str(24 * 3600)))
+    PURGE_RESULTS_INTERVAL = float(os.environ.get('TOTALITY_PURGE_RESULTS_SEC', str(6 * 3600)))
+
+    # Run analyses as per-stage subtasks (chords per dependency level) instead of one task (opt-in)
+    STAGE_FANOUT = os.environ.get('TOTALITY_STAGE_FANOUT', '0') == '1'
+    # Stage subtask routing: with a model queue configured, model stages go there (it needs its own
+    # worker, `-Q models`); everything else, and every stage when unset, goes to the general queue
+    MODEL_QUEUE = os.environ.get('TOTALITY_MODEL_QUEUE') or None
+    GENERAL_QUEUE = os.environ.get('TOTALITY_GENERAL_QUEUE', 'celery')
+    MODEL_STAGES = os.environ.get('TOTALITY_MODEL_STAGES', 'deep_listening,resonance').split(',')
+    # Run tasks in-process, synchronously (local development and tests; no broker needed)
+    TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', '0') == '1'
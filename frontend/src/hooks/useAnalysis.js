@@ -7,13 +7,19 @@ export const useAnalysis = () => {
     const [result, setResult] = useState(null);
     const [error, setError] = useState(null);
     const [jobId, setJobId] = useState(null);
+    const [stages, setStages] = useState({}); // partial results by pipeline stage, as they finish
+    const [progress, setProgress] = useState(null); // { completed, total }
     const pollInterval = useRef(null);
+    const eventSource = useRef(null);
 
-    const startAnalysis = async (file, lyrics) => {
+    // profile: 'quick' (loudness/tempo/lyrics check), 'standard' or 'deep'
+    const startAnalysis = async (file, lyrics, profile = 'standard') => {
         setStatus('uploading');
         setError(null);
         setResult(null);
         setJobId(null);
+        setStages({});
+        setProgress(null);
 
         const formData = new FormData();
         formData.append('file', file);
@@ -21,6 +27,7 @@ export const useAnalysis = () => {
         formData.append('artist_id', 'unknown');
         formData.append('platform', 'Spotify');
         formData.append('target_markets', 'US');
+        formData.append('profile', profile);
 
         try {
             // Step 1: Upload and Queue Task
@@ -39,7 +46,7 @@ export const useAnalysis = () => {
             if (data.status === 'queued') {
                 setJobId(data.job_id);
                 setStatus('processing');
-                startPolling(data.job_id);
+                startStreaming(data.job_id);
             } else {
                 throw new Error(data.error || 'Failed to queue task');
             }
@@ -51,6 +58,62 @@ export const useAnalysis = () => {
         }
     };
 
+    // Finished jobs report a result_id and a summary; the full result is fetched once from /results/<id>.
+    // It comes inline only when the worker could not store it.
+    const loadResult = async (data) => {
+        if (data.result) return data.result;
+        const res = await fetch(`${API_BASE}/results/${data.result_id}?embedding=0`);
+        if (!res.ok) throw new Error(`Result fetch failed: ${res.status}`);
+        return (await res.json()).results;
+    };
+
+    const finish = async (data) => {
+        try {
+            setResult(await loadResult(data));
+            setStatus('completed');
+        } catch (err) {
+            setError(err.message);
+            setStatus('error');
+        }
+    };
+
+    // Stage-by-stage progress over server-sent events; falls back to polling if the stream fails
+    const startStreaming = (id) => {
+        if (eventSource.current) eventSource.current.close();
+        if (typeof EventSource === 'undefined') {
+            startPolling(id);
+            return;
+        }
+
+        const source = new EventSource(`${API_BASE}/jobs/${id}/events`);
+        eventSource.current = source;
+
+        source.addEventListener('stage', (e) => {
+            const event = JSON.parse(e.data);
+            setStages(prev => ({ ...prev, [event.stage]: event.result }));
+            setProgress({ completed: event.completed, total: event.total });
+        });
+
+        source.addEventListener('completed', (e) => {
+            source.close();
+            finish(JSON.parse(e.data));
+        });
+
+        source.addEventListener('failed', (e) => {
+            source.close();
+            const data = JSON.parse(e.data);
+            setError(data.error || "Task failed");
+            setStatus('error');
+        });
+
+        source.onerror = () => {
+            // Stream dropped before a final event (proxy timeout, server restart): poll instead
+            source.close();
+            eventSource.current = null;
+            startPolling(id);
+        };
+    };
+
     const startPolling = (id) => {
         if (pollInterval.current) clearInterval(pollInterval.current);
 
@@ -64,17 +127,8 @@ export const useAnalysis = () => {
 
                 if (data.status === 'completed') {
                     clearInterval(pollInterval.current);
-
-                    // Server returns: { "status": "completed", "result": { "status": "success", "results": ... } }
-                    // Worker returns: { "status": "success", "results": result_dict }
-
-                    if (data.result && data.result.results) {
-                        setResult(data.result.results);
-                    } else if (data.result) {
-                        setResult(data.result);
-                    }
-
-                    setStatus('completed');
+                    // Server returns: { "status": "completed", "result_id": ..., "summary": {...} }
+                    await finish(data);
                 } else if (data.status === 'failed') {
                     clearInterval(pollInterval.current);
                     setError(data.error || "Task failed");
@@ -94,6 +148,8 @@ export const useAnalysis = () => {
         status,
         jobId,
         result,
+        stages,
+        progress,
         error,
         startAnalysis
     };
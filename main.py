@@ -1,11 +1,13 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-import shutil
+from fastapi.responses import StreamingResponse
 import os
 import json
+import time
 from datetime import date
-from typing import List
+from typing import Any, Dict, List, Tuple
 
 # --- Totality Engine Imports ---
 from totality_engine.core.models import (
@@ -14,7 +16,13 @@ from totality_engine.core.models import (
     SocialContext, HistoricalContext
 )
 # Removed unused import
-from totality_engine.engines.hit_science.pipeline import HitSciencePipeline
+from totality_engine.engines.hit_science.pipeline import HitSciencePipeline, init_worker, analyze_in_worker
+from totality_engine.engines.hit_science.profiles import PROFILES, DEFAULT_PROFILE
+from totality_engine.core.pool import WarmProcessPool
+from totality_engine.core.config import ConfigLoader
+from totality_engine.core.batching import batching_settings
+from totality_engine.core.uploads import (UploadWriter, UploadTooLarge, MultipartStream, sniff_audio_format,
+                                          MAX_UPLOAD_BYTES, MAX_FIELD_BYTES, UPLOAD_CHUNK_BYTES, SNIFF_BYTES)
 
 app = FastAPI(title="Totality Engine API")
 
@@ -28,39 +36,130 @@ app.add_middleware(
 )
 
 # --- Hit Science Pipeline ---
-hit_pipeline = HitSciencePipeline()
+# "thread": one shared pipeline on a thread pool; "process": warm worker processes (one pipeline each)
+EXECUTOR = os.environ.get("TOTALITY_EXECUTOR", "thread")
+WORKERS = int(os.environ.get("TOTALITY_WORKERS", "2"))
+# Same engines config file as the CLI's --config
+ENGINES_CONFIG = ConfigLoader(os.environ.get("TOTALITY_ENGINES_CONFIG", "engines_config.yaml")).load()
 
-# --- Job Store (In-Memory for MVP) ---
-JOBS = {}
+if EXECUTOR == "process":
+    hit_pipeline = None
+    worker_pool = WarmProcessPool(WORKERS, initializer=init_worker, initargs=(ENGINES_CONFIG,))
+    JOB_THREADS = WORKERS
+elif EXECUTOR == "thread":
+    # Concurrent jobs share micro-batched model forwards (see totality_engine.core.batching)
+    ENGINES_CONFIG["batching"] = dict(ENGINES_CONFIG.get("batching", {}), enabled=True)
+    hit_pipeline = HitSciencePipeline(ENGINES_CONFIG)
+    worker_pool = None
+    # A batch only fills when that many jobs are in flight at once
+    JOB_THREADS = max(WORKERS, batching_settings(ENGINES_CONFIG)["max_batch_size"])
+else:
+    raise ValueError(f"Unknown TOTALITY_EXECUTOR: {EXECUTOR}")
+JOB_THREADS = int(os.environ.get("TOTALITY_JOB_THREADS", JOB_THREADS))
+
+# --- Job Store ---
+# Bounded in memory; with the (default) sqlite store, results live in the database and are loaded on demand
+from sqlmodel import SQLModel, create_engine
+from config import Config
+from totality_engine.core.jobs import get_job_store, JobEventLog, FINISHED
+from totality_engine.core.results import ensure_analysis_result_columns
+
+# Same database and migrations as server.py and the Celery workers
+db_engine = create_engine(Config.DATABASE_URL)
+SQLModel.metadata.create_all(db_engine)
+ensure_analysis_result_columns(db_engine)
+JOBS = get_job_store(
+    engine=db_engine,
+    max_jobs=int(os.environ.get("TOTALITY_MAX_JOBS", "1000")),
+    ttl_sec=float(os.environ.get("TOTALITY_JOB_TTL_SEC", "3600"))
+)
+if JOBS.backing is not None:
+    JOBS.backing.recover() # jobs whose process died (other live servers' jobs are left alone)
+
+# Stage-completed events, streamed by /hit-science/jobs/{job_id}/events
+JOB_EVENTS = JobEventLog()
+SSE_POLL_SEC = 0.25
+SSE_KEEPALIVE_SEC = 15.0
+# Longest a stream stays open; clients then fall back to polling /hit-science/jobs/{job_id}
+SSE_MAX_SEC = float(os.environ.get("TOTALITY_SSE_MAX_SEC", "3600"))
 
 from uuid import uuid4
 import asyncio
+import threading
+import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 
-# Create a thread pool for heavy audio processing
-audio_processor = ThreadPoolExecutor(max_workers=2)
+# Worker processes report stage events through a managed queue, drained here into JOB_EVENTS
+progress_queue = None
+# job_id -> set by the drain thread when it reaches the job's flush marker (see flush_progress)
+progress_flushed: Dict[str, threading.Event] = {}
+PROGRESS_FLUSH_TIMEOUT_SEC = 10.0
+if worker_pool is not None:
+    progress_queue = multiprocessing.get_context("spawn").Manager().Queue()
+
+    def drain_progress():
+        while True:
+            job_id, event = progress_queue.get()
+            if event is None:
+                flushed = progress_flushed.pop(job_id, None)
+                if flushed is not None:
+                    flushed.set()
+                continue
+            JOB_EVENTS.publish(job_id, event)
+
+    threading.Thread(target=drain_progress, name="progress-drain", daemon=True).start()
+
+def flush_progress(job_id: str):
+    """
+    Waits until the drain thread has published every stage event the worker sent for job_id.
+    The worker's puts complete before its result comes back and the queue is FIFO,
+    so a marker queued now is drained after all of them.
+    """
+    flushed = threading.Event()
+    progress_flushed[job_id] = flushed
+    progress_queue.put((job_id, None))
+    if not flushed.wait(PROGRESS_FLUSH_TIMEOUT_SEC):
+        progress_flushed.pop(job_id, None)
+        print(f"Job {job_id}: progress events not drained within {PROGRESS_FLUSH_TIMEOUT_SEC:.0f}s")
+
+# Jobs run on this thread pool; in process mode each thread just waits on a worker process
+audio_processor = ThreadPoolExecutor(max_workers=JOB_THREADS)
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False)
 
 def run_analysis_task(job_id: str, temp_file: str, metadata: dict):
     """
     Wrapper to run the synchronous pipeline in a separate thread.
     """
+    JOB_EVENTS.open(job_id)
     try:
-        JOBS[job_id]["status"] = "processing"
+        JOBS.update(job_id, status="processing")
         
         # Run Analysis (Blocking Call)
         print(f"Job {job_id}: Starting analysis on {temp_file}...")
-        results = hit_pipeline.analyze_track(temp_file, metadata)
+        if worker_pool is not None:
+            try:
+                results = worker_pool.run(analyze_in_worker, temp_file, metadata, job_id, progress_queue)
+            finally:
+                # Publish the worker's stage events before the job is reported finished (SSE streams
+                # stop reading then) and its event log is closed
+                flush_progress(job_id)
+        else:
+            results = hit_pipeline.analyze_track(temp_file, metadata,
+                                                 on_stage=lambda event: JOB_EVENTS.publish(job_id, event))
         
-        JOBS[job_id]["status"] = "completed"
-        JOBS[job_id]["result"] = results
+        JOBS.update(job_id, status="completed", result=results)
         print(f"Job {job_id}: Completed successfully.")
         
     except Exception as e:
         print(f"Job {job_id}: Failed with error: {str(e)}")
-        JOBS[job_id]["status"] = "failed"
-        JOBS[job_id]["error"] = str(e)
+        JOBS.update(job_id, status="failed", error=str(e))
         
     finally:
+        JOB_EVENTS.close(job_id)
         # Cleanup temp file
         if os.path.exists(temp_file):
             try:
@@ -68,42 +167,130 @@ def run_analysis_task(job_id: str, temp_file: str, metadata: dict):
             except Exception as cleanup_err:
                 print(f"Job {job_id}: Error cleaning up file {temp_file}: {cleanup_err}")
 
-@app.post("/hit-science/analyze")
-async def analyze_track_async(
-    file: UploadFile = File(...),
-    artist_id: str = Body("unknown"),
-    platform: str = Body("Spotify"),
-    target_markets: str = Body("US,UK")
-):
+async def multipart_events(request: Request, parser: MultipartStream):
+    try:
+        async for chunk in request.stream():
+            for event in parser.feed(chunk):
+                yield event
+        for event in parser.finish():
+            yield event
+    except ValueError as e: # python-multipart parse errors
+        raise HTTPException(status_code=400, detail=f"Malformed upload: {e}")
+
+async def receive_upload(request: Request, job_id: str) -> Tuple[UploadWriter, Dict[str, str]]:
+    """
+    Parses the multipart body as it arrives, without spooling it first. The "file" part is checked
+    for an audio header on its first bytes, then written once to temp_uploads, hashed and size-capped
+    on the way (writes run in the threadpool). Returns (writer, text fields).
+    """
+    try:
+        parser = MultipartStream(request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    writer, path, target = None, None, None
+    fields: Dict[str, str] = {}
+    buffer = bytearray()
+    try:
+        async for kind, *args in multipart_events(request, parser):
+            if kind == "part":
+                name, filename = args
+                if name == "file":
+                    if path is not None:
+                        raise HTTPException(status_code=400, detail="Only one file may be uploaded")
+                    path = os.path.join("temp_uploads", f"temp_{job_id}_{os.path.basename(filename or '') or 'upload'}")
+                elif filename is not None:
+                    raise HTTPException(status_code=400, detail=f"Unexpected file field '{name}'")
+                target = name
+                buffer = bytearray()
+                continue
+
+            if kind == "data":
+                buffer += args[0]
+            done = kind == "end"
+            if target != "file":
+                if len(buffer) > MAX_FIELD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Form field '{target}' is too large")
+                if done:
+                    fields[target] = buffer.decode("utf-8", "replace")
+                continue
+
+            if writer is None and (len(buffer) >= SNIFF_BYTES or done):
+                if sniff_audio_format(bytes(buffer[:SNIFF_BYTES])) is None:
+                    raise HTTPException(status_code=415, detail="Unsupported file type: expected WAV, MP3, AIFF, FLAC or OGG audio")
+                writer = await run_in_threadpool(UploadWriter, path, MAX_UPLOAD_BYTES)
+            if writer is not None and buffer and (len(buffer) >= UPLOAD_CHUNK_BYTES or done):
+                await run_in_threadpool(writer.write, bytes(buffer))
+                buffer = bytearray()
+    except BaseException:
+        # Rejected or aborted: nothing is left on disk (UploadTooLarge is mapped to 413 by the caller)
+        if writer is not None:
+            await run_in_threadpool(writer.close)
+            os.remove(writer.path)
+        raise
+
+    if writer is None:
+        raise HTTPException(status_code=422, detail="Missing audio file field 'file'")
+    await run_in_threadpool(writer.close)
+    return writer, fields
+
+# The body is parsed by receive_upload rather than by FastAPI; this documents it for /docs
+ANALYZE_REQUEST_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["file"],
+    "properties": {
+        "file": {"type": "string", "format": "binary"},
+        "artist_id": {"type": "string", "default": "unknown"},
+        "platform": {"type": "string", "default": "Spotify"},
+        "target_markets": {"type": "string", "default": "US,UK"},
+        "profile": {"type": "string", "enum": sorted(PROFILES), "default": DEFAULT_PROFILE},
+    },
+}}}}}
+
+@app.post("/hit-science/analyze", openapi_extra=ANALYZE_REQUEST_BODY)
+async def analyze_track_async(request: Request):
     """
     Async Job Submission: Uploads file and starts analysis in background.
+    Form fields: file, artist_id, platform, target_markets, profile
+    (profile: "quick" (loudness/tempo/lyrics check), "standard" or "deep").
     Returns: {"job_id": "..."}
     """
+    # Reject announced oversize bodies before reading anything (the cap is enforced again while streaming)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + UPLOAD_CHUNK_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
     job_id = str(uuid4())
-    temp_filename = f"temp_{job_id}_{file.filename}"
-    temp_path = os.path.join("temp_uploads", temp_filename)
-    
+    temp_path = None
+
     # Ensure temp dir exists
     os.makedirs("temp_uploads", exist_ok=True)
-    
+
     try:
-        # Save upload to temp file (awaitable)
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
+        # Stream upload to temp file, hashing as it goes
+        upload, fields = await receive_upload(request, job_id)
+        temp_path = upload.path
+
+        # Form fields may follow the file part, so they are only known now
+        profile = fields.get("profile") or DEFAULT_PROFILE
+        if profile not in PROFILES:
+            raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}' (expected one of {sorted(PROFILES)})")
+
         metadata = {
-            "artist_id": artist_id,
-            "platform": platform,
-            "target_markets": target_markets.split(","),
-            "lyrics": "" 
+            "artist_id": fields.get("artist_id") or "unknown",
+            "platform": fields.get("platform") or "Spotify",
+            "target_markets": (fields.get("target_markets") or "US,UK").split(","),
+            "lyrics": "",
+            "content_hash": upload.hexdigest, # reused as the feature-cache key
+            "profile": profile
         }
         
-        # Initialize Job
-        JOBS[job_id] = {
+        # Initialize Job (may write to the database: off the loop)
+        await run_in_threadpool(JOBS.create, job_id, {
             "status": "queued", 
             "submitted_at": date.today().isoformat(),
             "metadata": metadata
-        }
+        })
         
         # Offload to ThreadPool
         loop = asyncio.get_event_loop()
@@ -116,15 +303,22 @@ async def analyze_track_async(
         )
         
         return {"job_id": job_id, "status": "queued", "message": "Analysis started in background."}
-        
+
+    except (HTTPException, UploadTooLarge) as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        if isinstance(e, UploadTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
+        raise
+
     except Exception as e:
         # Cleanup if submission fails
-        if os.path.exists(temp_path):
+        if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
         raise HTTPException(status_code=500, detail=f"Submission failed: {str(e)}")
 
 @app.get("/hit-science/jobs/{job_id}")
-async def get_job_status(job_id: str):
+def get_job_status(job_id: str):
     """
     Poll this endpoint to check analysis status.
     """
@@ -145,6 +339,65 @@ async def get_job_status(job_id: str):
         
     return response
 
+def sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/hit-science/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-sent events for a job: one "stage" event per finished pipeline stage (with its partial
+    result), then "completed" (full result) or "failed". Replaces polling /hit-science/jobs/{job_id}.
+    The stream closes after SSE_MAX_SEC without a final event.
+    """
+    job = await run_in_threadpool(JOBS.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        cursor, idle = 0, 0.0
+        deadline = time.monotonic() + SSE_MAX_SEC
+        while time.monotonic() < deadline:
+            pending = JOB_EVENTS.since(job_id, cursor)
+            for event in pending:
+                yield sse("stage", event)
+            cursor += len(pending)
+
+            # In memory while running; a finished job's result may come from the database
+            job = await run_in_threadpool(JOBS.get, job_id)
+            status = job["status"] if job else "failed"
+            if status in FINISHED:
+                # Stages published between the two reads
+                for event in JOB_EVENTS.since(job_id, cursor):
+                    yield sse("stage", event)
+                if status == "completed":
+                    yield sse("completed", {"job_id": job_id, "result": job.get("result")})
+                else:
+                    yield sse("failed", {"job_id": job_id, "error": (job or {}).get("error", "Job not found")})
+                return
+
+            idle = 0.0 if pending else idle + SSE_POLL_SEC
+            if idle >= SSE_KEEPALIVE_SEC:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(SSE_POLL_SEC)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Similarity Search (over embeddings stored by the worker) ---
+from totality_engine.core.similarity import similar_tracks
+
+@app.get("/hit-science/similar/{track_id}")
+def get_similar_tracks(track_id: int, k: int = 10):
+    """
+    Top-k most similar stored tracks (cosine over embeddings).
+    """
+    try:
+        results = similar_tracks(db_engine, track_id, k=min(max(k, 1), 100))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No embedding for track {track_id}")
+    return {"track_id": track_id, "results": results}
+
 # --- Legacy/Mock Data for Comparison ---
 MOCK_SONGS = {
     "song_001": TotalitySong(
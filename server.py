@@ -1,9 +1,10 @@
 import os
 import io
 import json
+import time
 import logging
 import traceback
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import sys
@@ -12,17 +13,21 @@ import sys
 sys.path.append(os.getcwd())
 
 from totality_engine.core.schema import AnalysisResult
+from totality_engine.core.results import ensure_analysis_result_columns, load_results, load_stage_outputs, partial_result
+from totality_engine.core.similarity import similar_tracks
+from totality_engine.engines.hit_science.profiles import PROFILES, DEFAULT_PROFILE
 from sqlmodel import SQLModel, create_engine, Session, select
+from config import Config
 from worker import celery
 from celery.result import AsyncResult
+from celery.utils import uuid
 
-# Database Setup
-sqlite_file_name = "totality.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url)
+# Database Setup: the database the Celery workers write to (tasks.get_db_engine), also used by main.py
+engine = create_engine(Config.DATABASE_URL)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    ensure_analysis_result_columns(engine)
 
 create_db_and_tables()
 
@@ -37,6 +42,16 @@ CORS(app)
 
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'aiff', 'flac', 'ogg'}
 
+# Server-side result backend polling for /jobs/<job_id>/events
+SSE_POLL_SEC = 0.5
+SSE_KEEPALIVE_SEC = 15.0
+# Longest a stream stays open; clients then fall back to polling /jobs/<job_id>
+SSE_MAX_SEC = float(os.environ.get('TOTALITY_SSE_MAX_SEC', '3600'))
+
+# Celery reports PENDING for ids it has never seen. Submissions are stored as QUEUED before they are
+# sent, so PENDING means an unknown (or expired) job.
+QUEUED = 'QUEUED'
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -54,6 +69,10 @@ def analyze_audio():
     
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
+
+    profile = request.form.get('profile', DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        return jsonify({"error": f"Unknown profile '{profile}' (expected one of {sorted(PROFILES)})"}), 400
         
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
@@ -74,7 +93,10 @@ def analyze_audio():
             
             # Trigger Async Task
             # We pass file_path (which worker must be able to access)
-            task = celery.send_task('tasks.analyze_track_task', args=[file_path, artist_id, markets, lyrics])
+            job_id = uuid()
+            celery.backend.store_result(job_id, {"profile": profile}, QUEUED)
+            task = celery.send_task('tasks.analyze_track_task', args=[file_path, artist_id, markets, lyrics, profile],
+                                    task_id=job_id)
             
             return jsonify({
                 "job_id": task.id,
@@ -93,29 +115,111 @@ def get_job_status(job_id):
     Check the status of a Celery task.
     """
     task_result = AsyncResult(job_id, app=celery)
+    if task_result.state == 'PENDING':
+        return jsonify({"error": "Job not found"}), 404
     
     response = {
         "job_id": job_id,
-        "status": task_result.status.lower(), # PENDING, STARTED, SUCCESS, FAILURE
+        "status": task_result.status.lower(), # QUEUED, STARTED, SUCCESS, FAILURE
     }
     
-    if task_result.state == 'PENDING':
+    if task_result.state == QUEUED:
         response["status"] = "queued"
-    elif task_result.state == 'STARTED':
+    elif task_result.state in ('STARTED', 'PROGRESS'):
         response["status"] = "processing"
+        if task_result.state == 'PROGRESS' and isinstance(task_result.info, dict):
+            response["completed_stages"] = task_result.info.get("completed")
+            response["total_stages"] = task_result.info.get("total")
     elif task_result.state == 'SUCCESS':
         response["status"] = "completed"
-        # The worker returns { "status": "success", "results": ... }
+        # The worker returns { "status": "success", "result_id": ..., "summary": ... }
         # Task result value is in task_result.result
         data = task_result.result
-        if data and "results" in data:
-            response["result"] = data["results"]
+        if data and data.get("status") == "success":
+            response.update(finished_result(data))
+        elif data:
+            response["status"] = "failed"
+            response["error"] = data.get("error", "Task failed")
     elif task_result.state == 'FAILURE':
         response["status"] = "failed"
         response["error"] = str(task_result.result)
         
     return jsonify(response)
 
+def finished_result(data):
+    """
+    What polls and the "completed" event report for a finished task: the stored result's id and
+    its summary. Clients fetch the full result once, from /results/<result_id>. It is inline
+    ("result") only when the worker could not store it (or for tasks from before result storage).
+    """
+    if data.get("result_id") is None and "results" in data:
+        return {"result_id": None, "result": data["results"]}
+    return {"result_id": data.get("result_id"), "summary": data.get("summary")}
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    Server-sent events for a Celery job: one "stage" event per finished pipeline stage
+    (with its partial result), then "completed" (result_id and summary, as /jobs/<job_id>) or "failed".
+    Replaces client polling of /jobs/<job_id>.
+    The stream closes after SSE_MAX_SEC without a final event.
+    """
+    if AsyncResult(job_id, app=celery).state == 'PENDING':
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        sent, idle = set(), 0.0
+        deadline = time.monotonic() + SSE_MAX_SEC
+        while time.monotonic() < deadline:
+            task_result = AsyncResult(job_id, app=celery)
+            state = task_result.state
+            info = task_result.info
+
+            if state == 'PENDING':
+                # Its state expired from the result backend
+                yield sse("failed", {"job_id": job_id, "error": "Job not found"})
+                return
+            elif state == 'PROGRESS' and isinstance(info, dict):
+                # Single-task runs send partial results inline; fanned-out runs send stage output references
+                if "stage_refs" in info:
+                    new = [name for name in info["stage_refs"] if name not in sent]
+                    stages = load_stage_outputs(engine, {name: info["stage_refs"][name] for name in new})
+                else:
+                    stages = info.get("stages", {})
+                    new = [name for name in stages if name not in sent]
+                for name in new:
+                    sent.add(name)
+                    yield sse("stage", {
+                        "stage": name,
+                        "completed": len(sent),
+                        "total": info.get("total"),
+                        "result": partial_result(stages.get(name))
+                    })
+                if new:
+                    idle = 0.0
+            elif state == 'SUCCESS':
+                data = task_result.result or {}
+                if data.get("status") == "success":
+                    yield sse("completed", dict(finished_result(data), job_id=job_id))
+                else:
+                    yield sse("failed", {"job_id": job_id, "error": data.get("error", "Task failed")})
+                return
+            elif state == 'FAILURE':
+                yield sse("failed", {"job_id": job_id, "error": str(task_result.result)})
+                return
+
+            idle += SSE_POLL_SEC
+            if idle >= SSE_KEEPALIVE_SEC:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            time.sleep(SSE_POLL_SEC)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route('/history', methods=['GET'])
 def get_history():
     try:
@@ -136,6 +240,36 @@ def get_history():
         logger.error(f"History fetch failed: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/results/<int:result_id>', methods=['GET'])
+def get_result(result_id):
+    """
+    Stored full result of an analysis (the id returned by /jobs/<job_id> as result_id).
+    ?embedding=0 leaves out the embedding vector.
+    """
+    with Session(engine) as session:
+        row = session.get(AnalysisResult, result_id)
+        if row is None:
+            return jsonify({"error": f"No result {result_id}"}), 404
+        result = load_results(row, with_embedding=request.args.get('embedding', '1') != '0')
+    if result is None:
+        return jsonify({"error": f"Result {result_id} has expired"}), 410
+    return jsonify({"id": result_id, "results": result})
+
+@app.route('/similar/<int:track_id>', methods=['GET'])
+def get_similar(track_id):
+    """
+    Top-k most similar stored tracks (cosine over embeddings).
+    """
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    try:
+        results = similar_tracks(engine, track_id, k=k)
+    except KeyError:
+        return jsonify({"error": f"No embedding for track {track_id}"}), 404
+    except Exception as e:
+        logger.error(f"Similarity search failed: {e}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"track_id": track_id, "results": results})
+
 # Serve Frontend
 @app.route('/')
 def index():
@@ -1,4 +1,6 @@
+from celery import chord, group
 from worker import celery
+from config import Config
 from totality_engine.engines.hit_science.pipeline import HitSciencePipeline
 import logging
 
@@ -18,10 +20,116 @@ def get_pipeline():
         pipeline = HitSciencePipeline()
     return pipeline
 
+# Database engine of this worker process (created lazily, after the prefork)
+db_engine = None
+
+def get_db_engine():
+    global db_engine
+    if db_engine is None:
+        from sqlmodel import create_engine
+        from totality_engine.core.results import ensure_analysis_result_columns, ensure_stage_output_table
+        db_engine = create_engine(Config.DATABASE_URL)
+        ensure_analysis_result_columns(db_engine)
+        ensure_stage_output_table(db_engine)
+    return db_engine
+
+def persist_result(audio_path, artist_id, markets, result):
+    """
+    Saves a finished analysis: database row (full result compressed, see core/results.py),
+    similarity index, graph; removes the upload. Returns the row id, or None if the save failed.
+    """
+    # --- Persist to DB (Worker Side) ---
+    from totality_engine.core.schema import AnalysisResult
+    from totality_engine.core.embeddings import set_embedding
+    from totality_engine.core.results import store_results
+    from sqlmodel import Session
+    import os
+    
+    db_engine = get_db_engine()
+    
+    try:
+        # Extract embeddings (stored once, as float32 bytes)
+        creative = result.get("creative", {})
+        
+        # Extract resonance
+        resonance = result.get("resonance", {})
+        
+        with Session(db_engine) as session:
+            db_result = AnalysisResult(
+                filename=os.path.basename(audio_path),
+                status="success",
+                dissonance_score=resonance.get("dissonance_score"),
+                vibe_descriptor=resonance.get("vibe"),
+                lyrical_sentiment=resonance.get("lyrical_sentiment"),
+                artist_id=artist_id,
+                markets=",".join(markets)
+            )
+            set_embedding(db_result, creative.get("embedding"), creative.get("model"))
+            store_results(db_result, result, Config.RESULT_TTL_DAYS)
+            session.add(db_result)
+            session.commit()
+            logger.info("Result saved to database (Worker).")
+            track_id = db_result.id
+    except Exception as db_e:
+        logger.error(f"Database save failed in worker: {db_e}")
+        track_id = None
+
+    # --- Update similarity index (incremental) ---
+    if track_id is not None and creative.get("embedding") and creative.get("status") == "success":
+        try:
+            from totality_engine.core.similarity import get_similarity_index
+            index = get_similarity_index()
+            index.add([track_id], [creative["embedding"]], model=creative.get("model"))
+            if index.needs_build():
+                # Retraining the IVF lists takes minutes on a large catalog; keep it off this job
+                build_index_task.delay()
+        except Exception as index_e:
+            logger.error(f"Similarity index update failed: {index_e}")
+        
+    # Clean up temp file
+    if os.path.exists(audio_path):
+        os.remove(audio_path)
+        logger.info(f"Cleaned up {audio_path}")
+        
+    # --- Persist to Graph (Phase 5) ---
+    try:
+        from totality_engine.engines.hit_science.systems.industry.graph_model import IndustryGraph
+        graph = IndustryGraph()
+        # Use filename as unique track ID for now (MVP)
+        node_id = os.path.basename(audio_path)
+        graph.add_track_node(
+            track_id=node_id,
+            metadata={"filename": node_id, "artist_id": artist_id},
+            analysis_results=result
+        )
+        logger.info("Graph nodes created (Worker).")
+    except Exception as graph_e:
+        logger.error(f"Graph update failed: {graph_e}")
+
+    return track_id
+
+def task_result(result, result_id):
+    """
+    What a finished task returns to the result backend: a reference to the stored result plus
+    a small summary, not the result itself (fetch it with core.results.load_results).
+    Falls back to the full result if it could not be stored.
+    """
+    from totality_engine.core.results import result_summary
+    if result_id is None:
+        return {"status": "success", "results": result}
+    return {
+        "status": "success",
+        "result_id": result_id,
+        "summary": result_summary(result)
+    }
+
 @celery.task(bind=True)
-def analyze_track_task(self, audio_path, artist_id, markets, lyrics=None):
+def analyze_track_task(self, audio_path, artist_id, markets, lyrics=None, profile=None):
     """
-    Background task to run the full Hit Science analysis.
+    Background task to run the Hit Science analysis.
+    profile: "quick", "standard" (default) or "deep"; see engines/hit_science/profiles.py.
+    With Config.STAGE_FANOUT the task replaces itself with per-stage subtasks (see stage_chord);
+    otherwise it runs the whole pipeline in this worker.
     """
     logger.info(f"Starting analysis for {audio_path}")
     
@@ -33,74 +141,47 @@ def analyze_track_task(self, audio_path, artist_id, markets, lyrics=None):
         metadata = {
             "artist_id": artist_id,
             "markets": markets,
-            "lyrics": lyrics
+            "lyrics": lyrics,
+            "profile": profile
         }
-        
-        # Run analysis
-        # Note: analyze_track might not be thread-safe if models are not, but Celery creates processes.
-        result = eng.analyze_track(audio_path, metadata)
-        
-        # --- Persist to DB (Worker Side) ---
-        from totality_engine.core.schema import AnalysisResult
-        from sqlmodel import Session, create_engine
-        import json
-        import os
-        
-        # Re-create engine here (avoid sharing connection across processes)
-        sqlite_url = f"sqlite:///totality.db" 
-        db_engine = create_engine(sqlite_url)
-        
-        try:
-            # Extract embeddings
-            embedding = result.get("creative", {}).get("embedding")
-            embedding_json = json.dumps(embedding) if embedding else None
-            
-            # Extract resonance
-            resonance = result.get("resonance", {})
-            
-            with Session(db_engine) as session:
-                db_result = AnalysisResult(
-                    filename=os.path.basename(audio_path),
-                    status="success",
-                    raw_json=json.dumps(result),
-                    embedding_json=embedding_json,
-                    dissonance_score=resonance.get("dissonance_score"),
-                    vibe_descriptor=resonance.get("vibe"),
-                    lyrical_sentiment=resonance.get("lyrical_sentiment"),
-                    artist_id=artist_id,
-                    markets=",".join(markets)
-                )
-                session.add(db_result)
-                session.commit()
-                logger.info("Result saved to database (Worker).")
-        except Exception as db_e:
-            logger.error(f"Database save failed in worker: {db_e}")
-            
-        # Clean up temp file
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-            logger.info(f"Cleaned up {audio_path}")
-            
-        # --- Persist to Graph (Phase 5) ---
-        try:
-            from totality_engine.engines.hit_science.systems.industry.graph_model import IndustryGraph
-            graph = IndustryGraph()
-            # Use filename as unique track ID for now (MVP)
-            track_id = os.path.basename(audio_path)
-            graph.add_track_node(
-                track_id=track_id,
-                metadata={"filename": track_id, "artist_id": artist_id},
-                analysis_results=result
-            )
-            logger.info("Graph nodes created (Worker).")
-        except Exception as graph_e:
-            logger.error(f"Graph update failed: {graph_e}")
+
+        if Config.STAGE_FANOUT:
+            metadata["profile"] = eng.resolve_profile(profile)
+            # Hash once here so every subtask shares the feature-cache namespace without re-reading the file
+            metadata["content_hash"] = eng.audio_hash(audio_path, metadata)
+            levels = eng.stage_levels(metadata)
+            job = {
+                "job_id": self.request.id,
+                "audio_path": audio_path,
+                "artist_id": artist_id,
+                "markets": markets,
+                "metadata": metadata,
+                "levels": levels,
+                "total": sum(len(level) for level in levels),
+                "refs": {},
+                "timings": {},
+                "cache_hits": []
+            }
+        else:
+            # Publish each finished stage's partial result as task state PROGRESS (streamed by server.py /jobs/<id>/events).
+            # Meta replaces the previous state, so it carries every stage finished so far.
+            stages = {}
+            def report_stage(event):
+                stages[event["stage"]] = event["result"]
+                self.update_state(state="PROGRESS", meta={
+                    "completed": event["completed"],
+                    "total": event["total"],
+                    "stages": stages
+                })
+
+            # Run analysis
+            # Note: analyze_track might not be thread-safe if models are not, but Celery creates processes.
+            result = eng.analyze_track(audio_path, metadata, on_stage=report_stage)
             
-        logger.info(f"Analysis complete for {audio_path}")
-        return {
-            "status": "success",
-            "results": result
-        }
+            result_id = persist_result(audio_path, artist_id, markets, result)
+
+            logger.info(f"Analysis complete for {audio_path}")
+            return task_result(result, result_id)
         
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
@@ -108,3 +189,121 @@ def analyze_track_task(self, audio_path, artist_id, markets, lyrics=None):
             "status": "failed",
             "error": str(e)
         }
+
+    # Outside the try: replace() raises Ignore (not an analysis failure) when not running eagerly.
+    # The workflow takes over this task's id, so /jobs/<id> follows it to the final result.
+    logger.info(f"Fanning out {job['total']} stages in {len(job['levels'])} levels for {audio_path}")
+    return self.replace(stage_chord(job))
+
+def stage_chord(job):
+    """
+    Chord over the next dependency level: one run_stage_task per stage (routed by stage,
+    see worker.route_stage), joined by merge_stages_task, which starts the following level.
+    Stage outputs stay in the database (StageOutput); messages and task results carry their ids.
+    """
+    level, rest = job["levels"][0], job["levels"][1:]
+    header = group(
+        run_stage_task.s(stage["name"], job["job_id"], job["audio_path"], job["metadata"],
+                         {dep: job["refs"][dep] for dep in stage["deps"]})
+        for stage in level
+    )
+    body = merge_stages_task.s(dict(job, levels=rest))
+    # A failed stage fails the chord; still remove the upload and the stored stage outputs
+    return chord(header, body.on_error(cleanup_upload_task.si(job["audio_path"], job["job_id"])))
+
+@celery.task
+def run_stage_task(name, job_id, audio_path, metadata, upstream_refs):
+    """
+    One pipeline stage. Loads its dependencies' outputs by reference and stores its own;
+    returns {"stage", "ref", "elapsed", "cached"}.
+    """
+    from totality_engine.core.results import load_stage_outputs, save_stage_output
+    db = get_db_engine()
+    upstream = load_stage_outputs(db, upstream_refs)
+    missing = set(upstream_refs) - set(upstream)
+    if missing:
+        raise RuntimeError(f"Stage outputs of job {job_id} are gone: {sorted(missing)}")
+    output = get_pipeline().run_stage(name, audio_path, metadata, upstream)
+    return {
+        "stage": name,
+        "ref": save_stage_output(db, job_id, name, output["result"]),
+        "elapsed": output["elapsed"],
+        "cached": output["cached"]
+    }
+
+@celery.task(bind=True)
+def merge_stages_task(self, stage_results, job):
+    """
+    Chord callback: folds a level's stage results into the job, publishes progress, then either
+    replaces itself with the next level's chord or assembles, persists and returns the result.
+    """
+    from totality_engine.core.results import delete_stage_outputs, load_stage_outputs
+    refs = dict(job["refs"])
+    timings = dict(job["timings"])
+    cache_hits = list(job["cache_hits"])
+    for stage in stage_results:
+        refs[stage["stage"]] = stage["ref"]
+        timings[stage["stage"]] = stage["elapsed"]
+        if stage["cached"]:
+            cache_hits.append(stage["stage"])
+    job = dict(job, refs=refs, timings=timings, cache_hits=cache_hits)
+
+    if not self.request.is_eager:
+        # References only; server.py loads the partial results it streams
+        self.update_state(state="PROGRESS", meta={
+            "completed": len(refs),
+            "total": job["total"],
+            "stage_refs": refs
+        })
+
+    if job["levels"]:
+        return self.replace(stage_chord(job))
+
+    db = get_db_engine()
+    outputs = load_stage_outputs(db, refs)
+    metadata = job["metadata"]
+    result = HitSciencePipeline.assemble_results(outputs, metadata["profile"])
+    result["diagnostics"] = {
+        "audio_hash": metadata.get("content_hash"),
+        "execution": "stage_subtasks",
+        "cache_hits": cache_hits,
+        "stage_timings": timings
+    }
+    result_id = persist_result(job["audio_path"], job["artist_id"], job["markets"], result)
+    delete_stage_outputs(db, job["job_id"])
+
+    logger.info(f"Analysis complete for {job['audio_path']}")
+    return task_result(result, result_id)
+
+@celery.task
+def cleanup_upload_task(audio_path, job_id=None):
+    import os
+    from totality_engine.core.results import delete_stage_outputs
+    if os.path.exists(audio_path):
+        os.remove(audio_path)
+        logger.info(f"Cleaned up {audio_path} after a failed stage")
+    if job_id is not None:
+        delete_stage_outputs(get_db_engine(), job_id)
+
+@celery.task
+def build_index_task():
+    """
+    Retrains the similarity index's IVF lists (queued by persist_result once the unclustered
+    tail outgrows them). Duplicate queued builds find the index up to date and return.
+    """
+    from totality_engine.core.similarity import get_similarity_index
+    index = get_similarity_index()
+    if not index.needs_build():
+        return False
+    index.build()
+    return True
+
+@celery.task
+def purge_results_task():
+    """
+    Periodic (see worker.py beat_schedule): drops stored full results past Config.RESULT_TTL_DAYS
+    and stage outputs of fanned-out jobs that never finished.
+    """
+    from totality_engine.core.results import purge_expired_results, purge_stage_outputs
+    db = get_db_engine()
+    return purge_expired_results(db) + purge_stage_outputs(db)
@@ -0,0 +1,51 @@
+import shutil
+
+import numpy as np
+import pytest
+
+soundfile = pytest.importorskip("soundfile")
+pytest.importorskip("librosa")
+pytest.importorskip("scipy")
+
+from totality_engine.core.audio import AudioContext
+from totality_engine.core.loudness import LoudnessScanner, NativeLoudnessScanner, find_ffmpeg
+
+SR = 44100
+
+
+@pytest.fixture
+def track(tmp_path):
+    """Ten seconds at -30 dBFS, then twenty at -10 dBFS: a window over the start reads much quieter."""
+    t = np.arange(30 * SR) / SR
+    y = np.sin(2 * np.pi * 997 * t) * np.where(t < 10, 10 ** (-30 / 20), 10 ** (-10 / 20))
+    path = tmp_path / "track.wav"
+    soundfile.write(str(path), np.stack([y, y]).T, SR, subtype="FLOAT")
+    return str(path)
+
+
+def test_window_decodes_only_the_window(track):
+    audio = AudioContext(track, keep_channels=True, window_sec=5.0)
+    assert audio.duration == pytest.approx(5.0)
+    channels, sr = audio.load_channels()
+    assert sr == SR and channels.shape == (2, 5 * SR)
+    y, _ = audio.load(sr=22050, duration=5.0)
+    assert len(y) == 5 * 22050
+    assert audio.duration == pytest.approx(5.0)
+
+
+def test_native_loudness_window(track):
+    scanner = NativeLoudnessScanner()
+    window = scanner.summary(track, audio=AudioContext(track, keep_channels=True, window_sec=5.0), duration=5.0)
+    assert window["lufs_i"] == pytest.approx(-30.0, abs=0.2)
+    # Without a shared context the window is read straight from the file
+    assert scanner.summary(track, duration=5.0)["lufs_i"] == pytest.approx(-30.0, abs=0.2)
+    # Windows are cached apart from the full-track measurement
+    assert scanner.summary(track)["lufs_i"] > -15.0
+
+
+@pytest.mark.skipif(shutil.which(find_ffmpeg()) is None, reason="ffmpeg not installed")
+def test_ffmpeg_loudness_window(track):
+    scanner = LoudnessScanner()
+    assert scanner.summary(track, duration=5.0)["lufs_i"] == pytest.approx(-30.0, abs=0.2)
+    assert scanner.timeseries(track, duration=5.0)[0][-1] <= 5.0
+    assert scanner.summary(track)["lufs_i"] > -15.0
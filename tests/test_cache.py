@@ -0,0 +1,74 @@
+import os
+
+from totality_engine.core.cache import FeatureCache, fingerprint, hash_file
+
+
+def test_miss_then_hit(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    key = cache.make_key("audio-hash", "loudness", 1, {"backend": "ffmpeg"})
+
+    assert cache.get(key) == (False, None)
+    cache.put(key, {"lufs_i": -14.2, "peaks": [0.1, 0.2]})
+    assert cache.get(key) == (True, {"lufs_i": -14.2, "peaks": [0.1, 0.2]})
+
+    # A different stage version is a different key
+    assert cache.get(cache.make_key("audio-hash", "loudness", 2, {"backend": "ffmpeg"})) == (False, None)
+
+
+def test_make_key_ignores_dict_order():
+    assert FeatureCache.make_key({"a": 1, "b": 2}) == FeatureCache.make_key({"b": 2, "a": 1})
+    assert fingerprint([1, 2]) != fingerprint([2, 1])
+
+
+def test_non_json_values_are_not_cached(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.put("k" * 64, {"value": object()})
+    assert cache.get("k" * 64) == (False, None)
+
+
+def test_unreadable_entry_is_discarded(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    key = cache.make_key("corrupt")
+    cache.put(key, [1, 2, 3])
+    path = cache._path(key)
+    with open(path, "w") as f:
+        f.write("{not json")
+
+    assert cache.get(key) == (False, None)
+    assert not os.path.exists(path)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    payload = "x" * 1000
+    # Room for about four entries
+    cache = FeatureCache(str(tmp_path), max_mb=4400 / (1024 * 1024))
+    keys = [cache.make_key(i) for i in range(4)]
+    for i, key in enumerate(keys):
+        cache.put(key, payload)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0])[0]
+    cache.put(cache.make_key(4), payload)
+
+    hits = [cache.get(key)[0] for key in keys]
+    assert hits == [True, False, False, True]
+    assert cache.get(cache.make_key(4))[0]
+    assert cache._scan_size() <= cache.max_bytes
+
+
+def test_clear(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.put(cache.make_key("a"), 1)
+    cache.clear()
+    assert cache.get(cache.make_key("a")) == (False, None)
+    assert cache._scan_size() == 0
+
+
+def test_hash_file_is_content_addressed(tmp_path):
+    a, b = tmp_path / "a.wav", tmp_path / "b.wav"
+    a.write_bytes(b"same audio")
+    b.write_bytes(b"same audio")
+    assert hash_file(str(a)) == hash_file(str(b))
+    b.write_bytes(b"other audio")
+    assert hash_file(str(a)) != hash_file(str(b))
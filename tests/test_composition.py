@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from totality_engine.engines.creative.composition import CompositionEngine, _sliding_extreme
+
+
+def naive_sliding_extreme(values, window, op):
+    """Reference: reduce every span directly (windows past the end see only the remaining frames)."""
+    reduce = np.max if op is np.maximum else np.min
+    rows, n = values.shape
+    out = np.empty((rows, n))
+    for i in range(n):
+        out[:, i] = reduce(values[:, i:i + window], axis=1)
+    return out
+
+
+def legacy_structure(times, lufs):
+    """Boredom and drop detection as the per-frame Python loops computed them before vectorization."""
+    structure = {"boredom_flags": [], "drop_points": []}
+    timeseries = [{"t": float(t), "lufs": float(v)} for t, v in zip(times, lufs)]
+    values = [x["lufs"] for x in timeseries]
+
+    for i in range(0, len(timeseries), 50):
+        window_end_idx = min(i + 200, len(timeseries))
+        window_vals = values[i:window_end_idx]
+        if max(window_vals) - min(window_vals) < 3.0:
+            start_t = timeseries[i]["t"]
+            end_t = timeseries[window_end_idx - 1]["t"]
+            if not structure["boredom_flags"] or start_t > structure["boredom_flags"][-1]["end"] + 5:
+                structure["boredom_flags"].append({"start": round(start_t, 1), "end": round(end_t, 1),
+                                                   "type": "Static Energy"})
+
+    for i in range(10, len(timeseries)):
+        delta = timeseries[i]["lufs"] - timeseries[i - 10]["lufs"]
+        if delta > 4.0:
+            t = timeseries[i]["t"]
+            if not structure["drop_points"] or t > structure["drop_points"][-1]["timestamp"] + 5:
+                structure["drop_points"].append({"timestamp": round(t, 1), "magnitude": round(delta, 1)})
+    return structure
+
+
+def synthetic_profile(rng, n):
+    """Momentary loudness with flat sections, slow drift and sudden jumps."""
+    lufs = np.cumsum(rng.normal(0.0, 0.4, n)) - 20.0
+    for start in rng.integers(0, max(n - 300, 1), size=3):
+        lufs[start:start + 300] = lufs[start] + rng.normal(0.0, 0.2, len(lufs[start:start + 300]))
+    for k in rng.integers(10, max(n, 11), size=4):
+        lufs[k:] += rng.uniform(4.0, 9.0)
+    return np.arange(n) / 10.0, lufs
+
+
+@pytest.mark.parametrize("window", [1, 3, 7, 200])
+@pytest.mark.parametrize("op", [np.maximum, np.minimum])
+def test_sliding_extreme_matches_naive(window, op):
+    rng = np.random.default_rng(window)
+    values = rng.normal(size=(3, 517))
+    np.testing.assert_array_equal(_sliding_extreme(values, window, op), naive_sliding_extreme(values, window, op))
+
+
+def test_sliding_extreme_window_longer_than_signal():
+    values = np.array([[3.0, -1.0, 2.0]])
+    np.testing.assert_array_equal(_sliding_extreme(values, 10, np.maximum), [[3.0, 2.0, 2.0]])
+    np.testing.assert_array_equal(_sliding_extreme(values, 10, np.minimum), [[-1.0, -1.0, 2.0]])
+
+
+def test_analyze_profiles_matches_legacy_loops():
+    rng = np.random.default_rng(0)
+    # Different lengths exercise the NaN padding of the batch matrix
+    profiles = [synthetic_profile(rng, n) for n in (2400, 1234, 250, 11)]
+    results = CompositionEngine().analyze_profiles(profiles)
+
+    assert len(results) == len(profiles)
+    for (times, lufs), result in zip(profiles, results):
+        structure = result["structural_profile"]
+        expected = legacy_structure(times, lufs)
+        assert structure["boredom_flags"] == expected["boredom_flags"]
+        assert structure["drop_points"] == expected["drop_points"]
+        assert structure["stats"]["duration"] == float(times[-1])
+
+
+def test_analyze_profiles_empty():
+    engine = CompositionEngine()
+    assert engine.analyze_profiles([]) == []
+    result = engine.analyze_profiles([(np.array([]), np.array([]))])[0]
+    assert result["structural_profile"]["boredom_flags"] == []
+    assert result["structural_profile"]["drop_points"] == []
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+from totality_engine.core.features import FeatureGraph, HOP_LENGTH, N_FFT
+
+SR = 22050
+
+
+@pytest.fixture(scope="module")
+def signal():
+    """Four seconds of a plucked A-major arpeggio with a click track, so onsets and beats are well defined."""
+    t = np.arange(int(4 * SR)) / SR
+    y = np.zeros_like(t)
+    for i, freq in enumerate([220.0, 277.18, 329.63, 440.0] * 4):
+        start = int(i * 0.25 * SR)
+        seg = t[:len(t) - start]
+        y[start:] += np.sin(2 * np.pi * freq * seg) * np.exp(-6.0 * seg)
+    return (0.3 * y).astype(np.float32)
+
+
+@pytest.fixture
+def graph(signal):
+    return FeatureGraph(signal, SR)
+
+
+def test_stft_magnitude_matches_librosa(graph, signal):
+    expected = np.abs(librosa.stft(signal, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    np.testing.assert_allclose(graph["stft_magnitude"], expected, rtol=1e-5, atol=1e-6)
+
+
+def test_mel_matches_melspectrogram(graph, signal):
+    expected = librosa.feature.melspectrogram(y=signal, sr=SR, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    np.testing.assert_allclose(graph["mel"], expected, rtol=1e-4, atol=1e-6)
+
+
+def test_onset_envelope_matches_onset_strength(graph, signal):
+    expected = librosa.onset.onset_strength(y=signal, sr=SR, hop_length=HOP_LENGTH)
+    np.testing.assert_allclose(graph["onset_envelope"], expected, rtol=1e-4, atol=1e-4)
+
+
+def test_beats_match_beat_track(graph, signal):
+    tempo, frames = librosa.beat.beat_track(y=signal, sr=SR, hop_length=HOP_LENGTH)
+    graph_tempo, graph_frames = graph["beats"]
+    assert graph_tempo == pytest.approx(float(np.atleast_1d(tempo)[0]))
+    # The onset envelope differs from librosa's only by float rounding, which can move a beat by one frame
+    assert len(graph_frames) == len(frames)
+    assert np.max(np.abs(graph_frames - frames)) <= 1
+
+
+def test_cqt_chroma_matches_chroma_cqt(graph, signal):
+    expected = librosa.feature.chroma_cqt(y=signal, sr=SR, hop_length=HOP_LENGTH)
+    np.testing.assert_allclose(graph["cqt_chroma"], expected, rtol=1e-5, atol=1e-6)
+
+
+def test_nodes_are_memoized(graph):
+    assert "stft_magnitude" not in graph
+    onset = graph["onset_envelope"]
+    # Dependencies were computed along the way and are reused as the same objects
+    assert "stft_magnitude" in graph and "mel" in graph
+    assert graph["onset_envelope"] is onset
+    assert set(graph.timings) == {"stft_magnitude", "mel", "onset_envelope"}
+
+
+def test_unknown_feature(graph):
+    with pytest.raises(KeyError):
+        graph["nope"]
@@ -0,0 +1,246 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+sqlmodel = pytest.importorskip("sqlmodel")
+
+from sqlmodel import Session, create_engine
+
+from totality_engine.core import jobs
+from totality_engine.core.jobs import JobEventLog, JobStore, MemoryJobStore, SQLJobStore, get_job_store
+from totality_engine.core.results import decode_results
+from totality_engine.core.schema import AnalysisJob
+
+RESULT = {"creative": {"tempo": 120.0, "embedding": [0.1, 0.2]}, "loudness": {"lufs_i": -14.0}}
+
+
+@pytest.fixture
+def engine():
+    return create_engine("sqlite://")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_memory_store_copies_records():
+    store = MemoryJobStore()
+    store.create("a", {"status": "queued", "metadata": {"x": 1}})
+    record = store.get("a")
+    record["status"] = "tampered"
+    assert store.get("a")["status"] == "queued"
+
+    store.update("a", status="completed", result=RESULT)
+    assert store.get("a")["result"] == RESULT
+    store.delete("a")
+    assert store.get("a") is None
+    store.update("a", status="running") # unknown ids are ignored
+
+
+def test_memory_store_evicts_finished_jobs_only(clock):
+    store = MemoryJobStore(max_jobs=2)
+    store.create("active", {"status": "running"})
+    for job_id in ("done1", "done2"):
+        store.create(job_id, {"status": "queued"})
+        store.update(job_id, status="completed")
+
+    assert store.get("active") is not None
+    assert store.get("done1") is None
+    assert store.get("done2") is not None
+
+    store.create("active2", {"status": "running"})
+    store.create("active3", {"status": "running"})
+    # Over the limit, but active jobs are never dropped
+    assert len(store) == 3
+    assert store.get("done2") is None
+
+
+def test_memory_store_ttl(clock):
+    store = MemoryJobStore(ttl_sec=10)
+    store.create("a", {"status": "queued"})
+    store.update("a", status="failed", error="boom")
+    clock[0] += 5
+    assert store.get("a")["error"] == "boom"
+    clock[0] += 6
+    assert store.get("a") is None
+
+
+def test_sql_store_round_trip(engine):
+    store = SQLJobStore(engine)
+    store.create("job", {"status": "queued", "submitted_at": "2026-01-02", "metadata": {"profile": "full"}})
+    assert store.get("job") == {"status": "queued", "submitted_at": "2026-01-02", "metadata": {"profile": "full"}}
+
+    store.update("job", status="completed", result=RESULT)
+    record = store.get("job")
+    assert record["status"] == "completed"
+    assert record["result"] == RESULT
+
+    with Session(engine) as session:
+        row = session.get(AnalysisJob, "job")
+        assert row.result_json is None
+        assert decode_results(row.result_blob) == RESULT
+        assert row.owner == store.owner
+
+    store.delete("job")
+    assert store.get("job") is None
+
+
+def test_sql_store_reads_legacy_json_results(engine):
+    store = SQLJobStore(engine)
+    with Session(engine) as session:
+        session.add(AnalysisJob(id="old", status="completed", result_json='{"profile": "quick"}'))
+        session.commit()
+    assert store.get("old")["result"] == {"profile": "quick"}
+
+
+def test_sql_store_purges_old_finished_jobs(engine):
+    store = SQLJobStore(engine, retention_sec=60)
+    for job_id, status in (("old-done", "completed"), ("old-running", "running"), ("new-done", "failed")):
+        store.create(job_id, {"status": status})
+    with Session(engine) as session:
+        for job_id in ("old-done", "old-running"):
+            row = session.get(AnalysisJob, job_id)
+            row.updated_at = datetime.utcnow() - timedelta(seconds=120)
+            session.add(row)
+        session.commit()
+
+    assert store.purge() == 1
+    assert store.get("old-done") is None
+    assert store.get("old-running") is not None
+    assert store.get("new-done") is not None
+
+
+def test_recover_fails_only_orphaned_jobs(engine, monkeypatch):
+    store = SQLJobStore(engine, stale_sec=3600)
+    store.create("mine", {"status": "running"})
+    store.create("live-peer", {"status": "running"})
+    store.create("dead-peer", {"status": "running"})
+    store.create("restarted", {"status": "running"})
+    store.create("other-host", {"status": "running"})
+    store.create("stale", {"status": "running"})
+    store.create("finished", {"status": "completed"})
+
+    live_pid, dead_pid = os.getpid() + 1, os.getpid() + 2
+    monkeypatch.setattr(SQLJobStore, "_pid_alive", staticmethod(lambda pid: pid == live_pid))
+    owners = {
+        "live-peer": f"{store.host}:{live_pid}:aaaaaaaa",
+        "dead-peer": f"{store.host}:{dead_pid}:bbbbbbbb",
+        # Same pid as this process but an earlier token: a previous container run
+        "restarted": f"{store.host}:{os.getpid()}:cccccccc",
+        "other-host": f"elsewhere:{dead_pid}:dddddddd",
+        "stale": f"elsewhere:{live_pid}:eeeeeeee",
+    }
+    with Session(engine) as session:
+        for job_id, owner in owners.items():
+            row = session.get(AnalysisJob, job_id)
+            row.owner = owner
+            if job_id == "stale":
+                row.updated_at = datetime.utcnow() - timedelta(hours=2)
+            session.add(row)
+        session.commit()
+
+    # Another store in this process shares the owner token, so its jobs count as live
+    assert SQLJobStore(engine).owner == store.owner
+    assert store.recover() == 3
+    statuses = {job_id: store.get(job_id)["status"] for job_id in list(owners) + ["mine", "finished"]}
+    assert statuses == {
+        "live-peer": "running",
+        "dead-peer": "failed",
+        "restarted": "failed",
+        "other-host": "running",
+        "stale": "failed",
+        "mine": "running",
+        "finished": "completed",
+    }
+    assert store.get("dead-peer")["error"] == "Interrupted by a server restart"
+
+
+def test_backed_store_serves_results_from_database(engine):
+    store = get_job_store("sqlite", engine=engine, max_jobs=1)
+    store.create("a", {"status": "queued", "metadata": {}})
+    store.update("a", status="completed", result=RESULT)
+    # Memory keeps status only
+    assert "result" not in store._jobs["a"]
+    assert store.get("a")["result"] == RESULT
+
+    store.create("b", {"status": "queued", "metadata": {}})
+    store.update("b", status="completed", result=RESULT)
+    # "a" was evicted from memory but is still in the database
+    assert "a" not in store._jobs
+    assert store.get("a")["status"] == "completed"
+
+
+def test_backed_store_caches_decoded_results(engine, monkeypatch):
+    store = get_job_store("sqlite", engine=engine)
+    store.create("a", {"status": "queued", "metadata": {}})
+    store.update("a", status="completed", result=RESULT)
+    loads = []
+    backing_get = store.backing.get
+    monkeypatch.setattr(store.backing, "get", lambda job_id: loads.append(job_id) or backing_get(job_id))
+
+    for _ in range(3):
+        record = store.get("a")
+        assert record["result"] == RESULT
+        record["status"] = "tampered"
+    assert loads == ["a"]
+
+    # Writes invalidate the cached record
+    store.update("a", status="completed", result={"profile": "quick"})
+    assert store.get("a")["result"] == {"profile": "quick"}
+    assert loads == ["a", "a"]
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_result_cache_is_bounded(engine):
+    store = MemoryJobStore(backing=SQLJobStore(engine), result_cache=2)
+    for job_id in ("a", "b", "c"):
+        store.create(job_id, {"status": "queued"})
+        store.update(job_id, status="completed", result=RESULT)
+        store.get(job_id)
+    assert list(store._results) == ["b", "c"]
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+
+def test_get_job_store_kinds(engine):
+    assert isinstance(get_job_store("memory"), MemoryJobStore)
+    with pytest.raises(ValueError):
+        get_job_store("sqlite")
+    with pytest.raises(ValueError):
+        get_job_store("redis", engine=engine)
+
+
+def test_event_log_streams_open_jobs():
+    log = JobEventLog()
+    log.open("a")
+    log.publish("a", {"stage": "loudness"})
+    log.publish("a", {"stage": "creative"})
+    assert log.since("a") == [{"stage": "loudness"}, {"stage": "creative"}]
+    assert log.since("a", 1) == [{"stage": "creative"}]
+    assert log.since("unknown") == []
+
+
+def test_event_log_ignores_events_after_close(clock):
+    log = JobEventLog(retention_sec=10)
+    log.open("a")
+    log.publish("a", {"stage": "loudness"})
+    log.close("a")
+    # A late event (e.g. drained after the job finished) is not stored
+    log.publish("a", {"stage": "late"})
+    assert log.since("a") == [{"stage": "loudness"}]
+
+    clock[0] += 11
+    log.close("b") # expiry runs on close
+    assert log.since("a") == []
+    log.publish("a", {"stage": "later"})
+    log.publish("never-opened", {"stage": "x"})
+    assert log._events == {}
+
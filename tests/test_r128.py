@@ -0,0 +1,98 @@
+import shutil
+
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from totality_engine.core import r128
+from totality_engine.core.loudness import LoudnessScanner, find_ffmpeg
+
+SR = 48000
+
+
+def sine(freq, seconds, dbfs=0.0, phase=0.0, sr=SR):
+    t = np.arange(int(seconds * sr)) / sr
+    return 10.0 ** (dbfs / 20.0) * np.sin(2 * np.pi * freq * t + phase)
+
+
+def stereo(y):
+    return np.stack([y, y])
+
+
+# EBU Tech 3341 uses a 997 Hz tone, where K-weighting is within 0.01 dB of flat
+
+@pytest.mark.parametrize("sr", [44100, 48000])
+def test_full_scale_sine_reads_zero_lufs_in_stereo(sr):
+    result = r128.measure(stereo(sine(997, 10, sr=sr)), sr)
+    assert result["summary"]["lufs_i"] == pytest.approx(0.0, abs=0.1)
+
+
+def test_full_scale_sine_reads_minus_three_lufs_in_mono():
+    result = r128.measure(sine(997, 10), SR)
+    assert result["summary"]["lufs_i"] == pytest.approx(-3.0, abs=0.1)
+
+
+def test_tech_3341_minus_23_dbfs():
+    result = r128.measure(stereo(sine(997, 20, dbfs=-23.0)), SR)
+    assert result["summary"]["lufs_i"] == pytest.approx(-23.0, abs=0.1)
+    # Steady tone: every momentary value reads the same
+    np.testing.assert_allclose(result["timeseries"]["lufs"], -23.0, atol=0.1)
+    assert result["timeseries"]["t"][0] == pytest.approx(0.4)
+
+
+def test_relative_gate_ignores_quiet_passage():
+    # Tech 3341 case 3: the -36 dBFS section sits below the -10 LU relative gate
+    y = np.concatenate([sine(997, 10, dbfs=-36.0), sine(997, 60, dbfs=-23.0), sine(997, 10, dbfs=-36.0)])
+    assert r128.measure(stereo(y), SR)["summary"]["lufs_i"] == pytest.approx(-23.0, abs=0.1)
+
+
+def test_silence_is_gated():
+    result = r128.measure(np.zeros((2, SR * 5)), SR)
+    assert result["summary"]["lufs_i"] == r128.ABSOLUTE_GATE_LUFS
+    assert result["summary"]["lra"] == 0.0
+    assert result["timeseries"]["lufs"].size == 0
+
+
+@pytest.mark.parametrize("levels, expected", [
+    ((-20.0, -30.0), 10.0), # Tech 3342 case 1
+    ((-20.0, -15.0), 5.0),  # Tech 3342 case 2
+])
+def test_stepped_level_loudness_range(levels, expected):
+    y = np.concatenate([sine(1000, 20, dbfs=level) for level in levels])
+    assert r128.measure(stereo(y), SR)["summary"]["lra"] == pytest.approx(expected, abs=1.0)
+
+
+def test_true_peak_finds_inter_sample_peak():
+    # fs/4 tone at 45 degrees: every sample lands at +-0.707, the waveform peaks at 1.0 in between
+    y = sine(SR / 4, 1, phase=np.pi / 4)
+    assert 20 * np.log10(np.max(np.abs(y))) == pytest.approx(-3.01, abs=0.01)
+    assert r128.true_peak(y, SR) == pytest.approx(0.0, abs=0.4)
+    assert r128.measure(stereo(y), SR)["summary"]["true_peak"] == pytest.approx(0.0, abs=0.4)
+
+
+def test_true_peak_chunking_matches_single_pass():
+    y = stereo(sine(SR / 4, 3, dbfs=-6.0, phase=np.pi / 4))
+    assert r128.true_peak(y, SR, chunk_sec=0.25) == pytest.approx(r128.true_peak(y, SR, chunk_sec=10.0), abs=1e-6)
+
+
+@pytest.mark.skipif(shutil.which(find_ffmpeg()) is None, reason="ffmpeg not installed")
+def test_matches_ffmpeg_ebur128(tmp_path):
+    soundfile = pytest.importorskip("soundfile")
+    rng = np.random.default_rng(0)
+    # Level steps plus noise, so every summary value is non-trivial
+    y = np.concatenate([sine(440, 8, dbfs=-18.0), sine(220, 8, dbfs=-28.0), sine(880, 8, dbfs=-12.0)])
+    y = stereo(y) + 0.01 * rng.normal(size=(2, len(y)))
+    path = tmp_path / "steps.wav"
+    soundfile.write(str(path), y.T, SR, subtype="FLOAT")
+
+    expected = LoudnessScanner().scan(str(path))
+    assert "error" not in expected
+    native = r128.measure(y, SR)
+
+    for key in ("lufs_i", "lra", "true_peak"):
+        assert native["summary"][key] == pytest.approx(expected["summary"][key], abs=0.2), key
+    times, lufs = expected["timeseries"]["t"], expected["timeseries"]["lufs"]
+    n = min(len(times), len(native["timeseries"]["t"]))
+    np.testing.assert_allclose(native["timeseries"]["t"][:n], times[:n], atol=0.051)
+    np.testing.assert_allclose(native["timeseries"]["lufs"][:n], lufs[:n], atol=0.3)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from totality_engine.core import registry
+from totality_engine.core.registry import ModelLoadError, ModelRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(registry.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_model_is_loaded_once():
+    models = ModelRegistry()
+    calls = []
+    loader = lambda: calls.append(1) or {"weights": b"x" * 10}
+    assert models.get("m", loader) is models.get("m", loader)
+    assert len(calls) == 1
+    assert models.stats()["models"]["m"]["hits"] == 2
+
+
+def test_failed_load_is_retried_after_retry_sec(clock):
+    models = ModelRegistry(retry_sec=60)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("download timed out")
+        return "model"
+
+    for _ in range(2):
+        with pytest.raises(ModelLoadError, match="download timed out"):
+            models.get("m", flaky)
+    assert len(calls) == 1 # remembered, not retried on every call
+    assert models.stats()["failed"] == {"m": "download timed out"}
+
+    clock[0] += 61
+    assert models.get("m", flaky) == "model"
+    assert len(calls) == 2
+    assert models.stats()["failed"] == {}
+
+
+def test_get_instance_creates_one_registry(monkeypatch):
+    monkeypatch.setattr(ModelRegistry, "_instance", None)
+    created = []
+    original_init = ModelRegistry.__init__
+
+    def slow_init(self, *args, **kwargs):
+        created.append(self)
+        time.sleep(0.01) # widen the window between the None check and the assignment
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(ModelRegistry, "__init__", slow_init)
+    instances = []
+    threads = [threading.Thread(target=lambda: instances.append(ModelRegistry.get_instance())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(instance is instances[0] for instance in instances)
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("torch")
+
+from totality_engine.engines.creative.resonance import ResonanceEngine
+
+chunk_lyrics = ResonanceEngine.chunk_lyrics
+
+
+def word_counts(texts):
+    return [len(text.split()) for text in texts]
+
+
+LYRICS = """I walked the empty road tonight
+the streetlights humming low
+
+and every window that I passed
+was someone else's home
+a long long long long long long long long line
+
+Oh oh oh
+"""
+
+
+def test_chunks_stay_within_sections_and_budget():
+    chunks = chunk_lyrics(LYRICS, word_counts, max_tokens=10)
+
+    assert [c["section"] for c in chunks] == [0, 1, 1, 2]
+    assert [c["lines"] for c in chunks] == [[0, 1], [3, 4], [5, 5], [7, 7]]
+    assert chunks[0]["text"] == "I walked the empty road tonight\nthe streetlights humming low"
+    assert [c["tokens"] for c in chunks] == [10, 10, 10, 3]
+    assert all(c["tokens"] <= 10 for c in chunks)
+
+
+def test_overlong_line_is_its_own_chunk():
+    chunks = chunk_lyrics("short line\n" + " ".join(["word"] * 30) + "\nend", word_counts, max_tokens=8)
+    assert [c["lines"] for c in chunks] == [[0, 0], [1, 1], [2, 2]]
+    assert chunks[1]["tokens"] == 30
+
+
+def test_chunks_cover_every_line_once():
+    chunks = chunk_lyrics(LYRICS, word_counts, max_tokens=4)
+    text_lines = [line.strip() for line in LYRICS.splitlines() if line.strip()]
+    assert [line for c in chunks for line in c["text"].split("\n")] == text_lines
+
+
+def test_repeated_blank_lines_start_one_section():
+    chunks = chunk_lyrics("a b\n\n\n\nc d\n", word_counts, max_tokens=100)
+    assert [(c["section"], c["lines"]) for c in chunks] == [(0, [0, 0]), (1, [4, 4])]
+
+
+def test_empty_lyrics():
+    assert chunk_lyrics("", word_counts, 10) == []
+    assert chunk_lyrics("\n \n", word_counts, 10) == []
@@ -0,0 +1,174 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+sqlmodel = pytest.importorskip("sqlmodel")
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine
+
+from totality_engine.core import results
+from totality_engine.core.embeddings import set_embedding
+from totality_engine.core.schema import AnalysisResult, StageOutput
+
+EMBEDDING = [0.25, -0.5, 0.125, 1.0]
+RESULT = {
+    "profile": "full",
+    "creative": {"tempo": 128.0, "status": "ok", "embedding": EMBEDDING},
+    "loudness": {"lufs_i": -9.5, "timeline": [{"t": i / 10, "lufs": -10.0 - i % 7} for i in range(500)]},
+    "resonance": {"dissonance_score": 0.4, "vibe": "Bittersweet", "text": "naïve ✓"},
+}
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_encode_decode_round_trip():
+    blob = results.encode_results(RESULT)
+    assert isinstance(blob, bytes)
+    assert results.decode_results(blob) == RESULT
+    assert len(blob) < len(json.dumps(RESULT)) / 4
+
+
+def test_store_and_load_reattaches_embedding():
+    row = AnalysisResult(filename="a.wav", status="completed")
+    set_embedding(row, EMBEDDING, model="test")
+    results.store_results(row, RESULT, ttl_days=1)
+
+    # The blob holds everything but the embedding, which lives in its own column
+    stored = results.decode_results(row.results_blob)
+    assert "embedding" not in stored["creative"]
+    assert row.raw_json == ""
+    assert results.load_results(row) == RESULT
+    assert "embedding" not in results.load_results(row, with_embedding=False)["creative"]
+    # The caller's dict is untouched
+    assert RESULT["creative"]["embedding"] == EMBEDDING
+
+
+def test_load_expired_and_legacy_rows():
+    row = AnalysisResult(filename="a.wav", status="completed")
+    results.store_results(row, RESULT, ttl_days=1)
+    row.results_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert results.load_results(row) is None
+
+    results.store_results(row, RESULT, ttl_days=None)
+    assert row.results_expires_at is None
+
+    legacy = AnalysisResult(filename="b.wav", status="completed", raw_json=json.dumps(RESULT))
+    assert results.load_results(legacy) == RESULT
+    assert results.load_results(AnalysisResult(filename="c.wav", status="failed")) is None
+
+
+def test_purge_expired_results(engine):
+    with Session(engine) as session:
+        for name, ttl in (("old.wav", -1), ("new.wav", 1)):
+            row = AnalysisResult(filename=name, status="completed")
+            set_embedding(row, EMBEDDING)
+            results.store_results(row, RESULT, ttl_days=ttl)
+            session.add(row)
+        session.commit()
+
+    assert results.purge_expired_results(engine, batch_size=1) == 1
+    with Session(engine) as session:
+        rows = {row.filename: row for row in session.exec(sqlmodel.select(AnalysisResult)).all()}
+        assert rows["old.wav"].results_blob is None
+        assert rows["old.wav"].embedding is not None
+        assert results.load_results(rows["new.wav"]) == RESULT
+
+
+def test_ensure_result_columns_migrates_old_table():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE analysisresult (id INTEGER PRIMARY KEY, filename VARCHAR, "
+                          "timestamp DATETIME, status VARCHAR, raw_json VARCHAR)"))
+    assert sorted(results.ensure_result_columns(engine)) == ["results_blob", "results_expires_at"]
+    columns = {c["name"] for c in inspect(engine).get_columns("analysisresult")}
+    assert {"results_blob", "results_expires_at"} <= columns
+    assert results.ensure_result_columns(engine) == []
+
+
+BASELINE_TABLE = (
+    "CREATE TABLE analysisresult (id INTEGER PRIMARY KEY, filename VARCHAR NOT NULL, timestamp DATETIME, "
+    "status VARCHAR NOT NULL, raw_json VARCHAR NOT NULL, embedding_json VARCHAR, dissonance_score FLOAT, "
+    "vibe_descriptor VARCHAR, lyrical_sentiment VARCHAR, artist_id VARCHAR, markets VARCHAR)"
+)
+
+
+def baseline_engine(tmp_path):
+    """A database created before the binary-embedding and compressed-results columns existed."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_TABLE))
+        conn.execute(text(
+            "INSERT INTO analysisresult (filename, timestamp, status, raw_json, embedding_json) "
+            "VALUES ('a.wav', '2024-01-01 00:00:00', 'success', :raw, :embedding)"
+        ), {"raw": json.dumps(RESULT), "embedding": json.dumps(EMBEDDING)})
+    return engine
+
+
+def test_ensure_analysis_result_columns_covers_every_column(tmp_path):
+    engine = baseline_engine(tmp_path)
+    added = results.ensure_analysis_result_columns(engine)
+    assert set(added) == {"embedding", "embedding_dim", "embedding_dtype", "embedding_model",
+                          "results_blob", "results_expires_at"}
+    assert results.ensure_analysis_result_columns(engine) == []
+    with Session(engine) as session:
+        row = session.get(AnalysisResult, 1)
+        assert results.load_results(row) == RESULT
+
+
+def test_migrate_embeddings_on_baseline_database(tmp_path):
+    from totality_engine.core.embeddings import migrate_embeddings
+
+    engine = baseline_engine(tmp_path)
+    assert migrate_embeddings(engine) == 1
+    assert results.purge_expired_results(engine) == 0
+    with Session(engine) as session:
+        row = session.get(AnalysisResult, 1)
+        assert row.embedding_json is None and row.embedding_dim == len(EMBEDDING)
+        assert results.load_results(row) == RESULT
+
+
+def test_result_summary():
+    summary = results.result_summary(RESULT)
+    assert summary == {"profile": "full", "tempo": 128.0, "lufs_i": -9.5, "dissonance_score": 0.4,
+                       "vibe": "Bittersweet", "embedding_status": "ok"}
+
+
+def test_partial_result_drops_embeddings():
+    partial = results.partial_result({"embedding": [1.0], "timeline": [{"t": 0, "embedding": [1.0]}], "x": 1})
+    assert partial == {"timeline": [{"t": 0}], "x": 1}
+    assert results.partial_result([1, 2]) == [1, 2]
+
+
+def test_stage_outputs_round_trip(engine):
+    results.ensure_stage_output_table(engine)
+    refs = {
+        "loudness": results.save_stage_output(engine, "job-1", "loudness", RESULT["loudness"]),
+        "creative": results.save_stage_output(engine, "job-1", "creative", RESULT["creative"]),
+    }
+    other = results.save_stage_output(engine, "job-2", "loudness", {"lufs_i": -20.0})
+
+    assert results.load_stage_outputs(engine, refs) == {"loudness": RESULT["loudness"], "creative": RESULT["creative"]}
+    assert results.load_stage_outputs(engine, {}) == {}
+
+    assert results.delete_stage_outputs(engine, "job-1") == 2
+    assert results.load_stage_outputs(engine, refs) == {}
+    assert results.load_stage_outputs(engine, {"loudness": other}) == {"loudness": {"lufs_i": -20.0}}
+
+
+def test_purge_stage_outputs(engine):
+    ref = results.save_stage_output(engine, "job", "loudness", {"lufs_i": -9.0})
+    assert results.purge_stage_outputs(engine) == 0
+    with Session(engine) as session:
+        row = session.get(StageOutput, ref)
+        row.created_at = datetime.utcnow() - timedelta(days=2)
+        session.add(row)
+        session.commit()
+    assert results.purge_stage_outputs(engine) == 1
+    assert results.load_stage_outputs(engine, {"loudness": ref}) == {}
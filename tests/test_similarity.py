@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+
+from totality_engine.core import similarity
+from totality_engine.core.similarity import SimilarityIndex
+
+DIM = 32
+
+
+def clustered_vectors(n, clusters=8, seed=0):
+    """Unit vectors around a few directions, like genre clusters of track embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def brute_force(vectors, ids, query, k, exclude=()):
+    scores = vectors @ (query / np.linalg.norm(query))
+    ranked = [(int(ids[i]), float(scores[i])) for i in np.argsort(-scores, kind="stable")]
+    return [(i, s) for i, s in ranked if i not in set(exclude)][:k]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    vectors = clustered_vectors(600)
+    ids = np.arange(1000, 1000 + len(vectors))
+    return ids, vectors
+
+
+def assert_same_ranking(results, expected):
+    assert [i for i, _ in results] == [i for i, _ in expected]
+    np.testing.assert_allclose([s for _, s in results], [s for _, s in expected], atol=1e-5)
+
+
+def test_exact_search_matches_brute_force(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="exact")
+    assert index.add(ids, vectors, model="test") == len(ids)
+
+    for row in (0, 17, 599):
+        query = vectors[row]
+        assert_same_ranking(index.search(query, k=10), brute_force(vectors, ids, query, 10))
+        # The track itself is ranked first unless excluded
+        assert index.search(query, k=1)[0][0] == ids[row]
+        assert_same_ranking(index.search(query, k=5, exclude=[ids[row]]),
+                            brute_force(vectors, ids, query, 5, exclude=[ids[row]]))
+
+
+def test_zero_vectors_are_skipped(tmp_path):
+    index = SimilarityIndex(str(tmp_path), kind="exact")
+    vectors = clustered_vectors(3)
+    vectors[1] = 0.0
+    assert index.add([1, 2, 3], vectors) == 2
+    assert index.vector_for(2) is None
+    assert index.search(np.zeros(DIM)) == []
+
+
+def test_ivf_probing_every_list_is_exact(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="ivf", nlist=8, nprobe=8, use_pq=False)
+    index.add(ids, vectors)
+    # Appends never train the lists themselves
+    assert not index._use_ivf() and index.needs_build()
+    index.build()
+    assert index._use_ivf() and not index.needs_build()
+
+    for row in (3, 250, 512):
+        query = vectors[row]
+        assert_same_ranking(index.search(query, k=10), brute_force(vectors, ids, query, 10))
+
+
+def test_ivf_includes_vectors_added_after_build(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="ivf", nlist=8, nprobe=1, use_pq=False)
+    index.add(ids, vectors)
+    index.build()
+    extra = clustered_vectors(5, seed=1)
+    index.add([1, 2, 3, 4, 5], extra)
+    # Unclustered tail vectors are always scored
+    assert index.search(extra[2], k=1)[0][0] == 3
+
+
+def test_tail_limits_trigger_a_build(tmp_path, catalog, monkeypatch):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="ivf", nlist=8, use_pq=False)
+    index.add(ids[:500], vectors[:500])
+    index.build()
+    index.add(ids[500:550], vectors[500:550])
+    assert not index.needs_build() # 50 rows, under 20% of 500
+    monkeypatch.setattr(similarity, "MAX_TAIL_ROWS", 40)
+    assert index.needs_build()
+    assert SimilarityIndex(str(tmp_path), kind="exact").needs_build() is False
+
+
+def test_ivf_recall_with_few_probes(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="ivf", nlist=8, nprobe=3, use_pq=False)
+    index.add(ids, vectors)
+    index.build()
+
+    hits = total = 0
+    for row in range(0, len(vectors), 20):
+        truth = {i for i, _ in brute_force(vectors, ids, vectors[row], 10)}
+        hits += len(truth & {i for i, _ in index.search(vectors[row], k=10)})
+        total += len(truth)
+    assert hits / total >= 0.9
+
+
+def test_dimension_mismatch(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="exact")
+    index.add(ids[:10], vectors[:10])
+    with pytest.raises(ValueError):
+        index.add([1], np.ones((1, DIM + 1)))
+
+
+def test_pq_rerank_matches_exact_ranking(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="exact", rerank=10)
+    index.add(ids, vectors)
+    report = index.train_pq(pca_dim=16, m=4, ks=64, iters=10)
+    assert report["m"] == 4 and report["bytes_per_vector"] == 4
+    assert report["recall"]["recall_rerank"] >= report["recall"]["recall_adc"]
+    assert report["recall"]["recall_rerank"] >= 0.9
+
+    hits = total = 0
+    for row in range(0, len(vectors), 20):
+        truth = brute_force(vectors, ids, vectors[row], 10)
+        results = index.search(vectors[row], k=10)
+        # Re-ranked scores are exact cosine similarities
+        exact = dict(brute_force(vectors, ids, vectors[row], len(ids)))
+        for track_id, score in results:
+            assert score == pytest.approx(exact[track_id], abs=1e-5)
+        hits += len({i for i, _ in truth} & {i for i, _ in results})
+        total += len(truth)
+    assert hits / total >= 0.9
+
+
+def test_pq_codes_follow_appends_and_rebuild(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="exact", rerank=10)
+    index.add(ids[:500], vectors[:500])
+    index.train_pq(pca_dim=None, m=8, ks=64, iters=10, evaluate=False)
+
+    # Appended vectors are encoded with the trained codec and found through it
+    index.add(ids[500:], vectors[500:])
+    assert np.array_equal(index._codes[550], index._pq.encode(index.vector_for(ids[550])[None, :])[0])
+    assert ids[550] in [i for i, _ in index.search(vectors[550], k=10)]
+
+    assert index.rebuild(ids, vectors) == len(ids)
+    assert index._meta["pq"]["m"] == 8
+    assert ids[42] in [i for i, _ in index.search(vectors[42], k=10)]
+
+
+def test_vector_for_follows_appends_and_rebuilds(tmp_path, catalog):
+    ids, vectors = catalog
+    index = SimilarityIndex(str(tmp_path), kind="exact")
+    index.add(ids[:100], vectors[:100])
+    np.testing.assert_allclose(index.vector_for(ids[7]), vectors[7], atol=1e-6)
+    assert index.vector_for(5) is None
+
+    # A re-added id resolves to its latest vector, also from another reader
+    index.add([ids[7]], vectors[300:301])
+    np.testing.assert_allclose(index.vector_for(ids[7]), vectors[300], atol=1e-6)
+    np.testing.assert_allclose(SimilarityIndex(str(tmp_path)).vector_for(ids[7]), vectors[300], atol=1e-6)
+
+    # A rebuild with the same count but other ids resets the lookup
+    index.rebuild(ids[200:301], vectors[200:301])
+    assert index.vector_for(ids[7]) is None
+    np.testing.assert_allclose(index.vector_for(ids[250]), vectors[250], atol=1e-6)
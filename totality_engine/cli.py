@@ -9,14 +9,20 @@ from totality_engine.engines.creative.lyrical import LyricalEngine
 from totality_engine.engines.creative.composition import CompositionEngine
 from totality_engine.engines.creative.album_architect import AlbumArchitectEngine
 from totality_engine.engines.creative.context import ContextEngine
+from totality_engine.core.config import ConfigLoader
+from totality_engine.engines.hit_science.profiles import PROFILES
 
 def handle_hit_science(args):
-    pipeline = HitSciencePipeline()
+    config = ConfigLoader(args.config).load()
+    if args.no_cache:
+        config["cache"] = dict(config.get("cache", {}), enabled=False)
+    pipeline = HitSciencePipeline(config)
     metadata = {
         "lyrics": args.lyrics,
         "artist_id": args.artist,
         "platform": args.platform,
-        "target_markets": args.markets.split(",") if args.markets else []
+        "target_markets": args.markets.split(",") if args.markets else [],
+        "profile": args.profile
     }
     
     try:
@@ -39,7 +45,7 @@ def handle_creative(args):
         engine = CompositionEngine()
         input_data = args.input
     elif args.engine == "album":
-        engine = AlbumArchitectEngine()
+        engine = AlbumArchitectEngine({"album": {"workers": args.workers, "manifest": not args.no_manifest}})
         input_data = args.input
     elif args.engine == "context":
         engine = ContextEngine()
@@ -52,6 +58,68 @@ def handle_creative(args):
     result = engine.analyze(input_data)
     print(json.dumps(result, indent=2))
 
+def handle_migrate_embeddings(args):
+    from totality_engine.core.embeddings import migrate_embeddings
+    from totality_engine.core.results import ensure_analysis_result_columns
+    engine = create_engine(args.db)
+    SQLModel.metadata.create_all(engine)
+    ensure_analysis_result_columns(engine)
+    converted = migrate_embeddings(engine, batch_size=args.batch_size)
+    print(f"Converted {converted} JSON embeddings to float32 blobs.")
+
+def handle_purge_results(args):
+    from totality_engine.core.results import ensure_analysis_result_columns, purge_expired_results
+    engine = create_engine(args.db)
+    ensure_analysis_result_columns(engine)
+    purged = purge_expired_results(engine, batch_size=args.batch_size)
+    print(f"Purged {purged} expired analysis results.")
+
+def handle_similar(args):
+    from totality_engine.core.embeddings import load_embedding_matrix
+    from totality_engine.core.results import ensure_analysis_result_columns
+    from totality_engine.core.similarity import get_similarity_index, similar_tracks
+    engine = create_engine(args.db)
+    ensure_analysis_result_columns(engine)
+    index = get_similarity_index(args.index_dir, kind=args.kind)
+    if args.rebuild:
+        with Session(engine) as session:
+            ids, matrix = load_embedding_matrix(session)
+        print(f"Indexed {index.rebuild(ids, matrix)} embeddings.")
+    elif args.build or index.needs_build():
+        index.build()
+    if args.train_pq:
+        report = index.train_pq(pca_dim=args.pca_dim, m=args.pq_m)
+        print(json.dumps(report, indent=2))
+    if args.track_id is None:
+        print(json.dumps(index.stats(), indent=2))
+        return
+    try:
+        print(json.dumps(similar_tracks(engine, args.track_id, k=args.k, index=index), indent=2))
+    except KeyError:
+        print(f"No embedding for track {args.track_id}")
+
+def handle_serve_inference(args):
+    from totality_engine.core.batching import MicroBatcher, require_authkey, serve
+    # Fail before loading any model
+    require_authkey()
+    from totality_engine.engines.creative.deep_listening import DeepListeningEngine
+    from totality_engine.engines.creative.resonance import ResonanceEngine
+    config = ConfigLoader(args.config).load()
+    # The service runs the models itself: local batchers only
+    config["batching"] = {"enabled": False}
+    deep_listening = DeepListeningEngine(config)
+    resonance = ResonanceEngine(config)
+    options = {"max_batch_size": args.max_batch_size, "max_wait_ms": args.max_wait_ms}
+    # Names match the engines' model keys, which their clients use to address them
+    batchers = {
+        deep_listening.model_key: MicroBatcher(lambda waveforms: list(deep_listening._embed_arrays(waveforms)),
+                                               name="deep_listening", **options),
+        resonance.model_key: MicroBatcher(resonance._score_lyrics, name="resonance", **options),
+    }
+    print(f"Serving inference on {args.socket} (set TOTALITY_INFERENCE_SOCKET={args.socket} "
+          f"and the same TOTALITY_INFERENCE_AUTHKEY in workers)")
+    serve(args.socket, batchers)
+
 def main():
     parser = argparse.ArgumentParser(description="Totality Engine CLI")
     subparsers = parser.add_subparsers(dest="command", help="Sub-command to run")
@@ -63,6 +131,10 @@ def main():
     hs_parser.add_argument("--artist", help="Artist ID", default="unknown_artist")
     hs_parser.add_argument("--platform", help="Target platform", default="Spotify")
     hs_parser.add_argument("--markets", help="Target markets (comma-separated)", default="US,UK")
+    hs_parser.add_argument("--config", help="Engines config file", default="engines_config.yaml")
+    hs_parser.add_argument("--no-cache", help="Recompute every stage, ignoring the feature cache", action="store_true")
+    hs_parser.add_argument("--profile", help="Analysis profile: stages run and their fidelity",
+                           choices=sorted(PROFILES), default=None) # None -> config "profile"
 
     # Creative Subcommand
     creative_parser = subparsers.add_parser("creative", help="Creative Engines Analysis")
@@ -83,18 +155,55 @@ def main():
     # Album
     p_album = creative_subparsers.add_parser("album", help="Album Cohesion Analysis")
     p_album.add_argument("input", help="Directory path")
+    p_album.add_argument("--workers", help="Parallel scan processes", type=int, default=os.cpu_count() or 1)
+    p_album.add_argument("--no-manifest", help="Rescan every track instead of reusing the directory manifest", action="store_true")
 
     # Context
     p_context = creative_subparsers.add_parser("context", help="Context/Genre Benchmarking")
     p_context.add_argument("input", help="Audio file path")
     p_context.add_argument("genre", help="Genre key for benchmarking")
 
+    # Maintenance
+    p_migrate = subparsers.add_parser("migrate-embeddings", help="Convert stored JSON embeddings to binary float32")
+    p_migrate.add_argument("--db", help="Database URL", default="sqlite:///totality.db")
+    p_migrate.add_argument("--batch-size", help="Rows converted per transaction", type=int, default=500)
+
+    p_purge = subparsers.add_parser("purge-results", help="Drop stored analysis results past their expiry")
+    p_purge.add_argument("--db", help="Database URL", default="sqlite:///totality.db")
+    p_purge.add_argument("--batch-size", help="Rows cleared per transaction", type=int, default=500)
+
+    p_similar = subparsers.add_parser("similar", help="Top-k similar stored tracks")
+    p_similar.add_argument("track_id", help="AnalysisResult id (omit to print index stats)", type=int, nargs="?")
+    p_similar.add_argument("--k", help="Number of results", type=int, default=10)
+    p_similar.add_argument("--db", help="Database URL", default="sqlite:///totality.db")
+    p_similar.add_argument("--index-dir", help="Index directory", default=None)
+    p_similar.add_argument("--kind", help="Index type", choices=["auto", "exact", "ivf"], default="auto")
+    p_similar.add_argument("--rebuild", help="Rebuild the index from the database first", action="store_true")
+    p_similar.add_argument("--build", help="Retrain the IVF lists over the indexed vectors", action="store_true")
+    p_similar.add_argument("--train-pq", help="Train PCA + product quantization codes and report recall", action="store_true")
+    p_similar.add_argument("--pca-dim", help="PCA dimensions before quantization", type=int, default=128)
+    p_similar.add_argument("--pq-m", help="Sub-quantizers (bytes per vector)", type=int, default=16)
+
+    p_serve = subparsers.add_parser("serve-inference", help="Shared micro-batching inference service on a Unix socket")
+    p_serve.add_argument("--socket", help="Unix socket path", default="/tmp/totality-inference.sock")
+    p_serve.add_argument("--config", help="Engines config file", default="engines_config.yaml")
+    p_serve.add_argument("--max-batch-size", help="Requests per batch", type=int, default=16)
+    p_serve.add_argument("--max-wait-ms", help="Longest wait for a batch to fill", type=float, default=5.0)
+
     args = parser.parse_args()
 
     if args.command == "hit-science":
         handle_hit_science(args)
     elif args.command == "creative":
         handle_creative(args)
+    elif args.command == "migrate-embeddings":
+        handle_migrate_embeddings(args)
+    elif args.command == "purge-results":
+        handle_purge_results(args)
+    elif args.command == "similar":
+        handle_similar(args)
+    elif args.command == "serve-inference":
+        handle_serve_inference(args)
     else:
         parser.print_help()
 
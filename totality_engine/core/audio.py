@@ -0,0 +1,192 @@
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import librosa
+
+from totality_engine.core.features import FeatureGraph
+from totality_engine.core import streaming
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SR = 22050 # librosa's default analysis rate
+# Above this length, full-track analysis switches to block streaming (bounded memory)
+STREAMING_THRESHOLD_SEC = 20 * 60
+
+
+class AudioContext:
+    """
+    Per-job audio buffer. Decodes the file once at its native sample rate and
+    serves resampled, sliced views to every stage of a pipeline run.
+    Safe to share between concurrently running stages.
+
+    keep_channels: also retain the multichannel decode (for in-process loudness measurement);
+    otherwise only the mono mixdown is kept.
+    streaming_threshold_sec: files longer than this are never decoded whole; short windows are
+    decoded on demand and full-track statistics come from stream_features(). None disables.
+    window_sec: the job only reads the first N seconds; only that window is decoded and the
+    context behaves as if the file ended there.
+    """
+
+    def __init__(self, audio_path: str, keep_channels: bool = False,
+                 streaming_threshold_sec: Optional[float] = STREAMING_THRESHOLD_SEC,
+                 streaming_block_frames: int = 2048, window_sec: Optional[float] = None):
+        self.audio_path = audio_path
+        self.keep_channels = keep_channels
+        self.window_sec = window_sec
+        self.streaming_threshold_sec = streaming_threshold_sec
+        self.streaming_block_frames = streaming_block_frames
+        self._streaming: Optional[bool] = None
+        self._stream_result: Dict[str, Dict[str, Any]] = {}
+        self._native: Optional[np.ndarray] = None
+        self._native_sr: Optional[int] = None
+        self._channels: Optional[np.ndarray] = None
+        self._is_mono = False
+        # Full-length buffers per target sample rate
+        self._buffers: Dict[int, np.ndarray] = {}
+        # Partial buffers keyed by (sr, offset, duration) for slice-only requests
+        self._slices: Dict[Tuple[int, float, Optional[float]], np.ndarray] = {}
+        # Feature graphs per view, so analyzers of the same view share intermediates
+        self._graphs: Dict[Tuple[int, float, Optional[float]], FeatureGraph] = {}
+
+        # One lock per cache entry so different views can be prepared in parallel
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    @property
+    def native_sr(self) -> int:
+        self._decode()
+        return self._native_sr
+
+    @property
+    def duration(self) -> float:
+        if self._native is None:
+            header_duration = streaming.file_duration(self.audio_path)
+            if header_duration is not None:
+                return header_duration if self.window_sec is None else min(header_duration, self.window_sec)
+        self._decode()
+        return len(self._native) / float(self._native_sr)
+
+    @property
+    def streaming(self) -> bool:
+        """True when the file is long enough to be analyzed block-wise instead of decoded whole."""
+        if self._streaming is None:
+            self._streaming = False
+            if self.streaming_threshold_sec is not None and self._native is None:
+                length = streaming.file_duration(self.audio_path)
+                if length is not None and self.window_sec is not None:
+                    length = min(length, self.window_sec)
+                if length is not None and length > self.streaming_threshold_sec:
+                    if streaming.can_stream(self.audio_path):
+                        logger.info(f"{self.audio_path} is {length:.0f}s long; using block streaming.")
+                        self._streaming = True
+                    else:
+                        logger.warning(f"{self.audio_path} is {length:.0f}s long but not block-decodable; decoding whole.")
+        return self._streaming
+
+    def stream_features(self) -> Dict[str, Any]:
+        """Full-track flux, tempo, beat and chroma statistics from one bounded-memory streaming pass."""
+        return self._cached("stream", self._stream_result, "all",
+                            lambda: streaming.StreamingAnalyzer(DEFAULT_SR, self.streaming_block_frames).analyze(self.audio_path))
+
+    def _decode(self):
+        if self._native is not None:
+            return
+        if self.streaming:
+            raise MemoryError(f"Refusing to decode {self.audio_path} whole in streaming mode; request a window or stream_features().")
+        with self._lock_for("native"):
+            if self._native is None:
+                logger.info(f"Decoding {self.audio_path}...")
+                y, sr = librosa.load(self.audio_path, sr=None, mono=False, duration=self.window_sec)
+                self._is_mono = y.ndim == 1
+                if self.keep_channels and not self._is_mono:
+                    self._channels = y
+                self._native_sr = sr
+                self._native = librosa.to_mono(y) if y.ndim > 1 else y
+
+    def load_channels(self) -> Tuple[np.ndarray, int]:
+        """Returns the native-rate decode with channels intact: (channels, n) or (n,) for mono."""
+        self._decode()
+        if self._is_mono:
+            return self._native, self._native_sr
+        if self._channels is not None:
+            return self._channels, self._native_sr
+        with self._lock_for("channels"):
+            if self._channels is None:
+                logger.info(f"Decoding channels of {self.audio_path} (context was created without keep_channels)...")
+                self._channels, _ = librosa.load(self.audio_path, sr=None, mono=False, duration=self.window_sec)
+        return self._channels, self._native_sr
+
+    def _slice_bounds(self, sr: int, offset: float, duration: Optional[float]) -> Tuple[int, Optional[int]]:
+        start = int(round(offset * sr))
+        end = None if duration is None else start + int(round(duration * sr))
+        return start, end
+
+    def _resample(self, y: np.ndarray, sr: int) -> np.ndarray:
+        if sr == self._native_sr:
+            return y
+        return librosa.resample(y, orig_sr=self._native_sr, target_sr=sr)
+
+    def _cached(self, name: str, cache: Dict, key: Hashable, build) -> Any:
+        if key in cache:
+            return cache[key]
+        with self._lock_for((name, key)):
+            if key not in cache:
+                cache[key] = build()
+            return cache[key]
+
+    def load(self, sr: int = DEFAULT_SR, offset: float = 0.0, duration: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """
+        Returns (y, sr) like librosa.load, without touching the file again.
+        Slices are views into the cached buffer; a request for a short slice at
+        a rate that has no full-length buffer yet only resamples that slice.
+        In streaming mode only windows (duration given) are available, decoded straight from the file.
+        """
+        if self.streaming and duration is not None:
+            return self._cached("slice", self._slices, (sr, offset, duration),
+                                lambda: librosa.load(self.audio_path, sr=sr, offset=offset, duration=duration)[0]), sr
+
+        self._decode()
+
+        if sr in self._buffers:
+            start, end = self._slice_bounds(sr, offset, duration)
+            return self._buffers[sr][start:end], sr
+
+        if duration is None and offset == 0.0:
+            return self._cached("buffer", self._buffers, sr, lambda: self._resample(self._native, sr)), sr
+
+        def build_slice():
+            start, end = self._slice_bounds(self._native_sr, offset, duration)
+            return self._resample(self._native[start:end], sr)
+
+        return self._cached("slice", self._slices, (sr, offset, duration), build_slice), sr
+
+    def features(self, sr: int = DEFAULT_SR, offset: float = 0.0, duration: Optional[float] = None) -> FeatureGraph:
+        """Returns the shared FeatureGraph for a view of the signal."""
+        def build_graph():
+            y, _ = self.load(sr=sr, offset=offset, duration=duration)
+            return FeatureGraph(y, sr)
+
+        return self._cached("graph", self._graphs, (sr, offset, duration), build_graph)
+
+    def feature_timings(self) -> Dict[str, Dict[str, float]]:
+        """Per-node compute time (seconds) for every feature graph built in this job."""
+        timings = {}
+        for (sr, offset, duration), graph in list(self._graphs.items()):
+            label = f"{sr}Hz"
+            if offset or duration is not None:
+                label += f"[{offset:g}s:{'end' if duration is None else f'{offset + duration:g}s'}]"
+            timings[label] = {name: round(sec, 4) for name, sec in graph.timings.items()}
+        return timings
+
+    @classmethod
+    def ensure(cls, audio_path: str, audio: Optional["AudioContext"] = None) -> "AudioContext":
+        """Returns the shared context if given, otherwise a private one for this call."""
+        return audio if audio is not None else cls(audio_path)
@@ -0,0 +1,252 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+BATCHING_ENABLED = os.environ.get("TOTALITY_BATCHING", "0") == "1"
+# Unix socket of a shared inference service (serve-inference); requests go there instead of a local batcher
+DEFAULT_ADDRESS = os.environ.get("TOTALITY_INFERENCE_SOCKET") or None
+# Shared secret for the inference socket (multiprocessing.connection handshake). No default:
+# connections exchange pickles, so anyone holding the key can run code in the service.
+DEFAULT_AUTHKEY = os.environ.get("TOTALITY_INFERENCE_AUTHKEY", "").encode() or None
+
+
+def require_authkey(authkey: Optional[bytes] = None) -> bytes:
+    authkey = authkey or DEFAULT_AUTHKEY
+    if not authkey:
+        raise ValueError("The inference service needs a shared secret: set TOTALITY_INFERENCE_AUTHKEY "
+                         "(e.g. `python -c 'import secrets; print(secrets.token_hex(32))'`) in the service and its clients")
+    return authkey
+
+
+class MicroBatcher:
+    """
+    Collects single-item requests from concurrent callers (threads, or socket clients) and
+    runs them through batch_fn together. A batch closes when it reaches max_batch_size or
+    max_wait_ms after its first item arrived, so a lone request waits at most max_wait_ms.
+    batch_fn: List[item] -> List[result], same order.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        if self._closed:
+            raise RuntimeError(f"{self.name} batcher is closed")
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(item).result(timeout)
+
+    def map(self, items: List[Any], timeout: Optional[float] = None) -> List[Any]:
+        """Submits several items at once (they may share batches with other callers)."""
+        futures = [self.submit(item) for item in items]
+        return [f.result(timeout) for f in futures]
+
+    def _collect(self) -> List:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None) # let the loop see the shutdown after this batch
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            # Drop requests whose callers already gave up
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            self.batches += 1
+            self.items += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class RemoteBatcher:
+    """
+    Client for a batcher hosted by serve() in another process on the same host
+    (e.g. one inference service shared by all Celery prefork children).
+    One connection per calling thread. A call that gets no reply within timeout raises
+    TimeoutError and drops its connection (a late reply would answer the next request).
+    """
+
+    def __init__(self, address: str, name: str, authkey: Optional[bytes] = None):
+        self.address = address
+        self.name = name
+        self.authkey = require_authkey(authkey)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.map([item], timeout)[0]
+
+    def _drop_connection(self, conn):
+        self._local.conn = None # reconnect next time
+        conn.close()
+
+    def map(self, items: List[Any], timeout: Optional[float] = None) -> List[Any]:
+        conn = self._connection()
+        try:
+            conn.send((self.name, items))
+            if timeout is not None and not conn.poll(timeout):
+                self._drop_connection(conn)
+                raise TimeoutError(f"No reply from the inference service within {timeout}s ({self.name})")
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            self._drop_connection(conn)
+            raise
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+
+def serve(address: str, batchers: Dict[str, MicroBatcher], authkey: Optional[bytes] = None):
+    """
+    Hosts batchers on a Unix socket. Each client connection gets a thread; requests from all
+    connections meet in the same batchers. Blocks forever.
+    The socket is created owner-only (0600): clients must run as the same user and hold the authkey.
+    """
+    authkey = require_authkey(authkey)
+    if os.path.exists(address):
+        os.remove(address)
+    # umask covers the window between bind() and chmod()
+    umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(umask)
+    os.chmod(address, 0o600)
+    logger.info(f"Inference service listening on {address} ({', '.join(batchers)})")
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    name, items = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", batchers[name].map(items))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return # client gave up (timeout) and closed its connection
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e: # e.g. failed authentication
+                logger.warning(f"Rejected inference client: {e}")
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+    finally:
+        listener.close()
+
+
+_batchers: Dict[str, Any] = {}
+_batchers_lock = threading.Lock()
+
+
+def batching_settings(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The "batching" section of an engine config, with defaults. A service address implies enabled."""
+    cfg = (config or {}).get("batching", {})
+    address = cfg.get("address", DEFAULT_ADDRESS)
+    return {
+        "enabled": bool(cfg.get("enabled", BATCHING_ENABLED) or address),
+        "max_batch_size": int(cfg.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE)),
+        "max_wait_ms": float(cfg.get("max_wait_ms", DEFAULT_MAX_WAIT_MS)),
+        "address": address,
+    }
+
+
+def get_batcher(name: str, batch_fn: Callable[[List[Any]], List[Any]], config: Optional[Dict[str, Any]] = None):
+    """
+    Process-wide batcher for a model, created on first use. config: batching_settings() output.
+    With an address, returns a client of the inference service instead of a local batcher.
+    """
+    config = config or {}
+    with _batchers_lock:
+        if name not in _batchers:
+            if config.get("address"):
+                _batchers[name] = RemoteBatcher(config["address"], name)
+            else:
+                _batchers[name] = MicroBatcher(
+                    batch_fn,
+                    max_batch_size=config.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE),
+                    max_wait_ms=config.get("max_wait_ms", DEFAULT_MAX_WAIT_MS),
+                    name=name
+                )
+        return _batchers[name]
+
+
+def batcher_stats() -> Dict[str, Any]:
+    """Stats of the local batchers in this process."""
+    with _batchers_lock:
+        return {name: b.stats() for name, b in _batchers.items() if isinstance(b, MicroBatcher)}
@@ -0,0 +1,129 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get("TOTALITY_CACHE_DIR", ".totality_cache")
+DEFAULT_MAX_MB = 512
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents (the audio's identity, independent of its name)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(value: Any) -> str:
+    """Stable hash of any JSON-like value (dict order independent)."""
+    encoded = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class FeatureCache:
+    """
+    Persistent, content-addressed store for stage outputs.
+    Entries are JSON files named by the hash of (audio hash, stage, stage version, config, inputs),
+    so any change to one of those simply misses and recomputes that stage.
+    Size-bounded: least recently used entries (by mtime, refreshed on hit) are evicted.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_MAX_MB):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return fingerprint(list(parts))
+
+    def _path(self, key: str) -> str:
+        # Shard by prefix to keep directories small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (hit, value)."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return False, None
+
+        try:
+            os.utime(path, None) # mark as recently used
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        try:
+            payload = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Not caching non-JSON value for {key}: {e}")
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, path) # atomic, so concurrent readers never see partial files
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(payload)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    yield entry
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drops least recently used entries until the cache is back under 90% of its budget."""
+        entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries()))
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+            evicted += 1
+        self._size = total
+        logger.info(f"Feature cache evicted {evicted} entries ({total / 1e6:.1f} MB kept).")
+
+    def clear(self):
+        with self._lock:
+            for entry in list(self._entries()):
+                self._remove(entry.path)
+            self._size = 0
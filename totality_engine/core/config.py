@@ -1,5 +1,6 @@
 import yaml
 import os
+import copy
 from typing import Dict, Any
 
 class ConfigLoader:
@@ -12,12 +13,30 @@ class ConfigLoader:
             "streaming": {"target_lufs": -14, "tolerance": 2, "true_peak_max": -1.0},
             "club": {"target_lufs": -9, "tolerance": 2, "true_peak_max": -1.0},
             "lra": {"min": 3, "max": 15}
-        }
+        },
+        "profile": "standard", # analysis profile when a request names none: quick | standard | deep
+        "scheduler": {"max_workers": None}, # stages run on a thread pool
+        "loudness": {"backend": "ffmpeg"}, # or "native" (in-process NumPy R128)
+        "streaming": {"threshold_sec": 1200, "block_frames": 2048}, # block-wise analysis for long audio
+        "cache": {"enabled": True, "directory": ".totality_cache", "max_mb": 512}, # persistent stage cache
+        "album": {"workers": None, "manifest": True}, # workers=None -> one per CPU
+        "deep_listening": {
+            "batch_size": 8, # clips per AST forward
+            "mode": "clip", # or "windowed": whole-track embedding timeline
+            "window_sec": 10.0, "hop_sec": 5.0, "max_windows": 32,
+            "backend": "eager" # or "int8", "torchscript", "onnx"
+        },
+        # sentiment model: backend "int8" (other backends map to int8); lyrics scored in chunks of chunk_tokens
+        "resonance": {"backend": "eager", "chunk_tokens": 128, "batch_size": 16},
+        "inference": {"drift_tolerance": 0.02, "export_dir": ".totality_cache/models"}, # vs fp32 outputs
+        "models": {"budget_mb": None}, # shared model registry; None -> unbounded (LRU eviction above it)
+        # Micro-batching of concurrent jobs' embedding/sentiment requests; address: serve-inference socket
+        "batching": {"enabled": False, "max_batch_size": 16, "max_wait_ms": 5.0, "address": None}
     }
 
     def __init__(self, config_path: str = "engines_config.yaml"):
         self.config_path = config_path
-        self._config = self.DEFAULT_CONFIG.copy()
+        self._config = copy.deepcopy(self.DEFAULT_CONFIG)
 
     def load(self) -> Dict[str, Any]:
         """
@@ -0,0 +1,149 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import inspect, text
+from sqlmodel import Session, select
+
+from totality_engine.core.schema import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+# Little-endian float32: 3 KB per 768-dim embedding instead of ~15 KB of JSON text
+EMBEDDING_DTYPE = "<f4"
+
+# Columns added to analysisresult after it first shipped (create_all does not alter existing tables)
+_EMBEDDING_COLUMNS = {
+    "embedding": "BLOB",
+    "embedding_dim": "INTEGER",
+    "embedding_dtype": "VARCHAR",
+    "embedding_model": "VARCHAR",
+}
+
+
+def encode_embedding(vector: Sequence[float]) -> Tuple[bytes, int, str]:
+    """Returns (blob, dim, dtype) for storage."""
+    array = np.ascontiguousarray(vector, dtype=EMBEDDING_DTYPE).ravel()
+    return array.tobytes(), int(array.size), EMBEDDING_DTYPE
+
+
+def decode_embedding(blob: bytes, dim: Optional[int] = None, dtype: Optional[str] = None) -> np.ndarray:
+    """Zero-copy, read-only view over a stored embedding."""
+    array = np.frombuffer(blob, dtype=dtype or EMBEDDING_DTYPE)
+    if dim is not None and array.size != dim:
+        raise ValueError(f"Embedding blob holds {array.size} values, expected {dim}")
+    return array
+
+
+def set_embedding(row: AnalysisResult, vector: Optional[Sequence[float]], model: Optional[str] = None):
+    """Stores the embedding on a row in binary form (the JSON column is left empty)."""
+    if vector is None or len(vector) == 0:
+        return
+    row.embedding, row.embedding_dim, row.embedding_dtype = encode_embedding(vector)
+    row.embedding_model = model
+    row.embedding_json = None
+
+
+def get_embedding(row: AnalysisResult) -> Optional[np.ndarray]:
+    """Embedding of a row, from the binary column or (for unmigrated rows) the legacy JSON column."""
+    if row.embedding is not None:
+        return decode_embedding(row.embedding, row.embedding_dim, row.embedding_dtype)
+    if row.embedding_json:
+        return np.asarray(json.loads(row.embedding_json), dtype=EMBEDDING_DTYPE)
+    return None
+
+
+def strip_embedding(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a pipeline result without the track embedding (it is stored once, in the binary column)."""
+    creative = result.get("creative")
+    if not isinstance(creative, dict) or "embedding" not in creative:
+        return result
+    stripped = dict(result)
+    stripped["creative"] = {k: v for k, v in creative.items() if k != "embedding"}
+    return stripped
+
+
+def load_embedding_matrix(session: Session, model: Optional[str] = None) -> Tuple[List[int], np.ndarray]:
+    """
+    (row ids, [n, dim] float32 matrix) for every stored embedding (optionally of one model).
+    The blobs are joined and viewed in one step, so there is no per-value parsing.
+    """
+    statement = select(AnalysisResult.id, AnalysisResult.embedding, AnalysisResult.embedding_dim).where(
+        AnalysisResult.embedding.is_not(None))
+    if model is not None:
+        statement = statement.where(AnalysisResult.embedding_model == model)
+
+    ids, blobs, dim = [], [], None
+    for row_id, blob, row_dim in session.exec(statement):
+        if dim is None:
+            dim = row_dim
+        if row_dim != dim:
+            logger.warning(f"Skipping embedding of row {row_id}: {row_dim} dims, expected {dim}")
+            continue
+        ids.append(row_id)
+        blobs.append(blob)
+
+    if not ids:
+        return [], np.zeros((0, 0), dtype=EMBEDDING_DTYPE)
+    return ids, np.frombuffer(b"".join(blobs), dtype=EMBEDDING_DTYPE).reshape(len(ids), dim)
+
+
+def ensure_embedding_columns(engine) -> List[str]:
+    """Adds the binary embedding columns to an existing analysisresult table. Returns the columns added."""
+    inspector = inspect(engine)
+    if not inspector.has_table(AnalysisResult.__tablename__):
+        return []
+    existing = {c["name"] for c in inspector.get_columns(AnalysisResult.__tablename__)}
+    added = []
+    with engine.begin() as conn:
+        for name, sql_type in _EMBEDDING_COLUMNS.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {AnalysisResult.__tablename__} ADD COLUMN {name} {sql_type}"))
+                added.append(name)
+    if added:
+        logger.info(f"Added columns to {AnalysisResult.__tablename__}: {', '.join(added)}")
+    return added
+
+
+def migrate_embeddings(engine, batch_size: int = 500) -> int:
+    """
+    Converts rows that still carry JSON embeddings: writes the binary column, clears embedding_json
+    and removes the duplicate from raw_json. Safe to re-run. Returns the number of rows converted.
+    """
+    from totality_engine.core.results import ensure_analysis_result_columns # results imports this module
+    ensure_analysis_result_columns(engine)
+    converted = 0
+    while True:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(AnalysisResult)
+                .where(AnalysisResult.embedding_json.is_not(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for row in rows:
+                try:
+                    vector = json.loads(row.embedding_json)
+                except ValueError:
+                    logger.warning(f"Row {row.id}: unreadable embedding_json, dropping it")
+                    vector = None
+
+                model = None
+                try:
+                    raw = json.loads(row.raw_json)
+                    model = raw.get("creative", {}).get("model")
+                    row.raw_json = json.dumps(strip_embedding(raw))
+                except (ValueError, AttributeError):
+                    pass
+
+                if vector and row.embedding is None:
+                    set_embedding(row, vector, model)
+                row.embedding_json = None
+                session.add(row)
+                converted += 1
+            session.commit()
+            logger.info(f"Migrated {converted} embeddings...")
+    return converted
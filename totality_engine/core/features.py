@@ -0,0 +1,104 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+import librosa
+
+logger = logging.getLogger(__name__)
+
+N_FFT = 2048
+HOP_LENGTH = 512
+
+
+class FeatureNode:
+    """A named intermediate and the nodes it is derived from."""
+
+    def __init__(self, name: str, deps: Tuple[str, ...], compute: Callable):
+        self.name = name
+        self.deps = deps
+        self.compute = compute
+
+
+# Registry of every intermediate an analyzer may ask for
+FEATURES: Dict[str, FeatureNode] = {}
+
+
+def feature(name: str, deps: Tuple[str, ...] = ()):
+    """Declares a feature node. The function receives the graph followed by its deps."""
+    def register(fn: Callable) -> Callable:
+        FEATURES[name] = FeatureNode(name, tuple(deps), fn)
+        return fn
+    return register
+
+
+class FeatureGraph:
+    """
+    Lazily computed, memoized librosa intermediates for one signal.
+    Each node is computed on first use and shared by every analyzer holding the graph.
+    Nodes are locked individually, so concurrent stages asking for the same node
+    wait for one computation while unrelated nodes proceed in parallel.
+    """
+
+    def __init__(self, y: np.ndarray, sr: int):
+        self.y = y
+        self.sr = sr
+        self._values: Dict[str, Any] = {}
+        # Seconds spent in each node, excluding its dependencies
+        self.timings: Dict[str, float] = {}
+        self._locks = {name: threading.Lock() for name in FEATURES}
+
+    def get(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+        if name not in FEATURES:
+            raise KeyError(f"Unknown feature: {name}")
+
+        node = FEATURES[name]
+        # Resolve dependencies before taking this node's lock (the DAG has no cycles)
+        inputs = [self.get(dep) for dep in node.deps]
+
+        with self._locks[name]:
+            if name not in self._values:
+                start = time.perf_counter()
+                value = node.compute(self, *inputs)
+                self.timings[name] = time.perf_counter() - start
+                self._values[name] = value
+        return self._values[name]
+
+    def __getitem__(self, name: str) -> Any:
+        return self.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+
+# --- Node Definitions ---
+
+@feature("stft_magnitude")
+def _stft_magnitude(graph: FeatureGraph) -> np.ndarray:
+    return np.abs(librosa.stft(graph.y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+
+
+@feature("mel", deps=("stft_magnitude",))
+def _mel(graph: FeatureGraph, stft_magnitude: np.ndarray) -> np.ndarray:
+    # Power mel spectrogram, identical to melspectrogram(y=...) with the same STFT
+    return librosa.feature.melspectrogram(S=stft_magnitude ** 2, sr=graph.sr)
+
+
+@feature("onset_envelope", deps=("mel",))
+def _onset_envelope(graph: FeatureGraph, mel: np.ndarray) -> np.ndarray:
+    # onset_strength(y=...) converts the mel power to dB internally; do the same here
+    return librosa.onset.onset_strength(S=librosa.power_to_db(mel), sr=graph.sr, hop_length=HOP_LENGTH)
+
+
+@feature("cqt_chroma")
+def _cqt_chroma(graph: FeatureGraph) -> np.ndarray:
+    return librosa.feature.chroma_cqt(y=graph.y, sr=graph.sr, hop_length=HOP_LENGTH)
+
+
+@feature("beats", deps=("onset_envelope",))
+def _beats(graph: FeatureGraph, onset_envelope: np.ndarray) -> Tuple[float, np.ndarray]:
+    tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=graph.sr, hop_length=HOP_LENGTH)
+    return float(np.atleast_1d(tempo)[0]), beat_frames
@@ -0,0 +1,149 @@
+import os
+import logging
+import importlib.util
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# eager: fp32 PyTorch; int8: dynamic quantization of Linear layers;
+# torchscript: traced graph; onnx: exported graph on ONNX Runtime (if installed)
+INFERENCE_BACKENDS = ("eager", "int8", "torchscript", "onnx")
+DEFAULT_BACKEND = os.environ.get("TOTALITY_INFERENCE_BACKEND", "eager")
+DEFAULT_DRIFT_TOLERANCE = 0.02 # max cosine distance from the fp32 output
+DEFAULT_EXPORT_DIR = os.path.join(os.environ.get("TOTALITY_CACHE_DIR", ".totality_cache"), "models")
+
+
+def model_label(model_name: str, backend: str) -> str:
+    """Name recorded in results: the plain model name for eager, otherwise tagged with the backend."""
+    return model_name if backend == "eager" else f"{model_name}+{backend}"
+
+
+def buildable_backend(backend: str) -> str:
+    """The backend InferenceRunner will build for a requested one: "onnx" needs onnxruntime, else int8."""
+    if backend == "onnx" and importlib.util.find_spec("onnxruntime") is None:
+        return "int8"
+    return backend
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations quantized per batch). CPU only."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Worst-case cosine distance between matching rows of two [batch, dim] arrays."""
+    reference = np.asarray(reference, dtype=np.float64).reshape(len(reference), -1)
+    candidate = np.asarray(candidate, dtype=np.float64).reshape(len(candidate), -1)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosine = np.sum(reference * candidate, axis=1) / np.maximum(norms, 1e-12)
+    return float(np.max(1.0 - cosine))
+
+
+class _OutputModule(torch.nn.Module):
+    """Single-input wrapper so every backend exposes the same tensor -> tensor forward."""
+
+    def __init__(self, model: torch.nn.Module, input_name: str, output_fn: Callable[[Any], torch.Tensor]):
+        super().__init__()
+        self.model = model
+        self.input_name = input_name
+        self.output_fn = output_fn
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.output_fn(self.model(**{self.input_name: x}))
+
+
+class InferenceRunner:
+    """
+    Runs one model forward on the selected backend and returns NumPy outputs.
+    Non-eager backends are checked against the fp32 model on a probe input when built;
+    if the output drifts past the tolerance, the runner falls back to eager.
+    """
+
+    def __init__(self, model: torch.nn.Module, model_name: str, input_name: str,
+                 output_fn: Callable[[Any], torch.Tensor], probe: torch.Tensor,
+                 backend: str = DEFAULT_BACKEND, drift_tolerance: float = DEFAULT_DRIFT_TOLERANCE,
+                 export_dir: str = DEFAULT_EXPORT_DIR, device: Optional[torch.device] = None):
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.model_name = model_name
+        self.input_name = input_name
+        self.device = device or torch.device("cpu")
+        self.drift: Optional[float] = None
+        self._session = None
+
+        eager = _OutputModule(model, input_name, output_fn).eval()
+        self._forward = eager
+        self.backend = "eager"
+
+        if backend == "eager":
+            return
+        if self.device.type != "cpu":
+            logger.warning(f"Inference backend '{backend}' targets CPU; keeping eager on {self.device}.")
+            return
+
+        try:
+            reference = self._run(eager, probe)
+            candidate, built = self._build(backend, eager, probe, export_dir)
+            candidate_out = self._run(candidate, probe)
+        except Exception as e:
+            logger.warning(f"Could not build '{backend}' backend for {model_name} ({e}); using eager.")
+            return
+
+        self.drift = cosine_drift(reference, candidate_out)
+        if self.drift > drift_tolerance:
+            logger.warning(f"{model_name} '{built}' drifts {self.drift:.4f} from fp32 "
+                           f"(tolerance {drift_tolerance}); using eager.")
+            self._session = None
+            return
+
+        logger.info(f"{model_name} running on '{built}' backend (drift {self.drift:.5f}).")
+        self._forward = candidate
+        self.backend = built
+
+    @property
+    def label(self) -> str:
+        return model_label(self.model_name, self.backend)
+
+    def _build(self, backend: str, eager: torch.nn.Module, probe: torch.Tensor, export_dir: str):
+        """Returns (forward, backend actually built), which differs when a fallback was used."""
+        if backend == "int8":
+            return quantize_int8(eager), "int8"
+
+        if backend == "torchscript":
+            with torch.no_grad():
+                return torch.jit.freeze(torch.jit.trace(eager, (probe,), strict=False)), "torchscript"
+
+        if backend == "onnx":
+            try:
+                import onnxruntime
+            except ImportError:
+                logger.warning("onnxruntime not installed; falling back to int8 for the 'onnx' backend.")
+                return quantize_int8(eager), "int8"
+
+            os.makedirs(export_dir, exist_ok=True)
+            path = os.path.join(export_dir, f"{self.model_name.replace('/', '__')}.onnx")
+            if not os.path.exists(path):
+                logger.info(f"Exporting {self.model_name} to {path}...")
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with torch.no_grad():
+                    torch.onnx.export(eager, (probe,), tmp_path,
+                                      input_names=[self.input_name], output_names=["output"],
+                                      dynamic_axes={self.input_name: {0: "batch"}, "output": {0: "batch"}})
+                os.replace(tmp_path, path)
+            self._session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+            return self._session, "onnx"
+
+        raise ValueError(f"Unknown inference backend: {backend}")
+
+    def _run(self, forward, x: torch.Tensor) -> np.ndarray:
+        if forward is self._session and forward is not None:
+            return forward.run(None, {self.input_name: x.cpu().numpy()})[0]
+        with torch.no_grad():
+            return forward(x.to(self.device)).cpu().numpy()
+
+    def __call__(self, inputs: Dict[str, torch.Tensor]) -> np.ndarray:
+        """inputs: feature-extractor output (BatchFeature or dict); returns the model output as [batch, ...]."""
+        return self._run(self._forward, inputs[self.input_name])
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, select
+
+from totality_engine.core.schema import AnalysisJob
+from totality_engine.core.results import encode_results, decode_results
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("completed", "failed")
+DEFAULT_MAX_JOBS = 1000
+DEFAULT_TTL_SEC = 3600.0
+# Decoded results of finished jobs kept in front of the backing store, for repeated polls
+DEFAULT_RESULT_CACHE = 16
+DEFAULT_RETENTION_SEC = 7 * 24 * 3600.0
+# Unfinished jobs not updated for this long are presumed dead whichever process owned them
+DEFAULT_STALE_SEC = 6 * 3600.0
+# Tells this process from an earlier one with the same pid (e.g. a restarted container)
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+DEFAULT_JOB_STORE = os.environ.get("TOTALITY_JOB_STORE", "sqlite") # or "memory"
+
+
+class JobStore(ABC):
+    """
+    Job records: {"status", "submitted_at", "metadata", "result"?, "error"?}.
+    Records are copied in and out; mutate them through update().
+    """
+
+    @abstractmethod
+    def create(self, job_id: str, record: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        pass
+
+
+class SQLJobStore(JobStore):
+    """
+    Jobs persisted in the AnalysisJob table, so status and results survive restarts.
+    Finished jobs older than retention_sec are purged (lazily, on create).
+    Results are stored zlib-compressed. Each job records its owner ("host:pid:token") so that
+    processes sharing the database only recover their own dead jobs.
+    """
+
+    PURGE_INTERVAL_SEC = 300.0
+    # Columns added to analysisjob after it first shipped (create_all does not alter existing tables)
+    _COLUMNS = {"result_blob": "BLOB", "owner": "VARCHAR"}
+
+    def __init__(self, engine, retention_sec: float = DEFAULT_RETENTION_SEC, stale_sec: float = DEFAULT_STALE_SEC):
+        self.engine = engine
+        self.retention_sec = retention_sec
+        self.stale_sec = stale_sec
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}:{_PROCESS_TOKEN}"
+        self._last_purge = 0.0
+        SQLModel.metadata.create_all(engine, tables=[AnalysisJob.__table__])
+        self._ensure_columns()
+
+    def _ensure_columns(self):
+        existing = {c["name"] for c in inspect(self.engine).get_columns(AnalysisJob.__tablename__)}
+        with self.engine.begin() as conn:
+            for name, sql_type in self._COLUMNS.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {AnalysisJob.__tablename__} ADD COLUMN {name} {sql_type}"))
+
+    def create(self, job_id: str, record: Dict[str, Any]):
+        with Session(self.engine) as session:
+            session.add(AnalysisJob(
+                id=job_id,
+                status=record.get("status", "queued"),
+                submitted_at=record.get("submitted_at"),
+                metadata_json=json.dumps(record.get("metadata", {})),
+                owner=self.owner,
+            ))
+            session.commit()
+        if time.monotonic() - self._last_purge > self.PURGE_INTERVAL_SEC:
+            self.purge()
+
+    def update(self, job_id: str, **fields):
+        with Session(self.engine) as session:
+            row = session.get(AnalysisJob, job_id)
+            if row is None:
+                return
+            if "status" in fields:
+                row.status = fields["status"]
+            if "result" in fields:
+                row.result_blob = encode_results(fields["result"])
+            if "error" in fields:
+                row.error = fields["error"]
+            row.updated_at = datetime.utcnow()
+            session.add(row)
+            session.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as session:
+            row = session.get(AnalysisJob, job_id)
+            if row is None:
+                return None
+            record = {
+                "status": row.status,
+                "submitted_at": row.submitted_at,
+                "metadata": json.loads(row.metadata_json or "{}"),
+            }
+            if row.result_blob is not None:
+                record["result"] = decode_results(row.result_blob)
+            elif row.result_json is not None:
+                record["result"] = json.loads(row.result_json)
+            if row.error is not None:
+                record["error"] = row.error
+            return record
+
+    def delete(self, job_id: str):
+        with Session(self.engine) as session:
+            row = session.get(AnalysisJob, job_id)
+            if row is not None:
+                session.delete(row)
+                session.commit()
+
+    def purge(self) -> int:
+        """Deletes finished jobs past retention. Returns the number removed."""
+        self._last_purge = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_sec)
+        with Session(self.engine) as session:
+            rows = session.exec(select(AnalysisJob).where(
+                AnalysisJob.status.in_(FINISHED), AnalysisJob.updated_at < cutoff
+            )).all()
+            for row in rows:
+                session.delete(row)
+            session.commit()
+        return len(rows)
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True # exists, owned by another user
+        return True
+
+    def _orphaned(self, row: AnalysisJob, stale_before: datetime) -> bool:
+        """
+        An unfinished job whose owner process is gone: an earlier process on this host that is no longer
+        running, or any owner (including legacy rows without one) once the job has been silent past stale_sec.
+        """
+        if row.updated_at < stale_before:
+            return True
+        parts = (row.owner or "").rsplit(":", 2)
+        if len(parts) != 3 or parts[0] != self.host or not parts[1].isdigit() or row.owner == self.owner:
+            return False
+        pid = int(parts[1])
+        return pid == os.getpid() or not self._pid_alive(pid)
+
+    def recover(self) -> int:
+        """
+        Marks orphaned jobs (see _orphaned) as failed: their work died with their process.
+        Safe with several servers or workers on one database: jobs of live processes are left alone.
+        Returns the number marked.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=self.stale_sec)
+        with Session(self.engine) as session:
+            rows = [row for row in session.exec(select(AnalysisJob).where(AnalysisJob.status.not_in(FINISHED))).all()
+                    if self._orphaned(row, stale_before)]
+            for row in rows:
+                row.status = "failed"
+                row.error = "Interrupted by a server restart"
+                row.updated_at = datetime.utcnow()
+                session.add(row)
+            session.commit()
+        return len(rows)
+
+
+class MemoryJobStore(JobStore):
+    """
+    Bounded in-memory job store. Finished jobs expire ttl_sec after finishing, and beyond
+    max_jobs the least recently used finished jobs are dropped; active jobs are never evicted.
+
+    With a backing store every change is written through, and finished results are kept only
+    there: memory holds job status, and get() loads the result (or an evicted job) on demand.
+    The last result_cache completed records loaded that way stay decoded, so a client polling
+    a finished job does not reload and decompress its result each time.
+    """
+
+    def __init__(self, max_jobs: int = DEFAULT_MAX_JOBS, ttl_sec: float = DEFAULT_TTL_SEC,
+                 backing: Optional[JobStore] = None, result_cache: int = DEFAULT_RESULT_CACHE):
+        self.max_jobs = max_jobs
+        self.ttl_sec = ttl_sec
+        self.backing = backing
+        self.result_cache = result_cache
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._finished_at: Dict[str, float] = {}
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Bumped by every write, so a load racing an update or delete is not cached
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, record: Dict[str, Any]):
+        if self.backing is not None:
+            self.backing.create(job_id, record)
+        with self._lock:
+            self._invalidate(job_id)
+            self._jobs[job_id] = dict(record)
+            self._evict()
+
+    def update(self, job_id: str, **fields):
+        if self.backing is not None:
+            self.backing.update(job_id, **fields)
+        with self._lock:
+            self._invalidate(job_id)
+            record = self._jobs.get(job_id)
+            if record is None:
+                return
+            record.update(fields)
+            if record.get("status") in FINISHED:
+                self._finished_at[job_id] = time.monotonic()
+                if self.backing is not None:
+                    record.pop("result", None) # served from the backing store
+            self._jobs.move_to_end(job_id)
+            self._evict()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict()
+            record = self._jobs.get(job_id)
+            if record is not None:
+                self._jobs.move_to_end(job_id)
+                record = dict(record)
+        if self.backing is not None and (record is None or record.get("status") == "completed"):
+            return self._load(job_id)
+        return record
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cached = self._results.get(job_id)
+            if cached is not None:
+                self._results.move_to_end(job_id)
+                return dict(cached)
+            writes = self._writes
+        record = self.backing.get(job_id)
+        if record is None or record.get("status") != "completed" or not self.result_cache:
+            return record
+        with self._lock:
+            if writes == self._writes:
+                self._results[job_id] = record
+                while len(self._results) > self.result_cache:
+                    self._results.popitem(last=False)
+        return dict(record)
+
+    def delete(self, job_id: str):
+        if self.backing is not None:
+            self.backing.delete(job_id)
+        with self._lock:
+            self._invalidate(job_id)
+            self._jobs.pop(job_id, None)
+            self._finished_at.pop(job_id, None)
+
+    def _invalidate(self, job_id: str):
+        self._writes += 1
+        self._results.pop(job_id, None)
+
+    def _evict(self):
+        now = time.monotonic()
+        for job_id in [j for j, t in self._finished_at.items() if now - t > self.ttl_sec]:
+            self._drop(job_id)
+        if len(self._jobs) > self.max_jobs:
+            # Oldest first, finished jobs only
+            for job_id in [j for j in self._jobs if j in self._finished_at]:
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                self._drop(job_id)
+
+    def _drop(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._finished_at.pop(job_id, None)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+
+class JobEventLog:
+    """
+    Per-job progress events (pipeline stage completions) for streaming to clients.
+    In memory only. A job takes events between open() and close(); they are dropped retention_sec
+    after it is closed, since the final result then comes from the job store. Events published
+    outside that window (e.g. arriving after close) are discarded, so every stored list expires.
+    """
+
+    def __init__(self, retention_sec: float = 60.0):
+        self.retention_sec = retention_sec
+        self._events: Dict[str, list] = {}
+        self._open: set = set()
+        self._closed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def open(self, job_id: str):
+        with self._lock:
+            self._open.add(job_id)
+            self._events.setdefault(job_id, [])
+
+    def publish(self, job_id: str, event: Dict[str, Any]):
+        with self._lock:
+            if job_id not in self._open:
+                logger.warning(f"Dropping progress event for job {job_id}: it is not open")
+                return
+            self._events[job_id].append(event)
+
+    def since(self, job_id: str, cursor: int = 0) -> list:
+        """Events after the first `cursor` ones."""
+        with self._lock:
+            return list(self._events.get(job_id, [])[cursor:])
+
+    def close(self, job_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._open.discard(job_id)
+            self._closed_at[job_id] = now
+            for expired in [j for j, t in self._closed_at.items() if now - t > self.retention_sec]:
+                self._events.pop(expired, None)
+                del self._closed_at[expired]
+
+
+def get_job_store(kind: str = DEFAULT_JOB_STORE, engine=None, max_jobs: int = DEFAULT_MAX_JOBS,
+                  ttl_sec: float = DEFAULT_TTL_SEC, retention_sec: float = DEFAULT_RETENTION_SEC,
+                  stale_sec: float = DEFAULT_STALE_SEC) -> JobStore:
+    """
+    "memory": bounded in-memory store only (jobs are lost on restart).
+    "sqlite": in-memory status in front of SQLJobStore on engine; results live in the database.
+    """
+    if kind == "memory":
+        return MemoryJobStore(max_jobs, ttl_sec)
+    if kind == "sqlite":
+        if engine is None:
+            raise ValueError("sqlite job store needs a database engine")
+        return MemoryJobStore(max_jobs, ttl_sec, backing=SQLJobStore(engine, retention_sec, stale_sec))
+    raise ValueError(f"Unknown job store: {kind}")
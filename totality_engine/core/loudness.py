@@ -0,0 +1,208 @@
+import os
+import re
+import shutil
+import logging
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-frame line, e.g. "t: 12.3   TARGET:-23 LUFS    M: -14.1 S: -15.0  I: -14.6 LUFS ..."
+_FRAME_RE = re.compile(r"\bt:\s*(-?[\d.]+)\s.*?\bM:\s*(-?[\d.]+|-?inf|nan)")
+_SUMMARY_RE = {
+    "lufs_i": re.compile(r"^\s*I:\s*(-?[\d.]+|-?inf)\s*LUFS"),
+    "lra": re.compile(r"^\s*LRA:\s*(-?[\d.]+)\s*LU\b"),
+    "true_peak": re.compile(r"^\s*Peak:\s*(-?[\d.]+|-?inf)\s*dB"),
+}
+
+SILENCE_FLOOR_LUFS = -70
+
+
+def find_ffmpeg() -> str:
+    # Check for ffmpeg in common locations or path
+    paths = ["/opt/homebrew/bin/ffmpeg", "ffmpeg"]
+    for p in paths:
+        if shutil.which(p):
+            return p
+    return "ffmpeg" # Hope it's in path if checking fails
+
+
+class LoudnessScanner:
+    """
+    Shared EBU R128 scan service. One ffmpeg ebur128 pass per file yields both the
+    summary (integrated loudness, LRA, true peak) and the momentary-loudness time series.
+    Results are cached per file (path, size, mtime) so every engine in the process reuses them.
+    """
+    backend = "ffmpeg"
+
+    def __init__(self, ffmpeg_bin: str = None, max_entries: int = 256):
+        self.ffmpeg_bin = ffmpeg_bin or find_ffmpeg()
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(file_path: str, duration: Optional[float] = None) -> Tuple:
+        st = os.stat(file_path)
+        return (os.path.realpath(file_path), st.st_size, st.st_mtime_ns, duration)
+
+    def scan(self, file_path: str, audio=None, duration: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Returns {"summary": {...}, "timeseries": {"t": ndarray, "lufs": ndarray}}
+        (momentary loudness above the silence floor, 100 ms steps) or {"error": ...}.
+        Errors are not cached.
+        audio: optional AudioContext holding an already-decoded buffer (used by in-process backends).
+        duration: measure only the first `duration` seconds.
+        """
+        try:
+            key = self._cache_key(file_path, duration)
+        except OSError as e:
+            return {"error": str(e)}
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = self._measure(file_path, audio, duration)
+        if "error" not in result:
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return result
+
+    def summary(self, file_path: str, audio=None, duration: Optional[float] = None) -> Dict[str, Any]:
+        result = self.scan(file_path, audio, duration)
+        if "error" in result:
+            return result
+        return dict(result["summary"])
+
+    def timeseries(self, file_path: str, audio=None, duration: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(times, momentary LUFS) arrays; empty on error."""
+        result = self.scan(file_path, audio, duration)
+        if "error" in result:
+            return np.empty(0), np.empty(0)
+        return result["timeseries"]["t"], result["timeseries"]["lufs"]
+
+    def _measure(self, file_path: str, audio=None, duration: Optional[float] = None) -> Dict[str, Any]:
+        # framelog=info prints per-frame values at ffmpeg's default log level
+        cmd = [
+            self.ffmpeg_bin,
+            "-hide_banner", "-nostats",
+            # As an input option, -t stops decoding at the window instead of discarding the rest
+            *(["-t", f"{duration:g}"] if duration is not None else []),
+            "-i", file_path,
+            "-af", "ebur128=peak=true:framelog=info",
+            "-f", "null",
+            "-"
+        ]
+
+        try:
+            process = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
+            times, momentary = [], []
+            summary = {}
+            in_summary = False
+            head = []
+
+            # ffmpeg outputs stats to stderr; stream it instead of buffering the frame log
+            for line in process.stderr:
+                if len(head) < 20:
+                    head.append(line)
+                if not in_summary:
+                    if "Summary:" in line:
+                        in_summary = True
+                        continue
+                    match = _FRAME_RE.search(line)
+                    if match:
+                        try:
+                            t = float(match.group(1))
+                            m = float(match.group(2))
+                        except ValueError:
+                            continue
+                        if m > SILENCE_FLOOR_LUFS:
+                            times.append(t)
+                            momentary.append(m)
+                    continue
+
+                for name, pattern in _SUMMARY_RE.items():
+                    match = pattern.match(line)
+                    if match and name not in summary:
+                        summary[name] = float(match.group(1))
+            process.wait()
+
+            # Basic validation that we got data
+            if not summary:
+                return {"error": "Failed to parse ffmpeg output", "raw_stderr": "".join(head)[:200]}
+
+            return {"summary": summary, "timeseries": {"t": np.array(times), "lufs": np.array(momentary)}}
+
+        except Exception as e:
+            logger.error(f"Loudness scan failed for {file_path}: {e}")
+            return {"error": str(e)}
+
+
+class NativeLoudnessScanner(LoudnessScanner):
+    """
+    In-process backend: vectorized BS.1770 measurement (totality_engine.core.r128) on decoded PCM.
+    Avoids the ffmpeg fork and stderr parsing, and reuses a pipeline's decode when given one.
+    Files long enough for streaming mode are never decoded whole; those are measured by ffmpeg.
+    """
+    backend = "native"
+
+    @staticmethod
+    def _streaming(file_path: str, audio=None, duration: Optional[float] = None) -> bool:
+        from totality_engine.core.audio import STREAMING_THRESHOLD_SEC
+        if duration is not None and duration <= STREAMING_THRESHOLD_SEC:
+            return False
+        if audio is not None:
+            return audio.streaming
+        from totality_engine.core.streaming import file_duration
+        length = file_duration(file_path)
+        return length is not None and length > STREAMING_THRESHOLD_SEC
+
+    def _measure(self, file_path: str, audio=None, duration: Optional[float] = None) -> Dict[str, Any]:
+        from totality_engine.core import r128
+
+        if self._streaming(file_path, audio, duration):
+            # ffmpeg's ebur128 filter measures in one bounded-memory pass
+            logger.info(f"{file_path} is in streaming mode; measuring loudness with ffmpeg.")
+            return super()._measure(file_path, audio, duration)
+
+        try:
+            if audio is not None and (duration is None or audio.window_sec is not None):
+                y, sr = audio.load_channels()
+                if duration is not None:
+                    y = y[..., :int(round(duration * sr))]
+            else:
+                # A window of a context decoded whole is read straight from the file
+                import librosa
+                y, sr = librosa.load(file_path, sr=None, mono=False, duration=duration)
+            return r128.measure(y, sr)
+        except Exception as e:
+            logger.error(f"Native loudness measurement failed for {file_path}: {e}")
+            return {"error": str(e)}
+
+
+SCANNERS = {
+    "ffmpeg": LoudnessScanner,
+    "native": NativeLoudnessScanner,
+}
+
+_instances: Dict[str, LoudnessScanner] = {}
+_instances_lock = threading.Lock()
+
+
+def get_loudness_scanner(backend: Optional[str] = None) -> LoudnessScanner:
+    """Process-wide scanner for the given backend ("ffmpeg" or "native")."""
+    backend = backend or os.environ.get("TOTALITY_LOUDNESS_BACKEND", "ffmpeg")
+    if backend not in SCANNERS:
+        raise ValueError(f"Unknown loudness backend: {backend}")
+    with _instances_lock:
+        if backend not in _instances:
+            _instances[backend] = SCANNERS[backend]()
+        return _instances[backend]
@@ -0,0 +1,61 @@
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WarmProcessPool:
+    """
+    Process pool whose workers run initializer once (e.g. build a pipeline and load its models)
+    and stay warm across jobs. If a worker dies (crash, OOM kill), ProcessPoolExecutor marks the
+    whole pool broken; the pool is then replaced and the job retried up to `retries` times.
+
+    Workers are started with "spawn" by default: forking a parent that already holds
+    torch/BLAS thread pools can deadlock the child.
+    """
+
+    def __init__(self, max_workers: int, initializer: Optional[Callable] = None, initargs: Tuple = (),
+                 start_method: str = "spawn", retries: int = 1):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.start_method = start_method
+        self.retries = retries
+        self.replaced = 0
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=self.initializer,
+            initargs=self.initargs
+        )
+
+    def _replace(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            # Another job may have replaced it already
+            if self._pool is broken:
+                logger.warning("Worker process died; replacing the process pool.")
+                self._pool = self._new_pool()
+                self.replaced += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Runs fn(*args) in a worker and waits for the result (call from a thread, not the event loop)."""
+        for attempt in range(self.retries + 1):
+            pool = self._pool
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self._replace(pool)
+                if attempt == self.retries:
+                    raise
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,135 @@
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 65536
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain (Euclidean) Lloyd iterations; returns [k, d] centroids."""
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        present = counts > 0
+        centroids[present] = sums[present] / counts[present, None]
+        empty = np.flatnonzero(~present)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty), replace=False)]
+    return centroids
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for every row."""
+    out = np.empty(len(x), dtype=np.int64)
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, len(x), BLOCK_ROWS):
+        block = x[start:start + BLOCK_ROWS]
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 is constant per row
+        out[start:start + BLOCK_ROWS] = np.argmin(c_sq[None, :] - 2.0 * block @ centroids.T, axis=1)
+    return out
+
+
+class PQCodec:
+    """
+    PCA + product quantization for embeddings.
+    Vectors are centered, projected onto the top pca_dim principal axes, split into m sub-vectors,
+    and each sub-vector is replaced by the index of its nearest of ks (<= 256) centroids:
+    768 float32 dims (3 KB) become m bytes.
+
+    Queries use asymmetric distance computation (ADC): the query stays uncompressed and
+    its inner product with every code is a sum of m table lookups.
+    """
+
+    def __init__(self, dim: int, pca_dim: Optional[int] = 128, m: int = 16, ks: int = 256):
+        pca_dim = dim if pca_dim is None or pca_dim >= dim else pca_dim
+        if pca_dim % m:
+            raise ValueError(f"pca_dim ({pca_dim}) must be divisible by m ({m})")
+        if not 1 <= ks <= 256:
+            raise ValueError("ks must be between 1 and 256 (codes are stored as uint8)")
+        self.dim = dim
+        self.pca_dim = pca_dim
+        self.m = m
+        self.ks = ks
+        self.mean = np.zeros(dim, dtype=np.float32)
+        self.components = np.eye(pca_dim, dim, dtype=np.float32) # [pca_dim, dim], orthonormal rows
+        self.codebooks: Optional[np.ndarray] = None # [m, ks, pca_dim // m]
+
+    @property
+    def dsub(self) -> int:
+        return self.pca_dim // self.m
+
+    def fit(self, vectors: np.ndarray, iters: int = 20, sample: int = 65536, seed: int = 0) -> "PQCodec":
+        """Trains PCA and the codebooks on (a sample of) the catalog."""
+        rng = np.random.default_rng(seed)
+        n = len(vectors)
+        picks = np.sort(rng.choice(n, size=min(n, sample), replace=False))
+        x = np.asarray(vectors[picks], dtype=np.float32)
+
+        self.mean = x.mean(axis=0)
+        if self.pca_dim < self.dim:
+            _, _, vt = np.linalg.svd(x - self.mean, full_matrices=False)
+            self.components = vt[:self.pca_dim].astype(np.float32)
+
+        y = self.project(x)
+        self.codebooks = np.stack([
+            _kmeans(y[:, j * self.dsub:(j + 1) * self.dsub], self.ks, iters, rng)
+            for j in range(self.m)
+        ]).astype(np.float32)
+        logger.info(f"Trained PQ codec: {self.dim} -> {self.pca_dim} dims, {self.m} x {self.ks} codes on {len(x)} vectors.")
+        return self
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """[n, dim] -> [n, m] uint8 codes."""
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            y = self.project(vectors[start:start + BLOCK_ROWS])
+            for j in range(self.m):
+                codes[start:start + BLOCK_ROWS, j] = _nearest(y[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate [n, dim] vectors from codes."""
+        y = np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
+        return y @ self.components + self.mean
+
+    def lookup_table(self, query: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        ADC table for inner-product scoring: q.x ~= offset + sum_j table[j, code_j].
+        Returns ([m, ks] table, offset).
+        """
+        query = np.asarray(query, dtype=np.float32)
+        projected = (self.components @ query).reshape(self.m, 1, self.dsub)
+        table = np.sum(self.codebooks * projected, axis=2)
+        return table.astype(np.float32), float(query @ self.mean)
+
+    def scores(self, table: np.ndarray, offset: float, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner products for [n, m] codes."""
+        codes = np.asarray(codes)
+        total = np.full(len(codes), offset, dtype=np.float32)
+        for j in range(self.m):
+            total += table[j, codes[:, j]]
+        return total
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, dim=self.dim, pca_dim=self.pca_dim, m=self.m, ks=self.ks,
+                     mean=self.mean, components=self.components, codebooks=self.codebooks)
+
+    @classmethod
+    def load(cls, path: str) -> "PQCodec":
+        data = np.load(path)
+        codec = cls(int(data["dim"]), int(data["pca_dim"]), int(data["m"]), int(data["ks"]))
+        codec.mean = data["mean"]
+        codec.components = data["components"]
+        codec.codebooks = data["codebooks"]
+        return codec
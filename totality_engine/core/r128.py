@@ -0,0 +1,147 @@
+"""
+In-process EBU R128 / ITU-R BS.1770-4 loudness measurement on decoded PCM.
+Vectorized NumPy/SciPy equivalent of ffmpeg's ebur128 filter (summary + momentary series).
+"""
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import scipy.signal
+
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0      # integrated loudness
+LRA_RELATIVE_GATE_LU = -20.0  # loudness range
+MOMENTARY_SEC = 0.4
+SHORT_TERM_SEC = 3.0
+STEP_SEC = 0.1                # ffmpeg logs a frame every 100 ms
+
+# Channel weights for a 5.1 layout (L, R, C, LFE, Ls, Rs); LFE is excluded
+_SURROUND_WEIGHTS = np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+
+
+def k_weighting_coefficients(sr: int) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns ((b1, a1), (b2, a2)) for the BS.1770 pre-filter (high shelf) and RLB high-pass,
+    derived for any sample rate (same analogue prototypes as libebur128).
+    """
+    # Stage 1: high shelf
+    f0 = 1681.974450955533
+    gain_db = 3.999843853973347
+    q = 0.7071752369554196
+    k = np.tan(np.pi * f0 / sr)
+    vh = 10.0 ** (gain_db / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    b1 = np.array([(vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0])
+    a1 = np.array([1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0])
+
+    # Stage 2: RLB high-pass
+    f0 = 38.13547087602444
+    q = 0.5003270373238773
+    k = np.tan(np.pi * f0 / sr)
+    a0 = 1.0 + k / q + k * k
+    b2 = np.array([1.0, -2.0, 1.0])
+    a2 = np.array([1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0])
+
+    return (b1, a1), (b2, a2)
+
+
+def _as_channels(y: np.ndarray) -> np.ndarray:
+    y = np.asarray(y, dtype=np.float64)
+    return y[np.newaxis, :] if y.ndim == 1 else y
+
+
+def _channel_weights(n_channels: int) -> np.ndarray:
+    if n_channels == len(_SURROUND_WEIGHTS):
+        return _SURROUND_WEIGHTS
+    return np.ones(n_channels)
+
+
+def _to_lufs(power: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10.0 * np.log10(power)
+
+
+def _block_power(weighted_sq: np.ndarray, sr: int, block_sec: float) -> np.ndarray:
+    """
+    Mean-square power of every block_sec window ending on a 100 ms boundary,
+    channel-weighted and summed. One cumulative sum makes this O(n) for any window size.
+    """
+    n = weighted_sq.shape[-1]
+    win = int(round(block_sec * sr))
+    step = int(round(STEP_SEC * sr))
+    if n < win:
+        return np.empty(0)
+    cumsum = np.concatenate([np.zeros(1), np.cumsum(weighted_sq)])
+    ends = np.arange(win, n + 1, step)
+    return (cumsum[ends] - cumsum[ends - win]) / win
+
+
+def _gated_power(power: np.ndarray, relative_gate_lu: float) -> np.ndarray:
+    gated = power[_to_lufs(power) > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return gated
+    threshold = _to_lufs(np.mean(gated)) + relative_gate_lu
+    return gated[_to_lufs(gated) > threshold]
+
+
+def true_peak(y: np.ndarray, sr: int, chunk_sec: float = 10.0) -> float:
+    """Oversampled (4x below 96 kHz) true peak in dBTP, processed in chunks to bound memory."""
+    channels = _as_channels(y)
+    factor = 4 if sr < 96000 else (2 if sr < 192000 else 1)
+    if factor == 1:
+        peak = float(np.max(np.abs(channels))) if channels.size else 0.0
+    else:
+        chunk = int(chunk_sec * sr)
+        context = 64  # enough history for the polyphase interpolation filter
+        peak = 0.0
+        n = channels.shape[-1]
+        for start in range(0, n, chunk):
+            lo = max(0, start - context)
+            hi = min(n, start + chunk + context)
+            up = scipy.signal.resample_poly(channels[:, lo:hi], factor, 1, axis=-1)
+            keep = up[:, (start - lo) * factor:(min(n, start + chunk) - lo) * factor]
+            if keep.size:
+                peak = max(peak, float(np.max(np.abs(keep))))
+    with np.errstate(divide="ignore"):
+        return float(20.0 * np.log10(peak)) if peak > 0 else float("-inf")
+
+
+def measure(y: np.ndarray, sr: int) -> Dict[str, Any]:
+    """
+    Measures decoded PCM (mono (n,) or multichannel (channels, n)).
+    Returns the same layout as the ffmpeg scan:
+    {"summary": {"lufs_i", "lra", "true_peak"}, "timeseries": {"t": ndarray, "lufs": ndarray}}
+    """
+    channels = _as_channels(y)
+    (b1, a1), (b2, a2) = k_weighting_coefficients(sr)
+    filtered = scipy.signal.lfilter(b2, a2, scipy.signal.lfilter(b1, a1, channels, axis=-1), axis=-1)
+    weighted_sq = np.einsum("c,cn->n", _channel_weights(channels.shape[0]), filtered * filtered)
+    del filtered
+
+    # Integrated loudness: 400 ms blocks (75% overlap), absolute then relative gate
+    momentary_power = _block_power(weighted_sq, sr, MOMENTARY_SEC)
+    gated = _gated_power(momentary_power, RELATIVE_GATE_LU)
+    lufs_i = float(_to_lufs(np.mean(gated))) if gated.size else ABSOLUTE_GATE_LUFS
+
+    # Loudness range: 3 s short-term blocks, -20 LU relative gate, P95 - P10
+    short_power = _block_power(weighted_sq, sr, SHORT_TERM_SEC)
+    short_gated = _gated_power(short_power, LRA_RELATIVE_GATE_LU)
+    if short_gated.size:
+        low, high = np.percentile(_to_lufs(short_gated), [10, 95])
+        lra = float(high - low)
+    else:
+        lra = 0.0
+
+    momentary = _to_lufs(momentary_power)
+    times = MOMENTARY_SEC + STEP_SEC * np.arange(momentary.size)
+    audible = momentary > ABSOLUTE_GATE_LUFS
+    timeseries = {"t": np.round(times[audible], 1), "lufs": np.round(momentary[audible], 1)}
+
+    return {
+        "summary": {
+            "lufs_i": round(lufs_i, 1),
+            "lra": round(lra, 1),
+            "true_peak": round(true_peak(channels, sr), 1),
+        },
+        "timeseries": timeseries,
+    }
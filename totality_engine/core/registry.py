@@ -0,0 +1,227 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# None -> unbounded
+DEFAULT_BUDGET_MB = float(os.environ["TOTALITY_MODEL_BUDGET_MB"]) if os.environ.get("TOTALITY_MODEL_BUDGET_MB") else None
+# A failed load is retried on the first request after this long (e.g. a model download that timed out)
+DEFAULT_RETRY_SEC = float(os.environ.get("TOTALITY_MODEL_RETRY_SEC", "300"))
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a model failed to load (the failure is remembered for retry_sec so it is not retried on every call)."""
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def estimate_nbytes(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Bytes held by a model's tensors: torch modules (incl. int8 packed params), HF pipelines,
+    ONNX/exported runners and containers of those. Objects it does not know count as 0.
+    """
+    seen = _seen if _seen is not None else set()
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    try:
+        import torch
+    except ImportError:
+        torch = None
+
+    if torch is not None:
+        if isinstance(obj, torch.Tensor):
+            try:
+                return obj.numel() * obj.element_size()
+            except Exception: # packed/quantized tensors without a plain layout
+                return 0
+        if isinstance(obj, torch.nn.Module):
+            try:
+                state = obj.state_dict()
+            except Exception:
+                state = {}
+            return sum(estimate_nbytes(v, seen) for v in state.values())
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(v, seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_nbytes(v, seen) for v in obj)
+    if hasattr(obj, "nbytes") and not callable(obj.nbytes):
+        return int(obj.nbytes)
+    # HF pipelines and inference runners hold the weights one attribute down
+    for attr in ("model", "_forward"):
+        if hasattr(obj, attr):
+            return estimate_nbytes(getattr(obj, attr), seen)
+    return 0
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "load_sec", "last_used", "hits")
+
+    def __init__(self, value: Any, nbytes: int, load_sec: float):
+        self.value = value
+        self.nbytes = nbytes
+        self.load_sec = load_sec
+        self.last_used = time.time()
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide store for heavy models. Engines ask for a model by key with a loader;
+    it is loaded on first use and shared by every engine and pipeline in the process.
+    When the resident total exceeds budget_mb, least recently used models are dropped
+    (engines that still hold a reference keep it alive until their call returns).
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, budget_mb: Optional[float] = DEFAULT_BUDGET_MB, retry_sec: float = DEFAULT_RETRY_SEC):
+        self.budget_mb = budget_mb
+        self.retry_sec = retry_sec
+        self._models: "OrderedDict[str, _Entry]" = OrderedDict()
+        # key -> (error, time.monotonic() of the failure)
+        self._failures: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        # One lock per key so a model is loaded once even when requested concurrently
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def configure(self, budget_mb: Optional[float] = None):
+        """Applies a budget (e.g. from the engines config) and evicts down to it."""
+        with self._lock:
+            self.budget_mb = budget_mb
+            self._evict()
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            if key not in self._load_locks:
+                self._load_locks[key] = threading.Lock()
+            return self._load_locks[key]
+
+    def _failure(self, key: str) -> Optional[str]:
+        """The remembered load error for key, dropped once retry_sec has passed. Call with self._lock held."""
+        if key not in self._failures:
+            return None
+        error, failed_at = self._failures[key]
+        if time.monotonic() - failed_at >= self.retry_sec:
+            del self._failures[key]
+            return None
+        return error
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the model for key, calling loader() the first time. Raises ModelLoadError if loading
+        failed within the last retry_sec; after that the next call tries loader() again.
+        """
+        with self._lock:
+            if key in self._models:
+                return self._touch(key)
+            error = self._failure(key)
+            if error is not None:
+                raise ModelLoadError(error)
+
+        with self._load_lock(key):
+            with self._lock:
+                if key in self._models:
+                    return self._touch(key)
+                error = self._failure(key)
+                if error is not None:
+                    raise ModelLoadError(error)
+
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            try:
+                value = loader()
+            except Exception as e:
+                logger.error(f"Failed to load model '{key}': {e}")
+                with self._lock:
+                    self._failures[key] = (str(e), time.monotonic())
+                raise ModelLoadError(str(e)) from e
+            load_sec = time.perf_counter() - start
+
+            nbytes = estimate_nbytes(value)
+            rss_after = _rss_bytes()
+            if not nbytes and rss_before is not None and rss_after is not None:
+                nbytes = max(0, rss_after - rss_before)
+            logger.info(f"Loaded model '{key}' in {load_sec:.1f}s (~{nbytes / 1e6:.0f} MB).")
+
+            with self._lock:
+                self._models[key] = _Entry(value, nbytes, load_sec)
+                value = self._touch(key)
+                self._evict(keep=key)
+            return value
+
+    def _touch(self, key: str) -> Any:
+        entry = self._models[key]
+        entry.last_used = time.time()
+        entry.hits += 1
+        self._models.move_to_end(key)
+        return entry.value
+
+    def _evict(self, keep: Optional[str] = None):
+        if self.budget_mb is None:
+            return
+        budget = self.budget_mb * 1024 * 1024
+        total = sum(e.nbytes for e in self._models.values())
+        for key in list(self._models):
+            if total <= budget:
+                break
+            if key == keep:
+                continue # the model just requested always stays, even if it alone exceeds the budget
+            total -= self._models.pop(key).nbytes
+            logger.info(f"Evicted model '{key}' (model budget {self.budget_mb:g} MB).")
+
+    def evict(self, key: str) -> bool:
+        with self._lock:
+            return self._models.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._failures.clear()
+
+    def loaded(self, key: str) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model memory and usage, most recently used last."""
+        with self._lock:
+            models = {
+                key: {
+                    "mb": round(e.nbytes / (1024 * 1024), 1),
+                    "load_sec": round(e.load_sec, 2),
+                    "hits": e.hits,
+                    "last_used": round(e.last_used, 3)
+                }
+                for key, e in self._models.items()
+            }
+            return {
+                "budget_mb": self.budget_mb,
+                "total_mb": round(sum(e.nbytes for e in self._models.values()) / (1024 * 1024), 1),
+                "models": models,
+                "failed": {key: error for key, (error, _) in self._failures.items()}
+            }
+
+
+# Global accessor
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry.get_instance()
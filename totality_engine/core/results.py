@@ -0,0 +1,174 @@
+import os
+import json
+import zlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, inspect, text
+from sqlmodel import Session, SQLModel, select
+
+from totality_engine.core.schema import AnalysisResult, StageOutput
+from totality_engine.core.embeddings import ensure_embedding_columns, get_embedding, strip_embedding
+
+logger = logging.getLogger(__name__)
+
+# Days a stored full result is kept (None/0: forever)
+RESULT_TTL_DAYS = float(os.environ.get("TOTALITY_RESULT_TTL_DAYS", "30")) or None
+COMPRESSION_LEVEL = 6
+# Stage outputs left behind by workflows that never finished are purged after this long
+STAGE_OUTPUT_TTL_SEC = 24 * 3600.0
+
+# Columns added to analysisresult after it first shipped (create_all does not alter existing tables)
+_RESULT_COLUMNS = {
+    "results_blob": "BLOB",
+    "results_expires_at": "DATETIME",
+}
+
+
+def encode_results(result: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(result, separators=(",", ":"), default=str).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decode_results(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def store_results(row: AnalysisResult, result: Dict[str, Any], ttl_days: Optional[float] = RESULT_TTL_DAYS):
+    """Stores the full result on a row, compressed and without the embedding (kept in its own column)."""
+    row.results_blob = encode_results(strip_embedding(result))
+    row.results_expires_at = datetime.utcnow() + timedelta(days=ttl_days) if ttl_days else None
+
+
+def load_results(row: AnalysisResult, with_embedding: bool = True) -> Optional[Dict[str, Any]]:
+    """Full result of a row (legacy raw_json rows included); None once expired."""
+    if row.results_blob is not None:
+        if row.results_expires_at is not None and row.results_expires_at < datetime.utcnow():
+            return None
+        result = decode_results(row.results_blob)
+    elif row.raw_json:
+        result = json.loads(row.raw_json)
+    else:
+        return None
+
+    if with_embedding:
+        embedding = get_embedding(row)
+        if embedding is not None:
+            result.setdefault("creative", {})["embedding"] = embedding.tolist()
+    return result
+
+
+def partial_result(result: Any) -> Any:
+    """A stage output as sent in progress events: embedding vectors are left for the final result."""
+    if not isinstance(result, dict):
+        return result
+    partial = {k: v for k, v in result.items() if k != "embedding"}
+    if isinstance(partial.get("timeline"), list):
+        partial["timeline"] = [
+            {k: v for k, v in entry.items() if k != "embedding"} if isinstance(entry, dict) else entry
+            for entry in partial["timeline"]
+        ]
+    return partial
+
+
+def result_summary(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Headline numbers small enough for a task result / job poll."""
+    creative = result.get("creative", {})
+    resonance = result.get("resonance") or {}
+    loudness = result.get("loudness") or {}
+    return {
+        "profile": result.get("profile"),
+        "tempo": creative.get("tempo"),
+        "lufs_i": loudness.get("lufs_i"),
+        "dissonance_score": resonance.get("dissonance_score"),
+        "vibe": resonance.get("vibe"),
+        "embedding_status": creative.get("status"),
+    }
+
+
+def purge_expired_results(engine, batch_size: int = 500) -> int:
+    """Drops full results past their expiry (rows and embeddings stay). Returns the number purged."""
+    purged = 0
+    while True:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(AnalysisResult)
+                .where(AnalysisResult.results_blob.is_not(None), AnalysisResult.results_expires_at < datetime.utcnow())
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                row.results_blob = None
+                session.add(row)
+            session.commit()
+            purged += len(rows)
+    if purged:
+        logger.info(f"Purged {purged} expired analysis results.")
+    return purged
+
+
+def ensure_result_columns(engine) -> List[str]:
+    """Adds the compressed-results columns to an existing analysisresult table. Returns the columns added."""
+    inspector = inspect(engine)
+    if not inspector.has_table(AnalysisResult.__tablename__):
+        return []
+    existing = {c["name"] for c in inspector.get_columns(AnalysisResult.__tablename__)}
+    added = []
+    with engine.begin() as conn:
+        for name, sql_type in _RESULT_COLUMNS.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {AnalysisResult.__tablename__} ADD COLUMN {name} {sql_type}"))
+                added.append(name)
+    if added:
+        logger.info(f"Added columns to {AnalysisResult.__tablename__}: {', '.join(added)}")
+    return added
+
+
+def ensure_analysis_result_columns(engine) -> List[str]:
+    """
+    Adds every column analysisresult gained after it first shipped (binary embeddings, compressed results).
+    Run before any query on AnalysisResult: the model selects all of them. Returns the columns added.
+    """
+    return ensure_embedding_columns(engine) + ensure_result_columns(engine)
+
+
+def ensure_stage_output_table(engine):
+    SQLModel.metadata.create_all(engine, tables=[StageOutput.__table__])
+
+
+def save_stage_output(engine, job_id: str, stage: str, result: Any) -> int:
+    """Stores a stage result for the rest of a fanned-out job. Returns its reference (row id)."""
+    with Session(engine) as session:
+        row = StageOutput(job_id=job_id, stage=stage, blob=encode_results(result))
+        session.add(row)
+        session.commit()
+        return row.id
+
+
+def load_stage_outputs(engine, refs: Dict[str, int]) -> Dict[str, Any]:
+    """{stage: result} for {stage: reference}; stages whose output is gone are left out."""
+    if not refs:
+        return {}
+    with Session(engine) as session:
+        rows = session.exec(select(StageOutput).where(StageOutput.id.in_(list(refs.values())))).all()
+        by_id = {row.id: row.blob for row in rows}
+    return {stage: decode_results(by_id[ref]) for stage, ref in refs.items() if ref in by_id}
+
+
+def delete_stage_outputs(engine, job_id: str) -> int:
+    with Session(engine) as session:
+        deleted = session.execute(delete(StageOutput).where(StageOutput.job_id == job_id)).rowcount
+        session.commit()
+    return deleted
+
+
+def purge_stage_outputs(engine, max_age_sec: float = STAGE_OUTPUT_TTL_SEC) -> int:
+    """Deletes stage outputs of jobs that never finished (crashed workers, lost chords)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_sec)
+    with Session(engine) as session:
+        deleted = session.execute(delete(StageOutput).where(StageOutput.created_at < cutoff)).rowcount
+        session.commit()
+    if deleted:
+        logger.info(f"Purged {deleted} stale stage outputs.")
+    return deleted
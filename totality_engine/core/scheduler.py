@@ -0,0 +1,221 @@
+import os
+import time
+import pickle
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from totality_engine.core.cache import FeatureCache, fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    A unit of pipeline work.
+    func receives a dict of {dependency name: dependency result} and returns this stage's result.
+
+    version: bump whenever the stage's code or model changes, to invalidate cached outputs.
+    inputs: JSON-like config/metadata the output depends on (part of the cache key).
+    cacheable: False for stages reading live external state.
+    cache_if: predicate deciding whether a particular result may be stored
+    (default: any non-empty result; analyzers return {} on failure).
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (),
+                 version: str = "1", inputs: Any = None, cacheable: bool = True,
+                 cache_if: Callable[[Any], bool] = bool):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.version = version
+        self.inputs = inputs
+        self.cacheable = cacheable
+        self.cache_if = cache_if
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, deps={self.deps})"
+
+
+class StageScheduler:
+    """
+    Runs a declarative stage dependency graph on an executor.
+    Independent stages overlap; a stage starts as soon as all of its dependencies finish,
+    so wall time is bounded by the critical path rather than the sum of stages.
+
+    executor: "thread" (default), "process", or an existing concurrent.futures.Executor.
+    Process pools require stage functions (and their inputs/outputs) to be picklable, i.e.
+    module-level callables; closures and bound methods of stateful engines are not.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, executor: Union[str, Executor] = "thread"):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        if isinstance(executor, Executor):
+            self._executor = executor
+        elif executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        elif executor == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        else:
+            raise ValueError(f"Unknown executor type: {executor}")
+        self._pickles_stages = isinstance(self._executor, ProcessPoolExecutor)
+
+    def _check_picklable(self, stages: List[Stage]):
+        # Fail up front with the stage name rather than on every submit()
+        for stage in stages:
+            try:
+                pickle.dumps(stage.func)
+            except Exception as e:
+                raise ValueError(f"Stage '{stage.name}' cannot run on a process pool: its function is not "
+                                 f"picklable ({e}); use a module-level callable or the thread executor") from e
+
+    @staticmethod
+    def _validate(stages: List[Stage]):
+        names = [s.name for s in stages]
+        if len(names) != len(set(names)):
+            raise ValueError("Duplicate stage names in graph")
+        known = set(names)
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in known]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {missing}")
+
+        # Only to reject cycles up front
+        StageScheduler.levels(stages)
+
+    @staticmethod
+    def levels(stages: List[Stage]) -> List[List[str]]:
+        """
+        Stage names grouped by dependency depth (Kahn's algorithm): every stage's dependencies
+        are in earlier levels, so each level can run as one parallel batch (e.g. a Celery chord).
+        """
+        remaining = {s.name: set(s.deps) for s in stages}
+        levels = []
+        while remaining:
+            ready = [n for n, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle detected among stages: {sorted(remaining)}")
+            for n in ready:
+                del remaining[n]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+            levels.append(ready)
+        return levels
+
+    @staticmethod
+    def _cache_key(cache: FeatureCache, namespace: str, stage: Stage, upstream: Dict[str, Any]) -> str:
+        return cache.make_key(namespace, stage.name, stage.version, stage.inputs,
+                              [fingerprint(upstream[d]) for d in stage.deps])
+
+    @staticmethod
+    def _timed(func: Callable, upstream: Dict[str, Any]):
+        start = time.perf_counter()
+        result = func(upstream)
+        return result, time.perf_counter() - start
+
+    def run(self, stages: List[Stage],
+            on_complete: Optional[Callable[[str, Any], None]] = None,
+            timings: Optional[Dict[str, float]] = None,
+            cache: Optional[FeatureCache] = None,
+            namespace: str = "",
+            cache_hits: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Executes the graph and returns {stage name: result}.
+        on_complete(name, result) is called in the caller's thread as each stage finishes.
+        timings, if given, is filled with seconds spent in each stage.
+        cache: persistent store consulted before running a cacheable stage. The key covers
+        namespace (e.g. the audio content hash), stage name, version, inputs and the
+        fingerprints of its dependencies' results, so only invalidated stages recompute.
+        cache_hits, if given, collects the names of stages served from the cache.
+        The first stage exception cancels pending stages and is re-raised.
+        """
+        self._validate(stages)
+        if self._pickles_stages:
+            self._check_picklable(stages)
+        if timings is None:
+            timings = {}
+        if cache_hits is None:
+            cache_hits = []
+
+        by_name = {s.name: s for s in stages}
+        results: Dict[str, Any] = {}
+        keys: Dict[str, str] = {}
+        pending = {s.name: set(s.deps) for s in stages}
+        running = {}
+
+        def finish(name: str, result: Any, elapsed: float):
+            results[name] = result
+            timings[name] = round(elapsed, 4)
+            for deps in pending.values():
+                deps.discard(name)
+            if on_complete:
+                on_complete(name, result)
+
+        def submit_ready():
+            # Loop because cache hits can make further stages ready immediately
+            while True:
+                ready = [n for n, deps in pending.items() if not deps]
+                if not ready:
+                    return
+                for name in ready:
+                    stage = by_name[name]
+                    del pending[name]
+                    upstream = {d: results[d] for d in stage.deps}
+
+                    if cache is not None and stage.cacheable:
+                        keys[name] = self._cache_key(cache, namespace, stage, upstream)
+                        hit, value = cache.get(keys[name])
+                        if hit:
+                            cache_hits.append(name)
+                            finish(name, value, 0.0)
+                            continue
+
+                    running[self._executor.submit(self._timed, stage.func, upstream)] = name
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, elapsed = future.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    logger.error(f"Stage '{name}' failed; cancelling remaining stages.")
+                    raise
+
+                if name in keys and by_name[name].cache_if(result):
+                    try:
+                        cache.put(keys[name], result)
+                    except Exception as e:
+                        logger.warning(f"Could not cache stage '{name}': {e}")
+                finish(name, result, elapsed)
+            submit_ready()
+
+        return results
+
+    def run_one(self, stage: Stage, upstream: Dict[str, Any], cache: Optional[FeatureCache] = None,
+                namespace: str = "") -> Tuple[Any, float, bool]:
+        """
+        Runs a single stage in the caller's thread, given its dependencies' results, with the same
+        cache lookup/store as run() (e.g. one stage per distributed subtask).
+        Returns (result, seconds, served from cache).
+        """
+        key = None
+        if cache is not None and stage.cacheable:
+            key = self._cache_key(cache, namespace, stage, upstream)
+            hit, value = cache.get(key)
+            if hit:
+                return value, 0.0, True
+
+        result, elapsed = self._timed(stage.func, upstream)
+        if key is not None and stage.cache_if(result):
+            try:
+                cache.put(key, result)
+            except Exception as e:
+                logger.warning(f"Could not cache stage '{stage.name}': {e}")
+        return result, round(elapsed, 4), False
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -143,10 +143,20 @@ class AnalysisResult(SQLModel, table=True):
     filename: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     status: str
-    raw_json: str # Storing as stringified JSON for SQLite compatibility and simplicity
+    raw_json: str = "" # Legacy uncompressed results; new rows use results_blob
+    
+    # Full results as zlib-compressed JSON without the embedding (see totality_engine.core.results).
+    # The blob is dropped after results_expires_at; the row, summary columns and embedding stay.
+    results_blob: Optional[bytes] = None
+    results_expires_at: Optional[datetime] = None
     
     # AI Embeddings (for Similarity Search)
-    embedding_json: Optional[str] = None # JSON list of floats
+    # Raw little-endian float32 bytes; read with totality_engine.core.embeddings.get_embedding
+    embedding: Optional[bytes] = None
+    embedding_dim: Optional[int] = None
+    embedding_dtype: Optional[str] = None
+    embedding_model: Optional[str] = None
+    embedding_json: Optional[str] = None # Legacy JSON list of floats (cleared by migrate_embeddings)
     
     # Resonance Metrics
     dissonance_score: Optional[float] = None
@@ -156,3 +166,23 @@ class AnalysisResult(SQLModel, table=True):
     # Metadata for searching
     artist_id: Optional[str] = None
     markets: Optional[str] = None
+
+class StageOutput(SQLModel, table=True):
+    """One stage's result while a fanned-out Celery analysis runs; subtasks pass its id, not the data."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: str = Field(index=True)
+    stage: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    blob: bytes # zlib-compressed JSON (see totality_engine.core.results)
+
+class AnalysisJob(SQLModel, table=True):
+    """Status of an API analysis job; holds the result once finished (see core/jobs.py)."""
+    id: str = Field(primary_key=True)
+    status: str = Field(index=True) # queued, processing, completed, failed
+    submitted_at: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    metadata_json: str = "{}"
+    result_json: Optional[str] = None # Legacy uncompressed result; new jobs use result_blob
+    result_blob: Optional[bytes] = None # zlib-compressed JSON (see totality_engine.core.results)
+    error: Optional[str] = None
+    owner: Optional[str] = None # "host:pid" of the process running the job (see SQLJobStore.recover)
@@ -0,0 +1,543 @@
+import os
+import json
+import uuid
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from totality_engine.core.pq import PQCodec
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.environ.get("TOTALITY_INDEX_DIR", ".totality_index")
+INDEX_VERSION = 1
+BLOCK_ROWS = 65536 # rows scored per matmul when scanning
+IVF_THRESHOLD = 50000 # "auto" switches from exact scan to IVF at this many vectors
+REBUILD_RATIO = 0.2 # IVF is due for retraining once the unclustered tail exceeds this fraction
+MAX_TAIL_ROWS = 100000 # ... or this many rows, whichever is smaller (every query scans the whole tail)
+RERANK_FACTOR = 10 # with PQ, the top k * factor ADC candidates are re-scored with the full vectors
+
+
+def _normalize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-normalizes for cosine scoring; returns (vectors, mask of non-zero rows)."""
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(vectors, axis=1)
+    valid = norms > 0
+    out = np.zeros_like(vectors)
+    out[valid] = vectors[valid] / norms[valid, None]
+    return out, valid
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = BLOCK_ROWS) -> np.ndarray:
+    """Nearest centroid (max inner product) per row, in blocks to bound memory."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(np.asarray(vectors[start:start + block]) @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iters: int = 10, sample: int = 64, seed: int = 0) -> np.ndarray:
+    """
+    Cosine k-means on a sample of up to `sample` points per centroid.
+    Returns [k, dim] unit-norm centroids; empty clusters are reseeded from random points.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    picks = np.sort(rng.choice(n, size=min(n, k * sample), replace=False))
+    x = np.asarray(vectors[picks], dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = _assign(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        present = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts[present])[:-1]])
+        sums = np.add.reduceat(x[order], starts, axis=0)
+
+        centroids[present] = sums
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty), replace=False)]
+        centroids, _ = _normalize(centroids)
+    return centroids
+
+
+class SimilarityIndex:
+    """
+    Disk-backed cosine top-k index over track embeddings, keyed by AnalysisResult id.
+
+    Vectors live in a memory-mapped float32 file (append-only, capacity doubles as it grows),
+    so the index opens instantly and the OS pages in only what queries touch.
+    kind="exact": blocked matmul over every vector (best for small catalogs).
+    kind="ivf": k-means inverted lists; a query scores nprobe lists plus the not-yet-clustered
+    tail of recent additions. kind="auto": exact below ivf_threshold vectors, IVF above.
+
+    Optional compression (train_pq): PCA + product-quantized codes (m bytes per vector) scored
+    with asymmetric distance computation; only the codes need to be resident, and the full
+    vectors on disk are touched just for re-ranking the shortlist (rerank=0 disables it).
+
+    Safe for one writer process at a time (file lock) with any number of reader processes;
+    readers pick up appended vectors on their next query. add() never retrains the IVF lists;
+    callers check needs_build() and run build() off the write path (see tasks.build_index_task).
+    """
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR, kind: str = "auto", ivf_threshold: int = IVF_THRESHOLD,
+                 nlist: Optional[int] = None, nprobe: int = 8, use_pq: bool = True, rerank: int = RERANK_FACTOR):
+        if kind not in ("auto", "exact", "ivf"):
+            raise ValueError(f"Unknown index kind: {kind}")
+        self.directory = directory
+        self.kind = kind
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.use_pq = use_pq
+        self.rerank = rerank
+        self._lock = threading.RLock()
+        self._meta: Dict[str, Any] = {}
+        self._meta_mtime: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+        self._pq: Optional[PQCodec] = None
+        self._codes: Optional[np.memmap] = None
+        # Lookup for vector_for: ids sorted, their rows, and the (epoch, count) they cover
+        self._id_map: Optional[Tuple[np.ndarray, np.ndarray, Optional[str], int]] = None
+        self._lock_depth = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    # --- Files ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive across processes (flock) and threads; re-entrant within one thread."""
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(self._path(".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_array(self, name: str, array: np.ndarray):
+        # Never rewrite a file in place: readers may have it memory-mapped
+        tmp_path = self._path(f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, self._path(name))
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp_path = self._path(f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path("meta.json")) # readers see either the old or the new count
+
+    def _refresh(self):
+        """Re-opens the maps if another process (or a writer in this one) changed the index."""
+        try:
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            self._meta, self._meta_mtime, self._vectors, self._ids, self._ivf = {}, None, None, None, None
+            self._pq, self._codes = None, None
+            return
+        if mtime == self._meta_mtime:
+            return
+
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Index at {self.directory} has version {meta.get('version')}, expected {INDEX_VERSION}; rebuild it.")
+
+        self._meta, self._meta_mtime = meta, mtime
+        capacity, dim = meta["capacity"], meta["dim"]
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(capacity, dim)) if capacity else None
+        self._ids = np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r", shape=(capacity,)) if capacity else None
+
+        self._ivf = None
+        if meta.get("ivf"):
+            self._ivf = {
+                "centroids": np.load(self._path("ivf_centroids.npy")),
+                "offsets": np.load(self._path("ivf_offsets.npy")),
+                "order": np.load(self._path("ivf_order.npy"), mmap_mode="r"),
+                "built_count": meta["ivf"]["built_count"],
+            }
+
+        self._pq, self._codes = None, None
+        if meta.get("pq"):
+            self._pq = PQCodec.load(self._path("pq_codec.npz"))
+            self._codes = np.memmap(self._path("pq_codes.u8"), dtype=np.uint8, mode="r", shape=(capacity, self._pq.m))
+
+    def _grow(self, capacity: int, dim: int, pq_m: Optional[int] = None):
+        files = [("vectors.f32", 4 * dim), ("ids.i64", 8)]
+        if pq_m:
+            files.append(("pq_codes.u8", pq_m))
+        for name, itemsize in files:
+            with open(self._path(name), "ab") as f:
+                f.truncate(capacity * itemsize)
+
+    # --- Introspection ---
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._meta.get("count", 0))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            meta = dict(self._meta)
+            return {
+                "count": meta.get("count", 0),
+                "dim": meta.get("dim"),
+                "model": meta.get("model"),
+                "kind": "ivf" if self._use_ivf() else "exact",
+                "ivf": meta.get("ivf"),
+                "pq": meta.get("pq"),
+            }
+
+    def _use_ivf(self) -> bool:
+        if self._ivf is None:
+            return False
+        return self.kind == "ivf" or (self.kind == "auto" and self._meta.get("count", 0) >= self.ivf_threshold)
+
+    # --- Writes ---
+
+    def add(self, ids: Sequence[int], vectors: Sequence[Sequence[float]], model: Optional[str] = None) -> int:
+        """Appends embeddings (zero vectors, e.g. fallback outputs, are skipped). Returns how many were added."""
+        vectors, valid = _normalize(np.asarray(vectors, dtype=np.float32))
+        ids = np.asarray(ids, dtype=np.int64)[valid]
+        vectors = vectors[valid]
+        if len(ids) == 0:
+            return 0
+
+        with self._write_lock():
+            self._refresh()
+            meta = dict(self._meta) or {"version": INDEX_VERSION, "dim": int(vectors.shape[1]), "count": 0,
+                                        "capacity": 0, "model": model, "ivf": None, "epoch": uuid.uuid4().hex}
+            if vectors.shape[1] != meta["dim"]:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} does not match index dim {meta['dim']}")
+
+            pq_m = self._pq.m if self._pq is not None else None
+            count, needed = meta["count"], meta["count"] + len(ids)
+            if needed > meta["capacity"]:
+                meta["capacity"] = max(1024, 2 * meta["capacity"], needed)
+                self._grow(meta["capacity"], meta["dim"], pq_m)
+
+            out_vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+", shape=(meta["capacity"], meta["dim"]))
+            out_ids = np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r+", shape=(meta["capacity"],))
+            out_vectors[count:needed] = vectors
+            out_ids[count:needed] = ids
+            out_vectors.flush()
+            out_ids.flush()
+            del out_vectors, out_ids
+
+            if pq_m:
+                out_codes = np.memmap(self._path("pq_codes.u8"), dtype=np.uint8, mode="r+", shape=(meta["capacity"], pq_m))
+                out_codes[count:needed] = self._pq.encode(vectors)
+                out_codes.flush()
+                del out_codes
+
+            meta["count"] = needed
+            self._write_meta(meta)
+            self._refresh()
+        return len(ids)
+
+    def needs_build(self) -> bool:
+        """True when the IVF lists are missing or the unclustered tail has outgrown them."""
+        with self._lock:
+            self._refresh()
+            count = self._meta.get("count", 0)
+            if self.kind == "exact" or (self.kind == "auto" and count < self.ivf_threshold):
+                return False
+            if self._ivf is None:
+                return True
+            tail = count - self._ivf["built_count"]
+            return tail > min(REBUILD_RATIO * self._ivf["built_count"], MAX_TAIL_ROWS)
+
+    def build(self):
+        """(Re)trains the IVF lists over every stored vector."""
+        with self._write_lock():
+            self._refresh()
+            meta = dict(self._meta)
+            count = meta.get("count", 0)
+            if count == 0:
+                return
+            nlist = min(self.nlist or max(1, int(np.sqrt(count))), count)
+            logger.info(f"Building IVF index: {count} vectors, {nlist} lists...")
+
+            vectors = self._vectors[:count]
+            centroids = spherical_kmeans(vectors, nlist)
+            assign = _assign(vectors, centroids)
+            order = np.argsort(assign, kind="stable").astype(np.int64)
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+
+            self._save_array("ivf_centroids.npy", centroids)
+            self._save_array("ivf_offsets.npy", offsets)
+            self._save_array("ivf_order.npy", order)
+            meta["ivf"] = {"built_count": count, "nlist": nlist}
+            self._write_meta(meta)
+            self._refresh()
+
+    def rebuild(self, ids: Sequence[int], vectors: np.ndarray, model: Optional[str] = None) -> int:
+        """Replaces the whole index (e.g. from load_embedding_matrix); a PQ codec is retrained with the same shape."""
+        with self._write_lock():
+            self._refresh()
+            pq_params = dict(self._meta["pq"]) if self._meta.get("pq") else None
+            for name in ("meta.json", "vectors.f32", "ids.i64", "ivf_centroids.npy", "ivf_offsets.npy", "ivf_order.npy",
+                         "pq_codec.npz", "pq_codes.u8"):
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+            self._refresh()
+            added = 0
+            for start in range(0, len(ids), BLOCK_ROWS):
+                added += self.add(ids[start:start + BLOCK_ROWS], vectors[start:start + BLOCK_ROWS], model=model)
+            if self.needs_build():
+                self.build()
+            if pq_params and added:
+                self.train_pq(pca_dim=pq_params["pca_dim"], m=pq_params["m"], ks=pq_params["ks"])
+            return added
+
+    def train_pq(self, pca_dim: Optional[int] = 128, m: int = 16, ks: int = 256, iters: int = 20,
+                 sample: int = 65536, evaluate: bool = True) -> Dict[str, Any]:
+        """
+        Trains the PCA + PQ codec on the stored vectors (offline), encodes all of them, and
+        (optionally) measures recall against exact search. Returns the codec settings and recall report.
+        """
+        with self._write_lock():
+            self._refresh()
+            meta = dict(self._meta)
+            count = meta.get("count", 0)
+            if count == 0:
+                raise ValueError("Index is empty; add embeddings before training PQ")
+
+            codec = PQCodec(meta["dim"], pca_dim, m, ks).fit(self._vectors[:count], iters=iters, sample=sample)
+            tmp_path = self._path(f"pq_codes.u8.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.truncate(meta["capacity"] * codec.m)
+            codes = np.memmap(tmp_path, dtype=np.uint8, mode="r+", shape=(meta["capacity"], codec.m))
+            for start in range(0, count, BLOCK_ROWS):
+                end = min(start + BLOCK_ROWS, count)
+                codes[start:end] = codec.encode(self._vectors[start:end])
+            codes.flush()
+            del codes
+            os.replace(tmp_path, self._path("pq_codes.u8"))
+
+            codec_tmp = self._path(f"pq_codec.{os.getpid()}.tmp")
+            codec.save(codec_tmp)
+            os.replace(codec_tmp, self._path("pq_codec.npz"))
+
+            meta["pq"] = {"pca_dim": codec.pca_dim, "m": codec.m, "ks": codec.ks,
+                          "bytes_per_vector": codec.m, "compression": round(meta["dim"] * 4 / codec.m, 1)}
+            self._write_meta(meta)
+            self._refresh()
+
+            if evaluate:
+                meta["pq"]["recall"] = self.evaluate_recall()
+                self._write_meta(meta)
+                self._refresh()
+            return meta["pq"]
+
+    # --- Queries ---
+
+    def _rows_by_id(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(sorted ids, their rows), extended with rows appended since the last call; reset when the index is replaced."""
+        count, epoch = self._meta.get("count", 0), self._meta.get("epoch")
+        if self._id_map is not None and (self._id_map[2] != epoch or self._id_map[3] > count):
+            self._id_map = None
+        if self._id_map is None:
+            self._id_map = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), epoch, 0)
+
+        sorted_ids, rows, _, mapped = self._id_map
+        if count > mapped:
+            ids = np.concatenate([sorted_ids, np.asarray(self._ids[mapped:count])])
+            rows = np.concatenate([rows, np.arange(mapped, count, dtype=np.int64)])
+            # Stable sort of two sorted runs: linear, and a re-added id keeps its latest row last
+            order = np.argsort(ids, kind="stable")
+            self._id_map = (ids[order], rows[order], epoch, count)
+        return self._id_map[0], self._id_map[1]
+
+    def vector_for(self, track_id: int) -> Optional[np.ndarray]:
+        """Stored (normalized) embedding of a track, or None if it is not indexed."""
+        with self._lock:
+            self._refresh()
+            if not self._meta.get("count", 0):
+                return None
+            sorted_ids, rows = self._rows_by_id()
+            i = np.searchsorted(sorted_ids, track_id, side="right") - 1
+            if i < 0 or sorted_ids[i] != track_id:
+                return None
+            return np.array(self._vectors[rows[i]])
+
+    def _candidates(self, query: np.ndarray, ivf: bool) -> Iterable[np.ndarray]:
+        """Row-index blocks to score for a query."""
+        count = self._meta["count"]
+        if not ivf:
+            for start in range(0, count, BLOCK_ROWS):
+                yield np.arange(start, min(start + BLOCK_ROWS, count))
+            return
+
+        lists = self._ivf
+        probe = _top_k(lists["centroids"] @ query, min(self.nprobe, len(lists["centroids"])))
+        offsets, order = lists["offsets"], lists["order"]
+        rows = [np.asarray(order[offsets[c]:offsets[c + 1]]) for c in probe]
+        rows.append(np.arange(lists["built_count"], count)) # added since the last build
+        # Sorted row order turns the gather into forward reads on the memmap
+        yield np.sort(np.concatenate(rows))
+
+    @staticmethod
+    def _gather(array: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        if rows[-1] - rows[0] + 1 == len(rows):
+            return np.asarray(array[rows[0]:rows[-1] + 1]) # contiguous: plain slice, no gather
+        return np.asarray(array[rows])
+
+    def _search(self, query: np.ndarray, k: int, exclude: set, ivf: bool, pq: bool, rerank: int) -> List[Tuple[int, float]]:
+        wanted = k + len(exclude)
+        # With PQ, keep a wider ADC shortlist for exact re-ranking
+        shortlist = wanted * rerank if pq and rerank else wanted
+        table = self._pq.lookup_table(query) if pq else None
+
+        best_rows, best_scores = [], []
+        for rows in self._candidates(query, ivf):
+            if len(rows) == 0:
+                continue
+            if pq:
+                scores = self._pq.scores(table[0], table[1], self._gather(self._codes, rows))
+            else:
+                scores = self._gather(self._vectors, rows) @ query
+            top = _top_k(scores, shortlist)
+            best_rows.append(rows[top])
+            best_scores.append(scores[top])
+        if not best_rows:
+            return []
+
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+        if pq and rerank:
+            rows = np.sort(rows[_top_k(scores, min(shortlist, len(scores)))])
+            scores = np.asarray(self._vectors[rows]) @ query
+
+        results = []
+        for i in _top_k(scores, min(wanted, len(scores))):
+            track_id = int(self._ids[rows[i]])
+            if track_id in exclude:
+                continue
+            results.append((track_id, round(float(scores[i]), 6)))
+            if len(results) == k:
+                break
+        return results
+
+    def search(self, query: Sequence[float], k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Top-k (track id, cosine similarity), best first."""
+        with self._lock:
+            self._refresh()
+            if not self._meta.get("count"):
+                return []
+            query, valid = _normalize(np.asarray(query, dtype=np.float32)[None, :])
+            if not valid[0]:
+                return []
+            return self._search(query[0], k, set(int(e) for e in exclude), ivf=self._use_ivf(),
+                                pq=self.use_pq and self._pq is not None, rerank=self.rerank)
+
+    def evaluate_recall(self, n_queries: int = 200, k: int = 10, seed: int = 0) -> Dict[str, Any]:
+        """
+        Recall@k of the compressed search (ADC only, and ADC + re-ranking) against exact
+        search over the full vectors, using stored vectors as queries.
+        """
+        with self._lock:
+            self._refresh()
+            count = self._meta.get("count", 0)
+            if not count or self._pq is None:
+                return {}
+            rng = np.random.default_rng(seed)
+            picks = rng.choice(count, size=min(n_queries, count), replace=False)
+            ivf = self._use_ivf()
+            hits = {"adc": 0, "rerank": 0}
+            total = 0
+            for row in picks:
+                query = np.asarray(self._vectors[row])
+                truth = {i for i, _ in self._search(query, k, set(), ivf=False, pq=False, rerank=0)}
+                total += len(truth)
+                adc = self._search(query, k, set(), ivf=ivf, pq=True, rerank=0)
+                reranked = self._search(query, k, set(), ivf=ivf, pq=True, rerank=self.rerank or RERANK_FACTOR)
+                hits["adc"] += len(truth & {i for i, _ in adc})
+                hits["rerank"] += len(truth & {i for i, _ in reranked})
+            report = {
+                "k": k,
+                "queries": len(picks),
+                "ivf": ivf,
+                "recall_adc": round(hits["adc"] / max(total, 1), 4),
+                "recall_rerank": round(hits["rerank"] / max(total, 1), 4),
+            }
+            logger.info(f"PQ recall@{k}: ADC {report['recall_adc']:.3f}, re-ranked {report['recall_rerank']:.3f}")
+            return report
+
+
+_instances: Dict[str, SimilarityIndex] = {}
+_instances_lock = threading.Lock()
+
+
+def get_similarity_index(directory: Optional[str] = None, **kwargs) -> SimilarityIndex:
+    """Process-wide index for a directory (kwargs apply on first use only)."""
+    directory = os.path.realpath(directory or DEFAULT_INDEX_DIR)
+    with _instances_lock:
+        if directory not in _instances:
+            _instances[directory] = SimilarityIndex(directory, **kwargs)
+        return _instances[directory]
+
+
+def similar_tracks(db_engine, track_id: int, k: int = 10, index: Optional[SimilarityIndex] = None) -> List[Dict[str, Any]]:
+    """
+    Top-k tracks similar to a stored analysis, with their filename/artist from the database.
+    Raises KeyError if the track has no indexed embedding.
+    """
+    from sqlmodel import Session, select
+    from totality_engine.core.schema import AnalysisResult
+    from totality_engine.core.embeddings import get_embedding
+
+    index = index or get_similarity_index()
+    query = index.vector_for(track_id)
+    if query is None:
+        # Not indexed yet (e.g. analyzed before the index existed): fall back to the stored embedding
+        with Session(db_engine) as session:
+            row = session.get(AnalysisResult, track_id)
+            query = get_embedding(row) if row is not None else None
+    if query is None:
+        raise KeyError(track_id)
+
+    hits = index.search(query, k=k, exclude=[track_id])
+    with Session(db_engine) as session:
+        rows = {r.id: r for r in session.exec(select(AnalysisResult).where(AnalysisResult.id.in_([h[0] for h in hits])))}
+    return [
+        {
+            "id": hit_id,
+            "score": score,
+            "filename": rows[hit_id].filename if hit_id in rows else None,
+            "artist_id": rows[hit_id].artist_id if hit_id in rows else None,
+        }
+        for hit_id, score in hits
+    ]
@@ -0,0 +1,149 @@
+import os
+import hashlib
+from typing import Any, List, Optional, Tuple
+
+# python-multipart (FastAPI's form parser); renamed to python_multipart in 0.0.13
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+    MULTIPART_AVAILABLE = True
+except ImportError:
+    try:
+        import multipart
+        from multipart.multipart import parse_options_header
+        MULTIPART_AVAILABLE = True
+    except ImportError:
+        MULTIPART_AVAILABLE = False
+
+UPLOAD_CHUNK_BYTES = 1 << 20
+MAX_UPLOAD_BYTES = int(os.environ.get("TOTALITY_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+# Bytes needed to recognise every supported container
+SNIFF_BYTES = 12
+# Text fields of an upload form (artist id, markets, ...) are small
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """
+    Audio container from the first bytes of a file (magic numbers), or None if unrecognised.
+    Lets uploads be rejected before the body is written to disk.
+    """
+    if len(header) >= 12 and header[:4] in (b"RIFF", b"RF64") and header[8:12] == b"WAVE":
+        return "wav"
+    if len(header) >= 12 and header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:3] == b"ID3":
+        return "mp3"
+    # Bare MPEG audio frame: 11-bit frame sync
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        return "mp3"
+    return None
+
+
+class UploadWriter:
+    """
+    Writes an upload to disk chunk by chunk, computing its SHA-256 on the way
+    (same digest as cache.hash_file, so the pipeline need not re-read the file)
+    and enforcing max_bytes. Blocking: call write()/close() off the event loop.
+    """
+
+    def __init__(self, path: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = open(path, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes // (1024 * 1024)} MB")
+        self._digest.update(chunk)
+        self._file.write(chunk)
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class MultipartStream:
+    """
+    Incremental multipart/form-data parser: feed() takes raw body chunks as they arrive and
+    returns the events they complete, in order:
+      ("part", name, filename)  a part starts (filename is None for text fields)
+      ("data", bytes)           part body bytes
+      ("end",)                  the part ends
+    Nothing is buffered beyond the current chunk. Malformed bodies raise ValueError.
+    """
+
+    def __init__(self, content_type: str):
+        if not MULTIPART_AVAILABLE:
+            raise RuntimeError("python-multipart is required to parse uploads")
+        mime, options = parse_options_header(content_type)
+        if mime != b"multipart/form-data" or not options.get(b"boundary"):
+            raise ValueError("Expected a multipart/form-data body")
+        self._events: List[Tuple[Any, ...]] = []
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._in_part = False
+        self._parser = multipart.MultipartParser(options[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._in_part = True
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        self._events.append(("part", options.get(b"name", b"").decode("latin-1"),
+                             None if filename is None else filename.decode("utf-8", "replace")))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self):
+        self._in_part = False
+        self._events.append(("end",))
+
+    def feed(self, chunk: bytes) -> List[Tuple[Any, ...]]:
+        self._parser.write(chunk)
+        events, self._events = self._events, []
+        return events
+
+    def finish(self) -> List[Tuple[Any, ...]]:
+        """Call once the body is complete; raises ValueError if it stopped inside a part."""
+        self._parser.finalize()
+        if self._in_part:
+            raise ValueError("Multipart body ends inside a part")
+        events, self._events = self._events, []
+        return events
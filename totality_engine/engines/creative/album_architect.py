@@ -1,18 +1,36 @@
 import os
 import statistics
 import json
-from typing import Dict, Any, List
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
 from totality_engine.core.engine import BaseEngine
+from totality_engine.core.cache import hash_file
 from totality_engine.engines.creative.audioscape import AudioscapeEngine
 
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+def _scan_track(file_path: str, config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Process-pool worker: technical profile for one track (None if it could not be read)."""
+    result = AudioscapeEngine(config).analyze(file_path)
+    return result.get("technical_profile")
+
 class AlbumArchitectEngine(BaseEngine):
     """
     Engine for analyzing cohesion across a collection of tracks.
+    Tracks are scanned in a process pool (album.workers) and their technical profiles are
+    kept in a per-directory manifest, so re-runs only rescan added or changed files.
     """
 
     def __init__(self, config=None):
         super().__init__(config)
         self.audioscape = AudioscapeEngine(config)
+        album_config = self.config.get("album", {})
+        self.workers = album_config.get("workers") or os.cpu_count() or 1
+        self.use_manifest = album_config.get("manifest", True)
+        self.manifest_name = album_config.get("manifest_name", ".album_manifest.json")
 
     def validate(self, input_data: Any) -> bool:
         if not isinstance(input_data, str):
@@ -31,11 +49,11 @@ class AlbumArchitectEngine(BaseEngine):
 
         tracks_data = []
         lufs_values = []
+        profiles = self._get_profiles(directory, files)
         
         for f in files:
-            result = self.audioscape.analyze(f)
-            if "technical_profile" in result:
-                tech = result["technical_profile"]
+            tech = profiles.get(f)
+            if tech is not None:
                 tracks_data.append({
                     "file": os.path.basename(f),
                     "lufs": tech.get('lufs_i', 0),
@@ -53,6 +71,81 @@ class AlbumArchitectEngine(BaseEngine):
             "verdict": self._get_verdict(structure)
         }
 
+    def _get_profiles(self, directory: str, files: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Technical profile per file: reused from the manifest when size/mtime (or, failing that,
+        the content hash) are unchanged, scanned otherwise.
+        """
+        manifest = self._load_manifest(directory) if self.use_manifest else {}
+        profiles = {}
+        to_scan = []
+        fingerprints = {}
+
+        for f in files:
+            name = os.path.basename(f)
+            st = os.stat(f)
+            entry = manifest.get(name)
+            if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+                profiles[f] = entry["technical_profile"]
+                continue
+
+            # Touched but maybe identical (e.g. copied back in): compare content before rescanning
+            content_hash = hash_file(f) if self.use_manifest else None
+            fingerprints[f] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": content_hash}
+            if entry and entry.get("sha256") == content_hash:
+                profiles[f] = entry["technical_profile"]
+            else:
+                to_scan.append(f)
+
+        if to_scan:
+            logger.info(f"Scanning {len(to_scan)} of {len(files)} tracks ({self.workers} workers)...")
+            profiles.update(self._scan(to_scan))
+
+        if self.use_manifest:
+            for f, fp in fingerprints.items():
+                if profiles.get(f) is not None:
+                    manifest[os.path.basename(f)] = dict(fp, technical_profile=profiles[f])
+            # Drop tracks that left the directory
+            present = {os.path.basename(f) for f in files}
+            manifest = {name: entry for name, entry in manifest.items() if name in present}
+            self._save_manifest(directory, manifest)
+
+        return profiles
+
+    def _scan(self, files: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        if self.workers > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(files))) as pool:
+                return dict(zip(files, pool.map(_scan_track, files, [self.config] * len(files))))
+        return {f: self.audioscape.analyze(f).get("technical_profile") for f in files}
+
+    def _manifest_path(self, directory: str) -> str:
+        return os.path.join(directory, self.manifest_name)
+
+    def _load_manifest(self, directory: str) -> Dict[str, Any]:
+        path = self._manifest_path(directory)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable album manifest {path}: {e}")
+            return {}
+        # Profiles from another loudness backend or manifest format are not comparable
+        if data.get("version") != MANIFEST_VERSION or data.get("backend") != self.audioscape.scanner.backend:
+            return {}
+        return data.get("tracks", {})
+
+    def _save_manifest(self, directory: str, tracks: Dict[str, Any]):
+        path = self._manifest_path(directory)
+        data = {"version": MANIFEST_VERSION, "backend": self.audioscape.scanner.backend, "tracks": tracks}
+        try:
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not write album manifest {path}: {e}")
+
     def _get_audio_files(self, directory: str) -> List[str]:
         files = []
         for f in os.listdir(directory):
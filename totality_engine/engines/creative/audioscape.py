@@ -1,9 +1,8 @@
-import subprocess
 import json
 import os
-import shutil
 from typing import Dict, Any, List, Optional
 from totality_engine.core.engine import BaseEngine
+from totality_engine.core.loudness import find_ffmpeg, get_loudness_scanner
 
 class AudioscapeEngine(BaseEngine):
     """
@@ -13,6 +12,7 @@ class AudioscapeEngine(BaseEngine):
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         super().__init__(config)
         self.ffmpeg_bin = self._get_ffmpeg_bin()
+        self.scanner = get_loudness_scanner(self.config.get("loudness", {}).get("backend"))
         self.criteria = self.config.get("audioscape", {
             "streaming": {"target_lufs": -14, "tolerance": 2, "true_peak_max": -1.0},
             "club": {"target_lufs": -9, "tolerance": 2, "true_peak_max": -1.0},
@@ -20,12 +20,7 @@ class AudioscapeEngine(BaseEngine):
         })
 
     def _get_ffmpeg_bin(self) -> str:
-        # Check for ffmpeg in common locations or path
-        paths = ["/opt/homebrew/bin/ffmpeg", "ffmpeg"]
-        for p in paths:
-            if shutil.which(p):
-                return p
-        return "ffmpeg" # Hope it's in path if checking fails
+        return find_ffmpeg()
 
     def validate(self, input_data: Any) -> bool:
         if not isinstance(input_data, str):
@@ -34,17 +29,18 @@ class AudioscapeEngine(BaseEngine):
             return False
         return True
 
-    def analyze(self, input_data: str) -> Dict[str, Any]:
+    def analyze(self, input_data: str, audio=None) -> Dict[str, Any]:
         """
-        Runs ffmpeg ebur128 filter to extract Integrated Loudness (I), LRA, and True Peak.
+        Runs an EBU R128 scan to extract Integrated Loudness (I), LRA, and True Peak.
         
         Args:
             input_data: Path to the audio file.
+            audio: Optional AudioContext whose decode the native loudness backend can reuse.
         """
         if not self.validate(input_data):
              return {"error": f"File not found or invalid: {input_data}"}
 
-        stats = self._run_ffmpeg_analysis(input_data)
+        stats = self._run_ffmpeg_analysis(input_data, audio)
         if "error" in stats:
             return stats
             
@@ -54,38 +50,9 @@ class AudioscapeEngine(BaseEngine):
             "verdict": evaluation
         }
 
-    def _run_ffmpeg_analysis(self, file_path: str) -> Dict[str, Any]:
-        cmd = [
-            self.ffmpeg_bin, 
-            "-i", file_path, 
-            "-af", "ebur128=peak=true", 
-            "-f", "null", 
-            "-"
-        ]
-        
-        try:
-            # ffmpeg outputs stats to stderr
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            stderr = result.stderr
-            
-            stats = {}
-            lines = stderr.split('\n')
-            for line in lines:
-                if "I:" in line and "LUFS" in line:
-                    stats['lufs_i'] = float(line.split("I:")[1].split("LUFS")[0].strip())
-                if "LRA:" in line and "LU" in line and "LRA low" not in line:
-                    stats['lra'] = float(line.split("LRA:")[1].split("LU")[0].strip())
-                if "True peak:" in line and "dBTP" in line:
-                     stats['true_peak'] = float(line.split("True peak:")[1].split("dBTP")[0].strip())
-            
-            # Basic validation that we got data
-            if not stats:
-                 return {"error": "Failed to parse ffmpeg output", "raw_stderr": stderr[:200]}
-
-            return stats
-
-        except Exception as e:
-            return {"error": str(e)}
+    def _run_ffmpeg_analysis(self, file_path: str, audio=None) -> Dict[str, Any]:
+        # Shared scan: one pass per file (ffmpeg or native backend), cached for the other creative engines
+        return self.scanner.summary(file_path, audio)
 
     def _evaluate(self, stats: Dict[str, float]) -> Dict[str, Any]:
         report = {"passed": True, "checks": []}
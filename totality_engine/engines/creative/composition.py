@@ -1,8 +1,39 @@
-import subprocess
 import os
-import shutil
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
 from totality_engine.core.engine import BaseEngine
+from totality_engine.core.loudness import find_ffmpeg, get_loudness_scanner
+
+# Momentary loudness is logged every 100 ms
+FRAMES_PER_SEC = 10
+BOREDOM_WINDOW = 20 * FRAMES_PER_SEC  # 20 s window
+BOREDOM_STEP = 5 * FRAMES_PER_SEC     # evaluated every 5 s
+BOREDOM_RANGE_LU = 3.0
+DROP_LAG = 10                          # compare against 1 s earlier
+DROP_THRESHOLD_LU = 4.0
+
+Profile = Tuple[np.ndarray, np.ndarray]  # (times, momentary LUFS)
+
+
+def _sliding_extreme(values: np.ndarray, window: int, op) -> np.ndarray:
+    """
+    Running max/min (op = np.maximum / np.minimum) of every length-`window` span along the last axis,
+    in O(n) regardless of window size (van Herk / Gil-Werman: per-block prefix and suffix scans).
+    Entry i covers values[..., i:i + window]; callers pad with op's identity (-inf / +inf).
+    """
+    rows, n = values.shape
+    identity = -np.inf if op is np.maximum else np.inf
+    blocks = -(-n // window) + 1  # one extra block so every window end is addressable
+    padded = np.full((rows, blocks * window), identity)
+    padded[:, :n] = values
+    padded = padded.reshape(rows, blocks, window)
+
+    prefix = op.accumulate(padded, axis=2).reshape(rows, -1)
+    suffix = op.accumulate(padded[:, :, ::-1], axis=2)[:, :, ::-1].reshape(rows, -1)
+    idx = np.arange(n)
+    return op(suffix[:, idx], prefix[:, idx + window - 1])
 
 class CompositionEngine(BaseEngine):
     """
@@ -12,13 +43,10 @@ class CompositionEngine(BaseEngine):
     def __init__(self, config=None):
         super().__init__(config)
         self.ffmpeg_bin = self._get_ffmpeg_bin()
+        self.scanner = get_loudness_scanner(self.config.get("loudness", {}).get("backend"))
 
     def _get_ffmpeg_bin(self) -> str:
-        paths = ["/opt/homebrew/bin/ffmpeg", "ffmpeg"]
-        for p in paths:
-            if shutil.which(p):
-                return p
-        return "ffmpeg"
+        return find_ffmpeg()
 
     def validate(self, input_data: Any) -> bool:
         if not isinstance(input_data, str):
@@ -32,109 +60,107 @@ class CompositionEngine(BaseEngine):
         if not self.validate(input_data):
             return {"error": f"File not found: {input_data}"}
 
-        timeseries = self._get_volume_profile(input_data)
-        structure = self._analyze_structure(timeseries)
-        
-        return {
-            "structural_profile": structure,
-            "verdict": self._get_verdict(structure)
-        }
+        return self.analyze_profiles([self._get_volume_profile(input_data)])[0]
 
-    def _get_volume_profile(self, file_path: str) -> List[Dict[str, float]]:
-        cmd = [
-            self.ffmpeg_bin, 
-            "-i", file_path, 
-            "-af", "ebur128=framelog=verbose", 
-            "-f", "null", 
-            "-"
-        ]
-        
-        try:
-            process = subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True)
-            timeseries = []
-            
-            while True:
-                line = process.stderr.readline()
-                if not line:
-                    break
-                
-                if "t:" in line and "M:" in line:
-                    try:
-                        parts = line.split()
-                        t_index = parts.index("t:") + 1
-                        m_index = parts.index("M:") + 1
-                        
-                        t = float(parts[t_index])
-                        m = float(parts[m_index])
-                        
-                        if m > -70: 
-                            timeseries.append({"t": t, "lufs": m})
-                    except ValueError:
-                        continue
-            return timeseries
-        except Exception as e:
-            print(f"Error profiling audio: {e}")
+    def analyze_batch(self, paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Structure analysis for many tracks at once (catalog scans).
+        Loudness scans run per file; detection runs on all profiles together.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+        profiles, valid = [], []
+        for idx, path in enumerate(paths):
+            if not self.validate(path):
+                results[idx] = {"error": f"File not found: {path}"}
+                continue
+            profiles.append(self._get_volume_profile(path))
+            valid.append(idx)
+
+        for idx, result in zip(valid, self.analyze_profiles(profiles)):
+            results[idx] = result
+        return results
+
+    def analyze_profiles(self, profiles: List[Profile]) -> List[Dict[str, Any]]:
+        """
+        Takes (times, momentary LUFS) arrays for any number of tracks and returns one
+        {"structural_profile", "verdict"} per track. Profiles are padded into one matrix so the
+        sliding-window and lag computations run once for the whole batch.
+        """
+        if not profiles:
             return []
 
-    def _analyze_structure(self, timeseries: List[Dict[str, float]]) -> Dict[str, Any]:
+        lengths = [len(lufs) for _, lufs in profiles]
+        width = max(max(lengths), 1)
+        values = np.full((len(profiles), width), np.nan)
+        for row, (_, lufs) in enumerate(profiles):
+            values[row, :len(lufs)] = lufs
+
+        # Padding is neutral for max/min, so windows that run past a track's end see only its own frames
+        padded = np.isnan(values)
+        spans = (_sliding_extreme(np.where(padded, -np.inf, values), BOREDOM_WINDOW, np.maximum)
+                 - _sliding_extreme(np.where(padded, np.inf, values), BOREDOM_WINDOW, np.minimum))
+        # NaN padding never compares greater, so no drop is reported past a track's end
+        jumps = values[:, DROP_LAG:] - values[:, :-DROP_LAG]
+
+        results = []
+        for row, (times, _) in enumerate(profiles):
+            structure = self._analyze_structure(np.asarray(times), spans[row], jumps[row])
+            results.append({
+                "structural_profile": structure,
+                "verdict": self._get_verdict(structure)
+            })
+        return results
+
+    def _get_volume_profile(self, file_path: str) -> Profile:
+        # Momentary loudness from the shared scan (same ffmpeg pass as AudioscapeEngine)
+        return self.scanner.timeseries(file_path)
+
+    def _analyze_structure(self, times: np.ndarray, spans: np.ndarray, jumps: np.ndarray) -> Dict[str, Any]:
         structure = {
             "boredom_flags": [],
             "drop_points": [],
             "stats": {"duration": 0, "variance": 0}
         }
-        
-        if not timeseries:
+
+        if len(times) == 0:
             return structure
-            
-        structure["stats"]["duration"] = timeseries[-1]["t"]
-        
+
+        structure["stats"]["duration"] = float(times[-1])
+
         # 1. Boredom Detector
-        self._detect_boredom(timeseries, structure)
+        self._detect_boredom(times, spans, structure)
 
         # 2. Drop Detector
-        self._detect_drops(timeseries, structure)
-                     
+        self._detect_drops(times, jumps, structure)
+
         return structure
 
-    def _detect_boredom(self, timeseries: List[Dict[str, float]], structure: Dict[str, Any]):
-        WINDOW_SIZE_SEC = 20
-        STEP_SEC = 5
-        values = [x["lufs"] for x in timeseries]
-        
-        for i in range(0, len(timeseries), int(STEP_SEC * 10)):
-            window_end_idx = min(i + int(WINDOW_SIZE_SEC * 10), len(timeseries))
-            if window_end_idx <= i: break
-            
-            window_vals = values[i:window_end_idx]
-            if not window_vals: continue
-            
-            _range = max(window_vals) - min(window_vals)
-            
-            if _range < 3.0: 
-                start_t = timeseries[i]["t"]
-                end_t = timeseries[window_end_idx-1]["t"]
-                if not structure["boredom_flags"] or start_t > structure["boredom_flags"][-1]["end"] + 5:
-                    structure["boredom_flags"].append({
-                        "start": round(start_t, 1), 
-                        "end": round(end_t, 1), 
-                        "type": "Static Energy"
-                    })
-
-    def _detect_drops(self, timeseries: List[Dict[str, float]], structure: Dict[str, Any]):
-        JUMP_THRESHOLD = 4.0
-        for i in range(10, len(timeseries)):
-            current = timeseries[i]
-            prev = timeseries[max(0, i - 10)]
-            
-            delta = current["lufs"] - prev["lufs"]
-            
-            if delta > JUMP_THRESHOLD:
-                t = current["t"]
-                if not structure["drop_points"] or t > structure["drop_points"][-1]["timestamp"] + 5:
-                     structure["drop_points"].append({
-                         "timestamp": round(t, 1),
-                         "magnitude": round(delta, 1)
-                     })
+    def _detect_boredom(self, times: np.ndarray, spans: np.ndarray, structure: Dict[str, Any]):
+        """spans[i]: loudness range (max - min) of the window starting at frame i."""
+        n = len(times)
+        starts = np.arange(0, n, BOREDOM_STEP)
+        flagged = starts[spans[starts] < BOREDOM_RANGE_LU]
+
+        # Only flagged windows reach Python; overlapping ones collapse into the first
+        for i in flagged:
+            start_t = float(times[i])
+            end_t = float(times[min(i + BOREDOM_WINDOW, n) - 1])
+            if not structure["boredom_flags"] or start_t > structure["boredom_flags"][-1]["end"] + 5:
+                structure["boredom_flags"].append({
+                    "start": round(start_t, 1),
+                    "end": round(end_t, 1),
+                    "type": "Static Energy"
+                })
+
+    def _detect_drops(self, times: np.ndarray, jumps: np.ndarray, structure: Dict[str, Any]):
+        """jumps[k]: loudness rise from frame k to frame k + DROP_LAG."""
+        for k in np.flatnonzero(jumps > DROP_THRESHOLD_LU):
+            t = float(times[k + DROP_LAG])
+            if not structure["drop_points"] or t > structure["drop_points"][-1]["timestamp"] + 5:
+                structure["drop_points"].append({
+                    "timestamp": round(t, 1),
+                    "magnitude": round(float(jumps[k]), 1)
+                })
 
     def _get_verdict(self, structure: Dict[str, Any]) -> List[str]:
         verdicts = []
@@ -2,7 +2,7 @@ import torch
 import librosa
 import numpy as np
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 # Try importing transformers, but don't crash if missing (though it should be installed)
 try:
@@ -12,6 +12,11 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
 
 from totality_engine.core.engine import BaseEngine
+from totality_engine.core.audio import AudioContext
+from totality_engine.core.inference import (InferenceRunner, model_label, buildable_backend, DEFAULT_BACKEND,
+                                            DEFAULT_DRIFT_TOLERANCE, DEFAULT_EXPORT_DIR)
+from totality_engine.core.registry import get_model_registry, ModelLoadError
+from totality_engine.core.batching import get_batcher, batching_settings
 
 logger = logging.getLogger(__name__)
 
@@ -22,77 +27,261 @@ class DeepListeningEngine(BaseEngine):
     """
     
     MODEL_NAME = "MIT/ast-finetuned-audioset-10-10-0.4593"
+    SAMPLE_RATE = 16000 # AST input rate
+    CLIP_SEC = 10.0 # AST's fixed input span (1024 frames at a 10 ms hop)
 
     def __init__(self, config=None):
         super().__init__(config)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = None
-        self.feature_extractor = None
         self.embedding_dim = 768 # AST base dimension
-        
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                logger.info(f"Loading Deep Listening Model: {self.MODEL_NAME}...")
-                self.feature_extractor = AutoFeatureExtractor.from_pretrained(self.MODEL_NAME)
-                self.model = ASTModel.from_pretrained(self.MODEL_NAME).to(self.device)
-                self.model.eval() # Inference mode
-                logger.info("Deep Listening Model loaded successfully.")
-            except Exception as e:
-                logger.error(f"Failed to load Deep Listening Model: {e}")
-                logger.warning("DeepListeningEngine will run in fallback mode (zero embeddings).")
-        else:
+        self.registry = get_model_registry()
+        # Resolved up front so the registry key and stage cache version name what actually runs
+        self.backend = buildable_backend(self.config.get("deep_listening", {}).get("backend", DEFAULT_BACKEND))
+        # Model, feature extractor and runner are loaded on first use and shared through the registry
+        self.model_key = f"ast:{self.MODEL_NAME}:{self.backend}:{self.device.type}"
+
+        if not TRANSFORMERS_AVAILABLE:
             logger.warning("transformers library not found. DeepListeningEngine disabled.")
 
-    def analyze(self, input_data: str) -> Dict[str, Any]:
+    def _load(self) -> Dict[str, Any]:
+        logger.info(f"Loading Deep Listening Model: {self.MODEL_NAME}...")
+        feature_extractor = AutoFeatureExtractor.from_pretrained(self.MODEL_NAME)
+        model = ASTModel.from_pretrained(self.MODEL_NAME).to(self.device)
+        model.eval() # Inference mode
+        # The runner holds the (possibly quantized/exported) model; fp32 weights are dropped for other backends
+        runner = self._build_runner(model, feature_extractor)
+        logger.info("Deep Listening Model loaded successfully.")
+        return {"feature_extractor": feature_extractor, "runner": runner}
+
+    def _models(self) -> Optional[Dict[str, Any]]:
+        if not TRANSFORMERS_AVAILABLE:
+            return None
+        try:
+            return self.registry.get(self.model_key, self._load)
+        except ModelLoadError:
+            logger.warning("DeepListeningEngine running in fallback mode (zero embeddings).")
+            return None
+
+    @property
+    def runner(self) -> Optional[InferenceRunner]:
+        models = self._models()
+        return models["runner"] if models else None
+
+    @property
+    def feature_extractor(self):
+        models = self._models()
+        return models["feature_extractor"] if models else None
+
+    @staticmethod
+    def _pool(outputs) -> torch.Tensor:
+        # ASTModel outputs BaseModelOutputWithPooling: 'last_hidden_state' [batch, sequences, hidden]
+        # and usually 'pooler_output' [batch, hidden]
+        if hasattr(outputs, 'pooler_output') and outputs.pooler_output is not None:
+            return outputs.pooler_output
+        # Average pooling over sequence dimension
+        return outputs.last_hidden_state.mean(dim=1)
+
+    def _build_runner(self, model, feature_extractor) -> InferenceRunner:
+        """Wraps the model for the configured backend, checked against fp32 on a fixed noise clip."""
+        inference_config = self.config.get("inference", {})
+        probe_clip = np.random.default_rng(0).standard_normal(int(self.SAMPLE_RATE * self.CLIP_SEC)).astype(np.float32) * 0.1
+        probe = feature_extractor([probe_clip, probe_clip[::-1].copy()], sampling_rate=self.SAMPLE_RATE,
+                                       return_tensors="pt")["input_values"]
+        return InferenceRunner(
+            model, self.MODEL_NAME, "input_values", self._pool, probe,
+            backend=self.backend,
+            drift_tolerance=inference_config.get("drift_tolerance", DEFAULT_DRIFT_TOLERANCE),
+            export_dir=inference_config.get("export_dir", DEFAULT_EXPORT_DIR),
+            device=self.device
+        )
+
+    @property
+    def model_label(self) -> str:
+        """Model name as recorded in results, tagged with the inference backend actually in use."""
+        models = self._models() if self.registry.loaded(self.model_key) else None
+        return models["runner"].label if models else model_label(self.MODEL_NAME, self.backend)
+
+    @property
+    def batch_size(self) -> int:
+        return int(self.config.get("deep_listening", {}).get("batch_size", 8))
+
+    @property
+    def batcher(self):
+        """Micro-batcher shared by concurrent jobs in this process (or the inference service), None when off."""
+        settings = batching_settings(self.config)
+        if not settings["enabled"]:
+            return None
+        return get_batcher(self.model_key, lambda waveforms: list(self._embed_arrays(waveforms)), settings)
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        """
+        mode: "clip" embeds the first CLIP_SEC seconds; "windowed" embeds the whole track
+        as overlapping AST-sized windows and pools them.
+        """
+        cfg = self.config.get("deep_listening", {})
+        return {
+            "mode": cfg.get("mode", "clip"),
+            "window_sec": float(cfg.get("window_sec", self.CLIP_SEC)),
+            "hop_sec": float(cfg.get("hop_sec", 5.0)),
+            "max_windows": int(cfg.get("max_windows", 32)),
+        }
+
+    @staticmethod
+    def window_offsets(duration: float, window_sec: float, hop_sec: float, max_windows: int) -> List[float]:
+        """
+        Start times of overlapping windows covering [0, duration]; the last window is aligned to the end.
+        Above max_windows, an evenly spaced subset is kept so cost stays bounded for long tracks.
+        """
+        if duration <= window_sec:
+            return [0.0]
+        offsets = list(np.arange(0.0, duration - window_sec, hop_sec))
+        offsets.append(duration - window_sec)
+        if len(offsets) > max_windows:
+            picks = np.unique(np.linspace(0, len(offsets) - 1, max_windows).round().astype(int))
+            offsets = [offsets[i] for i in picks]
+        return [round(float(o), 3) for o in offsets]
+
+    def _fallback(self, status: str = "fallback", error: Optional[str] = None) -> Dict[str, Any]:
+        result = {
+            "embedding": [0.0] * self.embedding_dim,
+            "status": status,
+        }
+        if error is None:
+            result["model"] = "none"
+        else:
+            result["error"] = error
+        return result
+
+    def _success(self, embedding: np.ndarray) -> Dict[str, Any]:
+        embedding_vector = embedding.tolist()
+        return {
+            "embedding": embedding_vector,
+            "status": "success",
+            "model": self.model_label,
+            "dimensions": len(embedding_vector)
+        }
+
+    def _embed_arrays(self, waveforms: List[np.ndarray], sr: int = SAMPLE_RATE, batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Embeds 16 kHz waveforms in batched forwards. The feature extractor pads/truncates every
+        clip to the same spectrogram length, so a batch stacks into one [batch, frames, mels] tensor.
+        Returns a [len(waveforms), hidden] array.
+        """
+        batch_size = batch_size or self.batch_size
+        # Hold the models for the whole call, so a registry eviction cannot drop them mid-batch
+        models = self._models()
+        if models is None:
+            raise RuntimeError("Deep Listening model unavailable")
+        feature_extractor, runner = models["feature_extractor"], models["runner"]
+        embeddings = []
+        for start in range(0, len(waveforms), batch_size):
+            chunk = waveforms[start:start + batch_size]
+            inputs = feature_extractor(chunk, sampling_rate=sr, return_tensors="pt")
+            embeddings.append(runner(inputs))
+
+        if not embeddings:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        return np.concatenate(embeddings, axis=0)
+
+    def _embed(self, waveforms: List[np.ndarray]) -> np.ndarray:
+        """
+        Embeds one job's 16 kHz clips. With batching on, they are queued with other jobs' clips
+        and run in shared forwards; otherwise batched within this call only.
+        """
+        batcher = self.batcher
+        if batcher is None:
+            return self._embed_arrays(waveforms)
+        return np.stack(batcher.map(waveforms))
+
+    def analyze(self, input_data: str, audio: Optional[AudioContext] = None) -> Dict[str, Any]:
         """
         Generates an embedding for the audio file.
         input_data: path to audio file.
+        audio: shared per-job AudioContext; decoded privately if omitted.
         """
         audio_path = input_data
         
-        if not self.model or not self.feature_extractor:
-            return {
-                "embedding": [0.0] * self.embedding_dim,
-                "status": "fallback",
-                "model": "none"
-            }
+        # With an inference service the model lives there; don't load it here
+        if batching_settings(self.config)["address"] is None and self._models() is None:
+            return self._fallback()
             
         try:
-            # 1. Load Audio (Resample to 16kHz as required by AST)
-            y, sr = librosa.load(audio_path, sr=16000, duration=10.0) # Limit to 10s for speed/memory in MVP
-            
-            # 2. Prepare Inputs
-            inputs = self.feature_extractor(y, sampling_rate=sr, return_tensors="pt").to(self.device)
-            
-            # 3. Inference
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                
-            # 4. Extract Embedding (Pooler output or Mean of Last Hidden State)
-            # ASTModel output has 'last_hidden_state' [batch, sequences, hidden]
-            # and 'pooler_output' [batch, hidden] usually if configured, 
-            # let's check attributes. ASTModel outputs BaseModelOutputWithPooling
-            
-            if hasattr(outputs, 'pooler_output') and outputs.pooler_output is not None:
-                embedding = outputs.pooler_output
-            else:
-                # Average pooling over sequence dimension
-                embedding = outputs.last_hidden_state.mean(dim=1)
-                
-            # Convert to list
-            embedding_vector = embedding.cpu().numpy()[0].tolist()
-            
-            return {
-                "embedding": embedding_vector,
-                "status": "success",
-                "model": self.MODEL_NAME,
-                "dimensions": len(embedding_vector)
-            }
+            audio = AudioContext.ensure(audio_path, audio)
+            if self.settings["mode"] == "windowed":
+                return self._analyze_windowed(audio)
+
+            # Resample to 16kHz as required by AST
+            y, sr = audio.load(sr=self.SAMPLE_RATE, duration=self.CLIP_SEC) # First clip only: fast, but intro-biased
+            return self._success(self._embed([y])[0])
             
         except Exception as e:
             logger.error(f"Deep Listening Analysis failed: {e}")
-            return {
-                "embedding": [0.0] * self.embedding_dim,
-                "status": "error",
-                "error": str(e)
-            }
+            return self._fallback("error", str(e))
+
+    def _analyze_windowed(self, audio: AudioContext) -> Dict[str, Any]:
+        """
+        Embeds every window in batched forwards. Returns the mean-pooled track embedding
+        plus a per-window timeline [{"start", "end", "embedding"}].
+        """
+        settings = self.settings
+        window_sec = settings["window_sec"]
+        offsets = self.window_offsets(audio.duration, window_sec, settings["hop_sec"], settings["max_windows"])
+
+        sr = self.SAMPLE_RATE
+        if audio.streaming:
+            # Long file: decode only the windows, never the whole track
+            windows = [audio.load(sr=sr, offset=o, duration=window_sec)[0] for o in offsets]
+        else:
+            y, _ = audio.load(sr=sr)
+            span = int(round(window_sec * sr))
+            windows = [y[int(round(o * sr)):int(round(o * sr)) + span] for o in offsets]
+
+        embeddings = self._embed(windows)
+        result = self._success(embeddings.mean(axis=0))
+        result["mode"] = "windowed"
+        result["timeline"] = [
+            {"start": o, "end": round(o + len(w) / sr, 3), "embedding": e.tolist()}
+            for o, w, e in zip(offsets, windows, embeddings)
+        ]
+        return result
+
+    def analyze_batch(self, paths: List[str], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Embeds many files with batched forwards (catalog backfills).
+        Returns one result per path, in order, shaped like analyze().
+        A file that fails to decode gets its own error result; the rest of its batch still runs.
+        """
+        if self._models() is None:
+            return [self._fallback() for _ in paths]
+
+        batch_size = batch_size or self.batch_size
+        results: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+
+        for start in range(0, len(paths), batch_size):
+            waveforms, indices = [], []
+            for idx in range(start, min(start + batch_size, len(paths))):
+                try:
+                    # Decode only the clip: no other stage shares this file, so a full AudioContext decode is wasted
+                    y, _ = librosa.load(paths[idx], sr=self.SAMPLE_RATE, duration=self.CLIP_SEC)
+                    waveforms.append(y)
+                    indices.append(idx)
+                except Exception as e:
+                    logger.error(f"Deep Listening decode failed for {paths[idx]}: {e}")
+                    results[idx] = self._fallback("error", str(e))
+
+            if not waveforms:
+                continue
+
+            try:
+                embeddings = self._embed_arrays(waveforms, self.SAMPLE_RATE, batch_size)
+            except Exception as e:
+                logger.error(f"Deep Listening batch inference failed: {e}")
+                for idx in indices:
+                    results[idx] = self._fallback("error", str(e))
+                continue
+
+            for idx, embedding in zip(indices, embeddings):
+                results[idx] = self._success(embedding)
+
+        return results
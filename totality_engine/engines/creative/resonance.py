@@ -11,6 +11,9 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
 
 from totality_engine.core.engine import BaseEngine
+from totality_engine.core.inference import quantize_int8, model_label, DEFAULT_BACKEND, DEFAULT_DRIFT_TOLERANCE
+from totality_engine.core.registry import get_model_registry, ModelLoadError
+from totality_engine.core.batching import get_batcher, batching_settings
 
 logger = logging.getLogger(__name__)
 
@@ -20,26 +23,89 @@ class ResonanceEngine(BaseEngine):
     Phase 1 Focus: Lyrical Sentiment vs. Audio Mood (via Embeddings).
     """
 
+    # distilbert-base-uncased-finetuned-sst-2-english is fast and effective
+    MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+    # Fixed sentences for checking a quantized model against fp32
+    PROBE_TEXTS = [
+        "I love this song, it makes me feel alive.",
+        "Everything is falling apart and I am alone.",
+        "We drove through the city at night."
+    ]
+
     def __init__(self, config=None):
         super().__init__(config)
-        self.sentiment_analyzer = None
-        
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                logger.info("Loading Lyrical Sentiment Model...")
-                # distilbert-base-uncased-finetuned-sst-2-english is fast and effective
-                self.sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-                logger.info("Resonance Engine (Sentiment) loaded successfully.")
-            except Exception as e:
-                logger.error(f"Failed to load Sentiment Model: {e}")
-        else:
+        self.registry = get_model_registry()
+        self.backend = self.config.get("resonance", {}).get("backend", DEFAULT_BACKEND)
+        # Loaded on first use (only when there are lyrics) and shared through the registry
+        self.model_key = f"sentiment:{self.MODEL_NAME}:{self.backend}"
+
+        if not TRANSFORMERS_AVAILABLE:
             logger.warning("transformers library not found. ResonanceEngine disabled.")
 
+    def _load(self) -> Dict[str, Any]:
+        logger.info("Loading Lyrical Sentiment Model...")
+        analyzer = pipeline("sentiment-analysis", model=self.MODEL_NAME)
+        backend = self._apply_backend(analyzer, self.backend)
+        logger.info("Resonance Engine (Sentiment) loaded successfully.")
+        return {"pipeline": analyzer, "backend": backend}
+
+    def _models(self) -> Optional[Dict[str, Any]]:
+        if not TRANSFORMERS_AVAILABLE:
+            return None
+        try:
+            return self.registry.get(self.model_key, self._load)
+        except ModelLoadError:
+            return None
+
+    @property
+    def sentiment_analyzer(self):
+        models = self._models()
+        return models["pipeline"] if models else None
+
+    @property
+    def model_label(self) -> str:
+        models = self._models() if self.registry.loaded(self.model_key) else None
+        return model_label(self.MODEL_NAME, models["backend"] if models else self.backend)
+
+    @staticmethod
+    def _signed_scores(analyzer, texts: List[str]) -> np.ndarray:
+        results = analyzer(texts)
+        return np.array([r['score'] if r['label'] == 'POSITIVE' else -r['score'] for r in results])
+
+    def _apply_backend(self, analyzer, backend: str) -> str:
+        """
+        Swaps in a dynamic int8 copy of the classifier when a non-eager backend is requested.
+        The text pipeline is not exported to TorchScript/ONNX, so those also map to int8.
+        Reverts to fp32 if probe sentiment moves more than the drift tolerance. Returns the backend in use.
+        """
+        if backend == "eager":
+            return "eager"
+        if analyzer.device.type != "cpu":
+            logger.warning(f"Inference backend '{backend}' targets CPU; keeping eager sentiment model.")
+            return "eager"
+
+        tolerance = self.config.get("inference", {}).get("drift_tolerance", DEFAULT_DRIFT_TOLERANCE)
+        fp32_model = analyzer.model
+        reference = self._signed_scores(analyzer, self.PROBE_TEXTS)
+        analyzer.model = quantize_int8(fp32_model)
+        drift = float(np.max(np.abs(self._signed_scores(analyzer, self.PROBE_TEXTS) - reference)))
+
+        if drift > tolerance:
+            logger.warning(f"Quantized sentiment model drifts {drift:.4f} (tolerance {tolerance}); using eager.")
+            analyzer.model = fp32_model
+            return "eager"
+        logger.info(f"Sentiment model running on 'int8' backend (requested '{backend}', drift {drift:.5f}).")
+        return "int8"
+
     def analyze(self, lyrics: str, audio_features: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calculates dissonance score between lyrics and audio.
         """
-        if not self.sentiment_analyzer or not lyrics:
+        # Check lyrics first: without them the sentiment model is never loaded.
+        # With an inference service the model lives there instead.
+        remote = batching_settings(self.config)["address"] is not None
+        analyzer = self.sentiment_analyzer if lyrics and not remote else None
+        if not lyrics or not (analyzer or remote):
             return {
                 "dissonance_score": 0.0,
                 "vibe": "Neutral",
@@ -48,15 +114,20 @@ class ResonanceEngine(BaseEngine):
             }
             
         try:
-            # 1. Analyze Lyrical Sentiment
-            # Truncate text to avoid token limits (512 tokens max usually)
-            truncated_lyrics = lyrics[:1000] 
-            sentiment_result = self.sentiment_analyzer(truncated_lyrics)[0]
-            sentiment_label = sentiment_result['label'] # POSITIVE / NEGATIVE
-            sentiment_score = sentiment_result['score']
-            
-            # Normalize to -1.0 (Negative) to 1.0 (Positive)
-            lyrical_valence = sentiment_score if sentiment_label == 'POSITIVE' else -sentiment_score
+            # 1. Analyze Lyrical Sentiment over the full lyrics
+            # Verse/line-aware chunks within the model's token limit, scored in one batched call
+            batcher = self.batcher
+            if batcher is not None:
+                # Scored together with other jobs' lyrics
+                timeline = batcher(lyrics)
+            else:
+                timeline = self._lyrics_sentiment(analyzer, [lyrics])[0]
+
+            # Token-weighted mean of the chunk valences, -1.0 (Negative) to 1.0 (Positive)
+            weights = np.array([c["tokens"] for c in timeline], dtype=float)
+            valences = np.array([c["valence"] for c in timeline])
+            lyrical_valence = float(np.dot(weights, valences) / weights.sum()) if weights.sum() > 0 else 0.0
+            sentiment_label = 'POSITIVE' if lyrical_valence >= 0 else 'NEGATIVE'
             
             # 2. Estimate Audio Valence (Heuristic from Embeddings/Features)
             # Since we don't have a trained regression model yet, we'll use a placeholder heuristic
@@ -92,6 +163,8 @@ class ResonanceEngine(BaseEngine):
                 "lyrical_valence": lyrical_valence,
                 "audio_valence": audio_valence,
                 "lyrical_sentiment": sentiment_label,
+                "sentiment_timeline": timeline,
+                "model": self.model_label,
                 "status": "success"
             }
             
@@ -103,6 +176,93 @@ class ResonanceEngine(BaseEngine):
                 "error": str(e)
             }
 
+    @property
+    def batcher(self):
+        """Micro-batcher shared by concurrent jobs in this process (or the inference service), None when off."""
+        settings = batching_settings(self.config)
+        if not settings["enabled"]:
+            return None
+        return get_batcher(self.model_key, self._score_lyrics, settings)
+
+    def _score_lyrics(self, lyrics_list: List[str]) -> List[List[Dict[str, Any]]]:
+        analyzer = self.sentiment_analyzer
+        if analyzer is None:
+            raise RuntimeError("Sentiment model unavailable")
+        return self._lyrics_sentiment(analyzer, lyrics_list)
+
+    @property
+    def chunking(self) -> Dict[str, int]:
+        cfg = self.config.get("resonance", {})
+        return {
+            "chunk_tokens": int(cfg.get("chunk_tokens", 128)),
+            "batch_size": int(cfg.get("batch_size", 16)),
+        }
+
+    @staticmethod
+    def chunk_lyrics(lyrics: str, count_tokens, max_tokens: int) -> List[Dict[str, Any]]:
+        """
+        Splits lyrics into chunks of whole lines that never cross a section (blank-line) boundary
+        and stay within max_tokens where possible (a single over-long line becomes its own chunk).
+        count_tokens: List[str] -> List[int].
+        Returns [{"text", "section", "lines": [first, last], "tokens"}] with 0-based line numbers.
+        """
+        lines = lyrics.splitlines()
+        indexed = [(i, line.strip()) for i, line in enumerate(lines) if line.strip()]
+        counts = count_tokens([text for _, text in indexed]) if indexed else []
+
+        # Section index of every line (blank lines separate verses/choruses)
+        sections, section = {}, 0
+        for i, line in enumerate(lines):
+            if not line.strip():
+                if i > 0 and lines[i - 1].strip():
+                    section += 1
+                continue
+            sections[i] = section
+
+        chunks: List[Dict[str, Any]] = []
+        current = None
+        for (i, text), tokens in zip(indexed, counts):
+            fits = current is not None and current["section"] == sections[i] and current["tokens"] + tokens <= max_tokens
+            if fits:
+                current["text"] += "\n" + text
+                current["lines"][1] = i
+                current["tokens"] += tokens
+            else:
+                current = {"text": text, "section": sections[i], "lines": [i, i], "tokens": tokens}
+                chunks.append(current)
+        return chunks
+
+    def _lyrics_sentiment(self, analyzer, lyrics_list: List[str]) -> List[List[Dict[str, Any]]]:
+        """Per-chunk sentiment timelines for several lyrics, from a single batched pipeline call."""
+        settings = self.chunking
+        tokenizer = analyzer.tokenizer
+
+        def count_tokens(texts: List[str]) -> List[int]:
+            return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+        # Leave room for [CLS]/[SEP]
+        budget = min(settings["chunk_tokens"], tokenizer.model_max_length) - 2
+        chunked = [self.chunk_lyrics(lyrics, count_tokens, budget) for lyrics in lyrics_list]
+        chunks = [c for job_chunks in chunked for c in job_chunks]
+        if not chunks:
+            return [[] for _ in lyrics_list]
+
+        results = iter(analyzer([c["text"] for c in chunks], batch_size=settings["batch_size"], truncation=True))
+        timelines = []
+        for job_chunks in chunked:
+            timeline = []
+            for chunk, result in zip(job_chunks, results):
+                valence = result['score'] if result['label'] == 'POSITIVE' else -result['score']
+                timeline.append({
+                    "section": chunk["section"],
+                    "lines": chunk["lines"],
+                    "tokens": chunk["tokens"],
+                    "label": result['label'],
+                    "valence": round(float(valence), 4)
+                })
+            timelines.append(timeline)
+        return timelines
+
     def _get_vibe_descriptor(self, ly_val, au_val):
         # Quadrant Mapping
         if ly_val > 0.3 and au_val > 0.3:
@@ -5,6 +5,13 @@ from .systems.creative.explicitness import ExplicitnessDetector
 from .systems.creative.code_switching import CodeSwitchingDetector
 from totality_engine.engines.creative.deep_listening import DeepListeningEngine
 from totality_engine.engines.creative.resonance import ResonanceEngine
+from totality_engine.core.audio import AudioContext, STREAMING_THRESHOLD_SEC
+from totality_engine.core.scheduler import Stage, StageScheduler
+from totality_engine.core.cache import FeatureCache, hash_file, DEFAULT_CACHE_DIR, DEFAULT_MAX_MB
+from totality_engine.core.registry import get_model_registry
+from totality_engine.core.loudness import get_loudness_scanner
+from totality_engine.core.batching import batcher_stats
+from totality_engine.core.results import partial_result
 
 from .systems.industry.graph_model import IndustryGraph
 from .systems.industry.centrality import NetworkAnalyst
@@ -22,9 +29,17 @@ from .systems.audience.neuro import NeuroAesthetics
 from .systems.audience.growth import GrowthAIEngine
 from .systems.audience.lift import LiftAnalyzer
 
+from .profiles import CREATIVE_STAGES, PROFILES, DEFAULT_PROFILE
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
 class HitSciencePipeline:
-    def __init__(self):
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
         print("Initializing Hit Science Pipeline...")
+        self.config = config or {}
         # System I
         self.audio_analyzer = AudioAnalyzer()
         self.harmonic_analyzer = HarmonicAnalyzer()
@@ -32,11 +47,19 @@ class HitSciencePipeline:
         self.explicitness_detector = ExplicitnessDetector()
         self.code_switcher = CodeSwitchingDetector()
         
+        # Heavy models load on first use and are shared process-wide through the registry
+        self.models = get_model_registry()
+        budget_mb = self.config.get("models", {}).get("budget_mb")
+        if budget_mb is not None:
+            self.models.configure(budget_mb)
+
         # System I - Deep Learning Enhancement
-        self.deep_listening = DeepListeningEngine()
+        self.deep_listening = DeepListeningEngine(self.config)
+        # Variants for profiles that override its settings (same shared model)
+        self._profile_deep_listening: Dict[str, DeepListeningEngine] = {}
         
         # System I - Resonance (Cross-Modal)
-        self.resonance_engine = ResonanceEngine()
+        self.resonance_engine = ResonanceEngine(self.config)
         
         # System II
         self.industry_graph = IndustryGraph()
@@ -58,88 +81,349 @@ class HitSciencePipeline:
         self.neuro_aesthetics = NeuroAesthetics()
         self.growth_engine = GrowthAIEngine()
         self.lift_analyzer = LiftAnalyzer()
+        
+        # Stage executor: independent systems run concurrently
+        scheduler_config = self.config.get("scheduler", {})
+        executor = scheduler_config.get("executor", "thread")
+        if executor != "thread":
+            # Stages are closures over this pipeline and its decoded audio, which cannot be pickled.
+            # For process isolation run whole analyses in worker processes (main.py TOTALITY_EXECUTOR=process).
+            raise ValueError(f"scheduler.executor '{executor}' is not supported by the pipeline; only 'thread' is")
+        self.scheduler = StageScheduler(max_workers=scheduler_config.get("max_workers"), executor=executor)
+        
+        # Persistent stage cache keyed by audio content hash
+        cache_config = self.config.get("cache", {})
+        self.cache = None
+        if cache_config.get("enabled", True):
+            self.cache = FeatureCache(
+                directory=cache_config.get("directory", DEFAULT_CACHE_DIR),
+                max_mb=cache_config.get("max_mb", DEFAULT_MAX_MB)
+            )
+
+        # Decode shared by consecutive run_stage calls on the same file (see _stage_audio)
+        self._last_stage_audio: Optional[Tuple[tuple, AudioContext]] = None
+        self._stage_audio_lock = threading.Lock()
+
+    def warm_up(self):
+        """Loads the heavy models now instead of on the first job (e.g. in a pool worker's initializer)."""
+        self.deep_listening._models()
+        self.resonance_engine._models()
+
+    def _deep_listening_for(self, profile: str) -> DeepListeningEngine:
+        overrides = PROFILES[profile].get("deep_listening")
+        if not overrides:
+            return self.deep_listening
+        if profile not in self._profile_deep_listening:
+            config = dict(self.config, deep_listening=dict(self.config.get("deep_listening", {}), **overrides))
+            self._profile_deep_listening[profile] = DeepListeningEngine(config)
+        return self._profile_deep_listening[profile]
 
-    def analyze_track(self, audio_path: str, metadata: dict):
+    @staticmethod
+    def resolve_profile(profile: Optional[str]) -> str:
+        profile = profile or DEFAULT_PROFILE
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown analysis profile '{profile}' (expected one of {sorted(PROFILES)})")
+        return profile
+
+    def build_stages(self, audio_path: str, metadata: dict, audio: AudioContext,
+                     profile: str = DEFAULT_PROFILE) -> List[Stage]:
         """
-        Main entry point for analyzing a track.
-        metadata: {
-            "lyrics": str, 
-            "artist_id": str, 
-            "artist_brand_keywords": list,
-            "target_markets": list,
-            "platform": str
-        }
+        Declares the stage dependency graph for one track, restricted to the profile's stages.
+        Stages with no path between them may run concurrently.
         """
-        print(f"Analyzing track: {audio_path}")
-        results = {}
-        
+        lyrics = metadata.get("lyrics", "")
+        settings = PROFILES[profile]
+        deep_listening_engine = self._deep_listening_for(profile)
+        audio_window = settings.get("audio_window_sec")
+        loudness_backend = self.config.get("loudness", {}).get("backend")
+
+        def creative_view(upstream: Dict[str, Any]) -> Dict[str, Any]:
+            # Reassemble results["creative"] as the downstream systems expect it
+            view = {}
+            for name in CREATIVE_STAGES:
+                view.update(upstream.get(name) or {})
+            return view
+
         # --- System I: Creative ---
-        print("Running System I Analysis...")
-        results["creative"] = {}
-        # Deep Listening (AI)
-        results["creative"].update(self.deep_listening.analyze(audio_path))
-        # Basic Signal Processing
-        results["creative"].update(self.audio_analyzer.analyze(audio_path))
-        results["creative"].update(self.harmonic_analyzer.analyze_harmony(audio_path))
-        
+        def deep_listening(upstream):
+            print("Running System I Analysis...")
+            return deep_listening_engine.analyze(audio_path, audio=audio)
+
+        def audio_features(upstream):
+            return self.audio_analyzer.analyze(audio_path, audio=audio, duration=audio_window)
+
+        def loudness(upstream):
+            out = get_loudness_scanner(loudness_backend).summary(audio_path, audio=audio, duration=audio_window)
+            if audio_window is not None and "error" not in out:
+                out["window_sec"] = audio_window
+            return out
+
+        def harmony(upstream):
+            return self.harmonic_analyzer.analyze_harmony(audio_path, audio=audio)
+
+        def lyrics_stage(upstream):
+            if "lyrics" not in metadata:
+                return {}
+            out = {}
+            out.update(self.nlp_engine.analyze_lyrics(metadata["lyrics"]))
+            out.update(self.explicitness_detector.check_explicitness(metadata["lyrics"]))
+            out.update(self.code_switcher.detect_languages(metadata["lyrics"]))
+            return out
+
         # --- System I: Resonance (Cross-Modal) ---
-        print("Running Cross-Modal Resonance...")
-        lyrics = metadata.get("lyrics", "")
-        # Pass the creative results as 'audio_features' to access embeddings
-        resonance_results = self.resonance_engine.analyze(lyrics, results["creative"])
-        results["resonance"] = resonance_results
-        
-        if "lyrics" in metadata:
-            results["creative"].update(self.nlp_engine.analyze_lyrics(metadata["lyrics"]))
-            results["creative"].update(self.explicitness_detector.check_explicitness(metadata["lyrics"]))
-            results["creative"].update(self.code_switcher.detect_languages(metadata["lyrics"]))
-            
+        def resonance(upstream):
+            print("Running Cross-Modal Resonance...")
+            # Only the embedding is needed from the audio side
+            return self.resonance_engine.analyze(lyrics, upstream["deep_listening"])
+
         # --- System II: Industry ---
-        print("Running System II Analysis...")
-        # (Assuming graph is populated or we look up existing nodes)
-        if "artist_id" in metadata:
+        def industry(upstream):
+            print("Running System II Analysis...")
+            # (Assuming graph is populated or we look up existing nodes)
+            if "artist_id" not in metadata:
+                return None
             centrality = self.network_analyst.get_artist_centrality(metadata["artist_id"])
-            results["industry"] = {"artist_centrality": centrality}
-            
+            return {"artist_centrality": centrality}
+
         # --- System III: Platform ---
-        print("Running System III Analysis...")
-        # Mocking time series for prototype call
-        import pandas as pd
-        mock_tiktok = pd.Series([100, 500, 2000, 10000])
-        mock_spotify = pd.Series([50, 100, 300, 1200])
-        elasticity = self.virality_engine.calculate_elasticity(mock_tiktok, mock_spotify)
-        results["platform"] = {"viral_elasticity": elasticity}
-        
-        optimizations = self.platform_optimizer.get_optimizations(results["creative"], metadata.get("platform", "Spotify"))
-        results["platform"]["optimizations"] = optimizations
-        
+        def platform(upstream):
+            print("Running System III Analysis...")
+            # Mocking time series for prototype call
+            import pandas as pd
+            mock_tiktok = pd.Series([100, 500, 2000, 10000])
+            mock_spotify = pd.Series([50, 100, 300, 1200])
+            elasticity = self.virality_engine.calculate_elasticity(mock_tiktok, mock_spotify)
+            out = {"viral_elasticity": elasticity}
+
+            optimizations = self.platform_optimizer.get_optimizations(creative_view(upstream), metadata.get("platform", "Spotify"))
+            out["optimizations"] = optimizations
+            return out
+
         # --- System IV: Market ---
-        print("Running System IV Analysis...")
-        if "target_markets" in metadata:
-            risks = self.market_risk.assess_risk(metadata["target_markets"], results["creative"])
-            results["market"] = {"geopolitical_risks": risks}
-            
+        def market(upstream):
+            print("Running System IV Analysis...")
+            if "target_markets" not in metadata:
+                return None
+            risks = self.market_risk.assess_risk(metadata["target_markets"], creative_view(upstream))
+            return {"geopolitical_risks": risks}
+
         # --- System V: Culture ---
-        print("Running System V Analysis...")
-        # Mocking track features as vector for distance
-        track_vector = [0.5, 0.5, 0.5] # Placeholder
-        if "target_markets" in metadata:
-            dist_results = {}
-            for mkt in metadata["target_markets"]:
-                d = self.culture_distance.calculate_distance(track_vector, mkt)
-                dist_results[mkt] = {"score": d, "interpretation": self.culture_distance.interpret_distance(d)}
-            results["culture"] = {"distances": dist_results}
-            
-        if "artist_brand_keywords" in metadata:
-            dissonance = self.identity_engine.check_brand_dissonance(
-                metadata["artist_brand_keywords"], 
-                results["creative"].get("sentiment", "Neutral"),
-                results["creative"].get("explicitness_score", 0.0)
-            )
-            results["culture"]["brand_dissonance"] = dissonance
+        def culture(upstream):
+            print("Running System V Analysis...")
+            out = None
+            # Mocking track features as vector for distance
+            track_vector = [0.5, 0.5, 0.5] # Placeholder
+            if "target_markets" in metadata:
+                dist_results = {}
+                for mkt in metadata["target_markets"]:
+                    d = self.culture_distance.calculate_distance(track_vector, mkt)
+                    dist_results[mkt] = {"score": d, "interpretation": self.culture_distance.interpret_distance(d)}
+                out = {"distances": dist_results}
+
+            if "artist_brand_keywords" in metadata:
+                lyric_features = upstream["lyrics"]
+                dissonance = self.identity_engine.check_brand_dissonance(
+                    metadata["artist_brand_keywords"],
+                    lyric_features.get("sentiment", "Neutral"),
+                    lyric_features.get("explicitness_score", 0.0)
+                )
+                out = out or {}
+                out["brand_dissonance"] = dissonance
+            return out
 
         # --- System VI: Audience ---
-        print("Running System VI Analysis...")
-        results["audience"] = self.neuro_aesthetics.analyze_hook_efficacy(audio_path)
+        def audience(upstream):
+            print("Running System VI Analysis...")
+            return self.neuro_aesthetics.analyze_hook_efficacy(audio_path, audio=audio)
+
+        def succeeded(result):
+            # Fallback/error outputs (e.g. model failed to load) must not be cached
+            return bool(result) and result.get("status") == "success"
+
+        streaming = {"threshold_sec": audio.streaming_threshold_sec, "block_frames": audio.streaming_block_frames}
+
+        # version: bump when a stage's code changes; inputs: config/metadata its output depends on
+        stages = [
+            Stage("loudness", loudness, inputs=loudness_backend if audio_window is None else [loudness_backend, audio_window],
+                  cache_if=lambda r: "error" not in r),
+            Stage("deep_listening", deep_listening, version=f"1:{deep_listening_engine.MODEL_NAME}:{deep_listening_engine.backend}",
+                  inputs=deep_listening_engine.settings, cache_if=succeeded),
+            Stage("audio_features", audio_features, version="2",
+                  inputs=streaming if audio_window is None else [streaming, audio_window]),
+            Stage("harmony", harmony, version="2", inputs=streaming),
+            Stage("lyrics", lyrics_stage, inputs=metadata.get("lyrics")),
+            Stage("resonance", resonance, deps=["deep_listening"], version=f"2:{self.resonance_engine.MODEL_NAME}:{self.resonance_engine.backend}",
+                  inputs=[lyrics, self.resonance_engine.chunking], cache_if=succeeded),
+            # Centrality reads the live graph
+            Stage("industry", industry, cacheable=False),
+            Stage("platform", platform, deps=CREATIVE_STAGES, inputs=metadata.get("platform"),
+                  cache_if=lambda r: r is not None),
+            Stage("market", market, deps=CREATIVE_STAGES, inputs=metadata.get("target_markets"),
+                  cache_if=lambda r: r is not None),
+            Stage("culture", culture, deps=["lyrics"],
+                  inputs=[metadata.get("target_markets"), metadata.get("artist_brand_keywords")],
+                  cache_if=lambda r: r is not None),
+            Stage("audience", audience, version="2", inputs=streaming),
+        ]
+        return [stage for stage in stages if stage.name in settings["stages"]]
+
+    @staticmethod
+    def partial_result(result: Any) -> Any:
+        """A stage output as sent in progress events: embedding vectors are left for the final result."""
+        return partial_result(result)
+
+    def _profile_for(self, metadata: dict, profile: Optional[str] = None) -> str:
+        return self.resolve_profile(profile or metadata.get("profile") or self.config.get("profile"))
+
+    def _audio_context(self, audio_path: str, profile: str) -> AudioContext:
+        streaming_config = self.config.get("streaming", {})
+        native_loudness = "loudness" in PROFILES[profile]["stages"] and \
+            get_loudness_scanner(self.config.get("loudness", {}).get("backend")).backend == "native"
+        return AudioContext(
+            audio_path,
+            keep_channels=native_loudness, # in-process R128 reads the channels of the shared decode
+            streaming_threshold_sec=streaming_config.get("threshold_sec", STREAMING_THRESHOLD_SEC),
+            streaming_block_frames=streaming_config.get("block_frames", 2048),
+            # Windowed profiles never read past the window, so only it is decoded
+            window_sec=PROFILES[profile].get("audio_window_sec")
+        )
+
+    def _stage_audio(self, audio_path: str, profile: str) -> AudioContext:
+        """
+        AudioContext for run_stage. The last one is kept, so consecutive stages of a job that run in
+        this process share one decode; stages running in other workers decode the file again.
+        """
+        st = os.stat(audio_path)
+        key = (os.path.realpath(audio_path), st.st_size, st.st_mtime_ns, profile)
+        with self._stage_audio_lock:
+            if self._last_stage_audio is None or self._last_stage_audio[0] != key:
+                self._last_stage_audio = (key, self._audio_context(audio_path, profile))
+            return self._last_stage_audio[1]
+
+    def audio_hash(self, audio_path: str, metadata: dict) -> Optional[str]:
+        """Feature-cache namespace of a track (None when caching is off)."""
+        if self.cache is None:
+            return None
+        return metadata.get("content_hash") or hash_file(audio_path)
+
+    @staticmethod
+    def assemble_results(outputs: Dict[str, Any], profile: str) -> Dict[str, Any]:
+        """Merges stage outputs into the result layout."""
+        results = {"profile": profile, "creative": {}}
+        for name in CREATIVE_STAGES:
+            results["creative"].update(outputs.get(name) or {})
+        for name in ["loudness", "resonance"]:
+            if name in outputs:
+                results[name] = outputs[name]
+        for system in ["industry", "platform", "market", "culture"]:
+            if outputs.get(system) is not None:
+                results[system] = outputs[system]
+        if "audience" in outputs:
+            results["audience"] = outputs["audience"]
+        return results
+
+    def stage_levels(self, metadata: dict, profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        The profile's stages grouped into dependency levels, [[{"name", "deps"}]], for running
+        each stage as a separate task (see run_stage). Building the graph reads no audio.
+        """
+        profile = self._profile_for(metadata, profile)
+        stages = {s.name: s for s in self.build_stages("", metadata, AudioContext(""), profile)}
+        return [[{"name": name, "deps": list(stages[name].deps)} for name in level]
+                for level in StageScheduler.levels(list(stages.values()))]
+
+    def run_stage(self, name: str, audio_path: str, metadata: dict, upstream: Dict[str, Any],
+                  profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Runs one stage given its dependencies' results (e.g. as a Celery subtask), using the
+        same feature cache as analyze_track. Returns {"stage", "result", "elapsed", "cached"}.
+        """
+        profile = self._profile_for(metadata, profile)
+        audio = self._stage_audio(audio_path, profile)
+        stages = {s.name: s for s in self.build_stages(audio_path, metadata, audio, profile)}
+        result, elapsed, cached = self.scheduler.run_one(stages[name], upstream, cache=self.cache,
+                                                         namespace=self.audio_hash(audio_path, metadata) or "")
+        return {"stage": name, "result": result, "elapsed": elapsed, "cached": cached}
+
+    def analyze_track(self, audio_path: str, metadata: dict,
+                      on_stage: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      profile: Optional[str] = None):
+        """
+        Main entry point for analyzing a track.
+        metadata: {
+            "lyrics": str, 
+            "artist_id": str, 
+            "artist_brand_keywords": list,
+            "target_markets": list,
+            "platform": str
+        }
+        on_stage, if given, receives {"stage", "completed", "total", "result"} as each stage
+        finishes (result is the stage's partial_result), e.g. to stream progress to clients.
+        profile: one of PROFILES (default: metadata["profile"], then config "profile", then "standard").
+        """
+        profile = self._profile_for(metadata, profile)
+        print(f"Analyzing track: {audio_path} (profile: {profile})")
+        # Decode once; every audio stage reads views of this buffer
+        audio = self._audio_context(audio_path, profile)
+
+        stage_timings = {}
+        cache_hits = []
+        audio_hash = self.audio_hash(audio_path, metadata)
+        stages = self.build_stages(audio_path, metadata, audio, profile)
+
+        on_complete = None
+        if on_stage is not None:
+            completed = []
+
+            def on_complete(name, result):
+                completed.append(name)
+                try:
+                    on_stage({"stage": name, "completed": len(completed), "total": len(stages),
+                              "result": self.partial_result(result)})
+                except Exception as e:
+                    # Progress reporting must never fail the analysis
+                    print(f"Warning: progress callback failed for stage '{name}': {e}")
+
+        outputs = self.scheduler.run(
+            stages,
+            on_complete=on_complete,
+            timings=stage_timings,
+            cache=self.cache,
+            namespace=audio_hash or "",
+            cache_hits=cache_hits
+        )
+
+        results = self.assemble_results(outputs, profile)
+        
+        # Per-stage and per-feature compute time, to see what each analyzer really costs
+        results["diagnostics"] = {
+            "audio_hash": audio_hash,
+            "analysis_mode": "streaming" if audio.streaming else "full",
+            "cache_hits": cache_hits,
+            "stage_timings": stage_timings,
+            "feature_timings": audio.feature_timings(),
+            "models": self.models.stats(),
+            "batching": batcher_stats()
+        }
         
         return results
+
+
+# --- Process-pool workers (see totality_engine.core.pool.WarmProcessPool) ---
+# Module-level so spawned workers import them without importing the API server.
+_worker_pipeline: Optional[HitSciencePipeline] = None
+
+def init_worker(config: Optional[Dict[str, Any]] = None):
+    """Pool initializer: one warm pipeline per worker process, reused for every job it runs."""
+    global _worker_pipeline
+    _worker_pipeline = HitSciencePipeline(config)
+    _worker_pipeline.warm_up()
+
+def analyze_in_worker(audio_path: str, metadata: dict, job_id: Optional[str] = None, progress_queue=None):
+    """progress_queue: a multiprocessing (Manager) queue receiving (job_id, stage event) tuples."""
+    if _worker_pipeline is None:
+        init_worker()
+    on_stage = None
+    if progress_queue is not None:
+        on_stage = lambda event: progress_queue.put((job_id, event))
+    return _worker_pipeline.analyze_track(audio_path, metadata, on_stage=on_stage)
@@ -0,0 +1,16 @@
+# Kept free of heavy imports so API front-ends can validate profile names without loading the pipeline.
+
+# Stages whose outputs are merged (in this order) into results["creative"]
+CREATIVE_STAGES = ["deep_listening", "audio_features", "harmony", "lyrics"]
+STANDARD_STAGES = CREATIVE_STAGES + ["resonance", "industry", "platform", "market", "culture", "audience"]
+
+# Named analysis profiles: which stages run, and at what fidelity.
+#   audio_window_sec: decode and measure (tempo/flux, loudness) the first N seconds only (None: whole track)
+#   deep_listening: overrides of the "deep_listening" config (e.g. windowed whole-track embeddings)
+PROFILES = {
+    # Interactive loudness/readiness check: no model inference, no CQT
+    "quick": {"stages": ["loudness", "audio_features", "lyrics"], "audio_window_sec": 60.0},
+    "standard": {"stages": STANDARD_STAGES},
+    "deep": {"stages": ["loudness"] + STANDARD_STAGES, "deep_listening": {"mode": "windowed"}},
+}
+DEFAULT_PROFILE = "standard"
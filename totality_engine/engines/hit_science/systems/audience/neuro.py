@@ -1,20 +1,25 @@
-import librosa
 import numpy as np
+from typing import Optional
+from totality_engine.core.audio import AudioContext
+from totality_engine.core.features import HOP_LENGTH
 
 class NeuroAesthetics:
     def __init__(self):
         pass
         
-    def analyze_hook_efficacy(self, audio_path: str):
+    def analyze_hook_efficacy(self, audio_path: str, audio: Optional[AudioContext] = None):
         """
         Analyzes the first 5 seconds for 'Spectral Burstiness'.
         """
         try:
-            # Load only first 5 seconds
-            y, sr = librosa.load(audio_path, duration=5.0)
-            
-            # Onset strength
-            onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+            audio = AudioContext.ensure(audio_path, audio)
+            if audio.streaming:
+                # Long file: decode just the first 5 seconds
+                onset_env = audio.features(duration=5.0)["onset_envelope"]
+            else:
+                # Onset strength over the first 5 seconds, sliced from the shared full-track envelope
+                feats = audio.features()
+                onset_env = feats["onset_envelope"][:int(5.0 * feats.sr / HOP_LENGTH) + 1]
             
             # 'Burstiness' = Max peak in the first few seconds
             max_peak = np.max(onset_env)
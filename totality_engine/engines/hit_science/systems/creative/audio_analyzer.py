@@ -1,17 +1,30 @@
 import numpy as np
 import librosa
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from totality_engine.core.audio import AudioContext
+from totality_engine.core.features import FeatureGraph
 
 class AudioAnalyzer:
     def __init__(self):
         pass
 
-    def analyze(self, audio_path: str) -> Dict[str, Any]:
+    def analyze(self, audio_path: str, audio: Optional[AudioContext] = None,
+                duration: Optional[float] = None) -> Dict[str, Any]:
         """
         Main entry point for audio analysis.
+        audio: shared per-job AudioContext; decoded privately if omitted.
+        duration: analyze only the first `duration` seconds (fast, lower-fidelity estimates).
         """
         try:
-            y, sr = librosa.load(audio_path)
+            audio = AudioContext.ensure(audio_path, audio)
+            if duration is not None:
+                feats = audio.features(duration=duration)
+            elif audio.streaming:
+                # Long file: bounded-memory block pass instead of a full decode
+                stream = audio.stream_features()
+                return {k: stream[k] for k in ("spectral_flux_mean", "spectral_flux_variance", "is_muddy_mix", "tempo", "beat_strength")}
+            else:
+                feats = audio.features()
         except Exception as e:
             print(f"Error loading audio: {e}")
             return {}
@@ -19,19 +32,19 @@ class AudioAnalyzer:
         features = {}
         
         # 1.1 Onset Strength & Spectral Flux
-        features.update(self._current_flux_analysis(y, sr))
+        features.update(self._current_flux_analysis(feats))
         
         # 1.1 Microtiming / Groove (Simplified)
-        features.update(self._groove_analysis(y, sr))
+        features.update(self._groove_analysis(feats))
         
         return features
 
-    def _current_flux_analysis(self, y, sr) -> Dict[str, float]:
+    def _current_flux_analysis(self, feats: FeatureGraph) -> Dict[str, float]:
         """
         Computes Onset Strength and Spectral Flux to detect 'Muddy' mixes.
         """
-        # Compute onset strength envelope
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        # Onset strength envelope (shared feature node)
+        onset_env = feats["onset_envelope"]
         
         # Spectral Flux is essentially the onset strength
         avg_flux = np.mean(onset_env)
@@ -46,15 +59,16 @@ class AudioAnalyzer:
             "is_muddy_mix": bool(is_muddy)
         }
 
-    def _groove_analysis(self, y, sr) -> Dict[str, float]:
+    def _groove_analysis(self, feats: FeatureGraph) -> Dict[str, float]:
         """
         Analyzes rhythmic properties.
         """
-        tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+        tempo, beat_frames = feats["beats"]
+        onset_env = feats["onset_envelope"]
         
         # Microtiming deviation would require comparing detected onsets to a rigid grid
         # For prototype, we return basic rhythm features
         return {
             "tempo": float(tempo),
-            "beat_strength": float(np.mean(librosa.util.normalize(librosa.onset.onset_strength(y=y, sr=sr)[beat_frames]))) if len(beat_frames) > 0 else 0.0
+            "beat_strength": float(np.mean(librosa.util.normalize(onset_env[beat_frames]))) if len(beat_frames) > 0 else 0.0
         }
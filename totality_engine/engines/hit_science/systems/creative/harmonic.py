@@ -1,15 +1,20 @@
-import librosa
 import numpy as np
 import scipy.stats
+from typing import Optional
+from totality_engine.core.audio import AudioContext
 
 class HarmonicAnalyzer:
     def __init__(self):
         pass
         
-    def analyze_harmony(self, audio_path: str):
+    def analyze_harmony(self, audio_path: str, audio: Optional[AudioContext] = None):
         try:
-            y, sr = librosa.load(audio_path)
-            chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+            audio = AudioContext.ensure(audio_path, audio)
+            if audio.streaming:
+                # Long file: chroma entropy accumulated block by block
+                stream = audio.stream_features()
+                return {k: stream[k] for k in ("harmonic_entropy", "expectancy_violation_score")}
+            chroma = audio.features()["cqt_chroma"]
             
             # Calculate entropy of the chroma features over time
             # High entropy = high unpredictability in harmonic content
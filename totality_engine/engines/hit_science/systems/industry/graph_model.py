@@ -5,8 +5,15 @@ logger = logging.getLogger(__name__)
 
 class IndustryGraph:
     def __init__(self):
-        self.db = get_graph_db()
-        self.create_constraints()
+        # Neo4j is only contacted when the graph is first used
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_graph_db()
+            self.create_constraints()
+        return self._db
         
     def create_constraints(self):
         """Ensure uniqueness for core entities"""
@@ -25,7 +25,7 @@ def verify_ai_engine():
         # Instantiate Engine (this downloads/loads model)
         engine = DeepListeningEngine()
         
-        if not engine.model:
+        if not engine.runner:
             print("⚠️ Transformers/Model not loaded. Verification likely to fail (fallback mode).")
         
         # Run Analysis
@@ -36,7 +36,7 @@ def verify_ai_engine():
         if result.get("status") == "success":
             embedding = result.get("embedding")
             dims = len(embedding)
-            print(f"✅ Success! Generated embedding with {dims} dimensions.")
+            print(f"✅ Success! Generated embedding with {dims} dimensions ({result.get('model')}).")
             
             if dims == 768: # AST default
                 print("✅ Dimensions match expected AST model output (768).")
@@ -48,6 +48,16 @@ def verify_ai_engine():
                 print("✅ Embedding contains non-zero values (inference working).")
             else:
                 print("⚠️ Embedding is all zeros (fallback or error).")
+
+            # Batched path: one bad file must not poison the batch
+            batch = engine.analyze_batch([test_file, "missing_file.wav", test_file], batch_size=2)
+            statuses = [r.get("status") for r in batch]
+            if statuses == ["success", "error", "success"]:
+                drift = float(np.max(np.abs(np.array(batch[0]["embedding"]) - np.array(embedding))))
+                print(f"✅ analyze_batch isolated the decode failure (max drift vs single: {drift:.2e}).")
+            else:
+                print(f"❌ Unexpected analyze_batch statuses: {statuses}")
+                sys.exit(1)
                 
         else:
             print(f"❌ Analysis failed: {result.get('error')}")
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+# Ensure project root is in path
+sys.path.append(os.getcwd())
+
+from totality_engine.core.loudness import get_loudness_scanner
+
+AUDIO_FILE = sys.argv[1] if len(sys.argv) > 1 else "test_audio.wav"
+
+# Agreement expected between the ffmpeg ebur128 filter and the native NumPy engine
+TOLERANCES = {"lufs_i": 0.5, "lra": 1.0, "true_peak": 0.5}
+
+def verify_loudness():
+    print(f"🔊 Verifying native EBU R128 engine against ffmpeg on {AUDIO_FILE}...")
+
+    results = {}
+    for backend in ["ffmpeg", "native"]:
+        start = time.time()
+        result = get_loudness_scanner(backend).scan(AUDIO_FILE)
+        elapsed = time.time() - start
+        if "error" in result:
+            print(f"❌ {backend} backend failed: {result['error']}")
+            sys.exit(1)
+        results[backend] = result
+        print(f"   {backend:<7} {result['summary']} ({len(result['timeseries']['t'])} frames, {elapsed:.2f}s)")
+
+    failures = 0
+    for key, tolerance in TOLERANCES.items():
+        ref = results["ffmpeg"]["summary"].get(key)
+        got = results["native"]["summary"].get(key)
+        if ref is None or got is None:
+            print(f"⚠️ {key}: missing from one backend (ffmpeg={ref}, native={got})")
+            continue
+        diff = abs(ref - got)
+        if diff <= tolerance:
+            print(f"✅ {key}: diff {diff:.2f} within ±{tolerance}")
+        else:
+            print(f"❌ {key}: diff {diff:.2f} exceeds ±{tolerance}")
+            failures += 1
+
+    if failures:
+        sys.exit(1)
+    print("✅ Native loudness engine matches ffmpeg within tolerance.")
+
+if __name__ == "__main__":
+    verify_loudness()
@@ -9,6 +9,19 @@ celery = Celery(
     include=['tasks']
 )
 
+def route_stage(name, args, kwargs, options, task=None, **kw):
+    """
+    Stage subtasks go to the model-warm queue (if TOTALITY_MODEL_QUEUE is set) or the general queue
+    by stage name. With a model queue, run e.g. `celery -A worker.celery worker -Q models --concurrency 1`
+    on model hosts and `celery -A worker.celery worker -Q celery` for everything else.
+    """
+    if name == 'tasks.run_stage_task':
+        stage = args[0] if args else kwargs.get('name')
+        if Config.MODEL_QUEUE and stage in Config.MODEL_STAGES:
+            return {'queue': Config.MODEL_QUEUE}
+        return {'queue': Config.GENERAL_QUEUE}
+    return None
+
 # Optional configuration
 celery.conf.update(
     task_serializer='json',
@@ -16,6 +29,20 @@ celery.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    task_default_queue=Config.GENERAL_QUEUE,
+    task_routes=(route_stage,),
+    task_always_eager=Config.TASK_ALWAYS_EAGER,
+    task_eager_propagates=Config.TASK_ALWAYS_EAGER,
+    result_expires=Config.RESULT_EXPIRES,
+    # Compress what does go through the backend (progress meta, stage subtask results)
+    result_compression='zlib',
+    # Run `celery -A worker beat` to purge expired stored results
+    beat_schedule={
+        'purge-expired-results': {
+            'task': 'tasks.purge_results_task',
+            'schedule': Config.PURGE_RESULTS_INTERVAL,
+        },
+    },
 )
 
 if __name__ == '__main__':